@@ -0,0 +1,38 @@
+"""Refresh the OFAC / ScamSniffer address lists out of band.
+
+    python -m pretix refresh_sanctions_lists [--force]
+
+Same work as the hourly periodic task. Run it once at deploy so the shared
+cache is seeded before the first buyer request (request-path screening only
+reads; with nothing published it serves the bundled OFAC snapshot and fails
+open on scam checks until the periodic task catches up).
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from pretix_eth import sanctions
+
+
+class Command(BaseCommand):
+    help = 'Fetch the OFAC and ScamSniffer address lists and publish them to the shared cache.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Refresh every list, even ones whose published version is still fresh.',
+        )
+
+    def handle(self, *args, **options):
+        summary = sanctions.refresh_lists(force=options['force'])
+        failed = []
+        for name, result in summary.items():
+            if 'error' in result:
+                failed.append(name)
+                self.stderr.write(f'{name}: refresh failed: {result["error"]}')
+            elif result['refreshed']:
+                self.stdout.write(f'{name}: published version {result["version"]} ({result["addresses"]} addresses)')
+            elif 'addresses' in result:
+                self.stdout.write(f'{name}: another refresh is running, skipped (serving version {result["version"]})')
+            else:
+                self.stdout.write(f'{name}: version {result["version"]} still fresh, skipped')
+        if failed:
+            raise CommandError('refresh failed for: ' + ', '.join(failed))
@@ -0,0 +1,21 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pretix_eth', '0014_lowercase_tx_hashes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScreenedPayer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False)),
+                ('address', models.CharField(max_length=42, unique=True)),
+                ('first_seen_at', models.DateTimeField(auto_now_add=True)),
+                ('flagged_at', models.DateTimeField(blank=True, null=True)),
+                ('flagged_version', models.CharField(blank=True, max_length=16, null=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,14 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pretix_eth', '0015_screenedpayer'),
+    ]
+
+    operations = [
+        migrations.DeleteModel(
+            name='X402VerifyAttempt',
+        ),
+    ]
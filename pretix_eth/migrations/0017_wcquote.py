@@ -0,0 +1,28 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pretixbase', '0001_initial'),
+        ('pretix_eth', '0016_delete_x402verifyattempt'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WCQuote',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False)),
+                ('quote_id', models.CharField(max_length=32, unique=True)),
+                ('chain_id', models.IntegerField()),
+                ('symbol', models.CharField(max_length=20)),
+                ('intended_payer', models.CharField(max_length=42)),
+                ('amount_raw', models.CharField(max_length=80)),
+                ('created_at', models.DateTimeField()),
+                ('expires_at', models.DateTimeField(db_index=True)),
+                ('data', models.JSONField(default=dict)),
+                ('payment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='wc_quotes', to='pretixbase.orderpayment')),
+            ],
+        ),
+    ]
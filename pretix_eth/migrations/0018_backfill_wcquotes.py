@@ -0,0 +1,65 @@
+"""Backfill `WCQuote` from the quotes already stored on walletconnect
+payments (`info['quote']` plus the `info['quotes']` history), so verify and
+the admin tools find quotes minted before `0017` too.
+
+History entries are slim (no signature blob); they are copied as they are —
+the full quote is whichever one is still the payment's current
+`info['quote']`, which wins when both carry the same `quote_id`.
+"""
+import json
+from datetime import datetime, timezone
+
+from django.db import migrations
+
+_BATCH = 1000
+
+
+def _row(WCQuote, payment_id, quote):
+    return WCQuote(
+        quote_id=quote['quote_id'],
+        payment_id=payment_id,
+        chain_id=int(quote['chain_id']),
+        symbol=quote['symbol'],
+        intended_payer=quote.get('intended_payer') or '',
+        amount_raw=str(quote.get('amount_raw') or ''),
+        created_at=datetime.fromtimestamp(int(quote.get('created_at') or 0), tz=timezone.utc),
+        expires_at=datetime.fromtimestamp(int(quote.get('expires_at') or 0), tz=timezone.utc),
+        data=quote,
+    )
+
+
+def backfill(apps, schema_editor):
+    OrderPayment = apps.get_model('pretixbase', 'OrderPayment')
+    WCQuote = apps.get_model('pretix_eth', 'WCQuote')
+
+    rows = []
+    payments = OrderPayment.objects.filter(provider='walletconnect').values_list('id', 'info')
+    for payment_id, info in payments.iterator(chunk_size=_BATCH):
+        try:
+            data = json.loads(info) if info else {}
+        except ValueError:
+            continue
+        if not isinstance(data, dict):
+            continue
+        quotes = {}
+        for quote in list(data.get('quotes') or []) + [data.get('quote')]:
+            if isinstance(quote, dict) and quote.get('quote_id') and quote.get('chain_id') and quote.get('symbol'):
+                quotes[quote['quote_id']] = quote
+        rows.extend(_row(WCQuote, payment_id, q) for q in quotes.values())
+        if len(rows) >= _BATCH:
+            WCQuote.objects.bulk_create(rows, ignore_conflicts=True)
+            rows = []
+    if rows:
+        WCQuote.objects.bulk_create(rows, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pretixbase', '0001_initial'),
+        ('pretix_eth', '0017_wcquote'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pretix_eth', '0018_backfill_wcquotes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WCSettlementJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False)),
+                ('quote_id', models.CharField(max_length=32)),
+                ('tx_hash', models.CharField(max_length=66)),
+                ('state', models.CharField(max_length=16)),
+                ('data', models.JSONField(default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True, db_index=True)),
+            ],
+            options={
+                'unique_together': {('quote_id', 'tx_hash')},
+            },
+        ),
+    ]
@@ -70,6 +70,70 @@ class WCPaymentAttempt(models.Model):
         app_label = 'pretix_eth'
 
 
+class WCQuote(models.Model):
+    """A quote minted by /plugin/wc/create-quote/, one row per `quote_id`.
+    `data` is the full quote as returned to the buyer (signer binding
+    included); the columns are the fields looked up or listed. Lets verify
+    and the admin tools find a quote and its payment with one indexed
+    lookup instead of scanning pending payments' info_data."""
+    quote_id = models.CharField(max_length=32, unique=True)
+    payment = models.ForeignKey(
+        to=OrderPayment,
+        on_delete=models.CASCADE,
+        related_name='wc_quotes',
+    )
+    chain_id = models.IntegerField()
+    symbol = models.CharField(max_length=20)
+    intended_payer = models.CharField(max_length=42)
+    amount_raw = models.CharField(max_length=80)
+    created_at = models.DateTimeField()
+    expires_at = models.DateTimeField(db_index=True)
+    data = models.JSONField(default=dict)
+
+    class Meta:
+        app_label = 'pretix_eth'
+
+    @classmethod
+    def from_quote(cls, payment, quote: dict) -> 'WCQuote':
+        """Unsaved row for a `pricing.build_quote` dict (or a slim history
+        entry) on `payment`."""
+        from datetime import datetime, timezone as dt_timezone
+        return cls(
+            quote_id=quote['quote_id'],
+            payment=payment,
+            chain_id=int(quote['chain_id']),
+            symbol=quote['symbol'],
+            intended_payer=quote.get('intended_payer') or '',
+            amount_raw=str(quote.get('amount_raw') or ''),
+            created_at=datetime.fromtimestamp(int(quote.get('created_at') or 0), tz=dt_timezone.utc),
+            expires_at=datetime.fromtimestamp(int(quote.get('expires_at') or 0), tz=dt_timezone.utc),
+            data=quote,
+        )
+
+    @staticmethod
+    def current_quote_id(payment):
+        """The quote `payment` currently points at (`info['quote_id']`, or
+        the embedded quote of a payment from before this table existed)."""
+        info = payment.info_data or {}
+        return info.get('quote_id') or (info.get('quote') or {}).get('quote_id')
+
+
+class WCSettlementJob(models.Model):
+    """The settlement job for one (quote_id, tx_hash) pair, see
+    `pretix_eth.settlement`. `data` is the job state served by the status
+    resource; `state` and `updated_at` are kept as columns for the cleanup
+    of finished jobs."""
+    quote_id = models.CharField(max_length=32)
+    tx_hash = models.CharField(max_length=66)
+    state = models.CharField(max_length=16)
+    data = models.JSONField(default=dict)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        app_label = 'pretix_eth'
+        unique_together = (('quote_id', 'tx_hash'),)
+
+
 class X402PendingOrder(models.Model):
     """Pending x402 ticket order between purchase and payment verification."""
     event = models.ForeignKey('pretixbase.Event', on_delete=models.CASCADE, related_name='x402_pending_orders')
@@ -122,10 +186,15 @@ class X402CompletedOrder(models.Model):
         ]
 
 
-class X402VerifyAttempt(models.Model):
-    """Rate-limit attempt log. Key is a prefix+identifier, e.g. verify_ref:<ref>, verify_ip:<ip>, purchase_ip:<ip>."""
-    key = models.CharField(max_length=120, db_index=True)
-    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+class ScreenedPayer(models.Model):
+    """Every distinct payer address seen across the WC and x402 flows
+    (lowercase), kept so a sanctions list update can be checked against past
+    payers by an indexed lookup of just the newly listed addresses. Filled
+    and screened by `pretix_eth.rescreen`."""
+    address = models.CharField(max_length=42, unique=True)
+    first_seen_at = models.DateTimeField(auto_now_add=True)
+    flagged_at = models.DateTimeField(null=True, blank=True)
+    flagged_version = models.CharField(max_length=16, null=True, blank=True)
 
     class Meta:
         app_label = 'pretix_eth'
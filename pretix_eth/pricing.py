@@ -1,11 +1,14 @@
-"""Dual-oracle ETH price. Ports devcon ethPrice.ts."""
+"""Multi-oracle ETH/POL price. Ports devcon ethPrice.ts."""
 import asyncio
 import logging
+import math
 import secrets
+import threading
 import time
+from collections import deque
 from dataclasses import asdict, dataclass
 from decimal import Decimal
-from typing import Optional
+from typing import Callable, Dict, Optional, Sequence
 
 import httpx
 from django.core.cache import cache
@@ -17,17 +20,29 @@ log = logging.getLogger(__name__)
 # 30s window the worst-case staleness is below the slippage we already absorb
 # elsewhere, and oracle traffic per buyer drops by ~50-100x on busy events.
 PRICE_CACHE_TTL_SECONDS = 30
+# The 30s above is the fallback; once a few quorum prices are in the history
+# buffer the TTL tracks realized volatility instead (see `_adaptive_ttl`):
+# long in a flat market, short while the price is moving. Bounded both ways
+# so a single odd sample can neither pin quotes to a minutes-old price nor
+# turn every checkout into an oracle fan-out.
+PRICE_CACHE_TTL_MIN_SECONDS = 10
+PRICE_CACHE_TTL_MAX_SECONDS = 300
+# The TTL is sized so the expected move over one cache lifetime is about this
+# much. 0.25% is half of what a typical wallet's slippage tolerance hides and
+# 20x inside MAX_DIVERGENCE_PCT.
+PRICE_CACHE_TARGET_MOVE_PCT = 0.25
+# Ring buffer of recent quorum prices per asset. Samples older than the window
+# are ignored for the volatility estimate but stay visible in the admin
+# history until pushed out.
+PRICE_HISTORY_SIZE = 120
+PRICE_HISTORY_VOL_WINDOW_SECONDS = 30 * 60
+PRICE_HISTORY_CACHE_KEY = 'pretix_eth:price_history:{asset}'
+PRICE_HISTORY_CACHE_SECONDS = 24 * 3600
 ETH_PRICE_CACHE_KEY = 'pretix_eth:price:eth'
 POL_PRICE_CACHE_KEY = 'pretix_eth:price:pol'
 
-COINBASE_URL = 'https://api.coinbase.com/v2/prices/ETH-USD/spot'
-# api.binance.us instead of api.binance.com — the .com endpoint returns HTTP 451
-# from US-hosted prod, while api.binance.us responds globally with the same
-# response shape. No geo-aware config needed.
-BINANCE_URL = 'https://api.binance.us/api/v3/ticker/price?symbol=ETHUSDT'
-KRAKEN_ETH_URL = 'https://api.kraken.com/0/public/Ticker?pair=ETHUSD'
-BITSTAMP_ETH_URL = 'https://www.bitstamp.net/api/v2/ticker/ethusd/'
 MAX_DIVERGENCE_PCT = 5.0
+ORACLE_TIMEOUT_SECONDS = 2.0
 
 
 @dataclass
@@ -39,52 +54,175 @@ class EthPriceResult:
     source: str
 
 
-async def _fetch_coinbase(client: httpx.AsyncClient) -> float:
-    r = await client.get(COINBASE_URL, timeout=2.0)
-    r.raise_for_status()
-    data = r.json()
-    p = float(data['data']['amount'])
-    if p <= 0:
-        raise ValueError('invalid coinbase price')
-    return p
-
-
-async def _fetch_binance(client: httpx.AsyncClient) -> float:
-    r = await client.get(BINANCE_URL, timeout=2.0)
-    r.raise_for_status()
-    data = r.json()
-    p = float(data['price'])
-    if p <= 0:
-        raise ValueError('invalid binance price')
-    return p
-
-
-async def _fetch_kraken_eth(client: httpx.AsyncClient) -> float:
-    """Kraken ticker: returns last trade price under result.<pair>.c[0]. Pair
-    key is `XETHZUSD` for ETH/USD. We `next(iter(...))` so we don't have to
-    care about the exact key Kraken returns."""
-    r = await client.get(KRAKEN_ETH_URL, timeout=2.0)
-    r.raise_for_status()
-    j = r.json()
-    if j.get('error'):
-        raise ValueError('kraken error: %s' % j['error'])
-    pair = next(iter(j['result'].values()))
-    p = float(pair['c'][0])
-    if p <= 0:
-        raise ValueError('invalid kraken price')
-    return p
-
-
-async def _fetch_bitstamp_eth(client: httpx.AsyncClient) -> float:
-    """Bitstamp ticker: returns last trade price as the `last` field. EU-based
-    (Luxembourg) — independent of US-host risk and Binance geo-blocking, so
-    it complements Coinbase + Kraken nicely."""
-    r = await client.get(BITSTAMP_ETH_URL, timeout=2.0)
-    r.raise_for_status()
-    p = float(r.json()['last'])
-    if p <= 0:
-        raise ValueError('invalid bitstamp price')
-    return p
+# Per-asset history of (unix_ts, price, source), oldest first, kept in the
+# shared cache so every worker's TTL estimate and the admin view
+# (`get_price_history`) see the same refreshes whichever worker made them.
+# Only fresh quorum results land here — cache hits are the same sample
+# again. Appends are read-modify-write: two workers refreshing one asset in
+# the same instant can drop a sample, which neither consumer notices.
+def _history(asset: str) -> list:
+    return list(cache.get(PRICE_HISTORY_CACHE_KEY.format(asset=asset)) or ())
+
+
+def _record_price(asset: str, result: EthPriceResult, now: Optional[float] = None) -> None:
+    samples = _history(asset)
+    samples.append((time.time() if now is None else now, result.price, result.source))
+    cache.set(PRICE_HISTORY_CACHE_KEY.format(asset=asset), samples[-PRICE_HISTORY_SIZE:],
+              PRICE_HISTORY_CACHE_SECONDS)
+
+
+def _adaptive_ttl(asset: str, now: Optional[float] = None) -> int:
+    """Cache TTL for `asset` derived from realized short-term volatility.
+
+    Uses the per-second variance of log returns across the recent history
+    (sum of squared returns over elapsed time, which copes with the uneven
+    sample spacing a demand-driven cache produces). With σ² per second, the
+    expected move over t seconds is σ·√t, so the TTL that keeps that move at
+    PRICE_CACHE_TARGET_MOVE_PCT is (target / σ)². Falls back to
+    PRICE_CACHE_TTL_SECONDS until there are at least three samples in the
+    window."""
+    now = time.time() if now is None else now
+    samples = [
+        (ts, price) for ts, price, _ in _history(asset)
+        if now - ts <= PRICE_HISTORY_VOL_WINDOW_SECONDS
+    ]
+    if len(samples) < 3:
+        return PRICE_CACHE_TTL_SECONDS
+    sq_returns = 0.0
+    elapsed = 0.0
+    for (t0, p0), (t1, p1) in zip(samples, samples[1:]):
+        if t1 <= t0 or p0 <= 0 or p1 <= 0:
+            continue
+        sq_returns += math.log(p1 / p0) ** 2
+        elapsed += t1 - t0
+    if elapsed <= 0:
+        return PRICE_CACHE_TTL_SECONDS
+    if sq_returns == 0:
+        return PRICE_CACHE_TTL_MAX_SECONDS
+    sigma_per_sec = math.sqrt(sq_returns / elapsed)
+    ttl = (PRICE_CACHE_TARGET_MOVE_PCT / 100 / sigma_per_sec) ** 2
+    return int(min(PRICE_CACHE_TTL_MAX_SECONDS, max(PRICE_CACHE_TTL_MIN_SECONDS, ttl)))
+
+
+def _store_result(asset: str, cache_key: str, result: EthPriceResult) -> None:
+    _record_price(asset, result)
+    cache.set(cache_key, asdict(result), _adaptive_ttl(asset))
+
+
+def get_price_history() -> dict:
+    """Recent quorum prices per asset (shared by all workers), oldest
+    first, plus the cache TTL currently in effect. Admin diagnostics only —
+    lets an operator line a disputed quote's `eth_price_usd` up against what
+    the oracles said around `created_at`."""
+    history = {}
+    for asset in PRICE_ASSETS:
+        samples = _history(asset)
+        history[asset] = {
+            'cacheTtlSeconds': _adaptive_ttl(asset),
+            'samples': [
+                {'at': int(ts), 'price': price, 'source': source}
+                for ts, price, source in samples
+            ],
+        }
+    return history
+
+
+# ---------------------------------------------------------------------------
+# Oracle registry
+# ---------------------------------------------------------------------------
+#
+# Each exchange is described once: its ticker URL, how to read prices out of
+# the response, and which of our assets it lists (asset → exchange symbol).
+# Every asset is its own request: checkout only ever needs one asset at a
+# time, and a multi-symbol request fails as a whole if one symbol is
+# rejected (Binance answers 400 for an unknown symbol). Adding an asset is a
+# `symbols` entry here plus a cache key in PRICE_ASSETS — no new fetcher.
+
+def _parse_coinbase(data, symbol: str):
+    return data['data']['amount']
+
+
+def _parse_binance(data, symbol: str):
+    if data['symbol'] != symbol:
+        raise ValueError('binance answered for %s, not %s' % (data['symbol'], symbol))
+    return data['price']
+
+
+def _parse_kraken(data, symbol: str):
+    """Kraken ticker: last trade price under result.<pair>.c[0]. Kraken
+    answers with its own pair key (`XETHZUSD` for `ETHUSD`), so just take
+    the single entry."""
+    if data.get('error'):
+        raise ValueError('kraken error: %s' % data['error'])
+    pair = next(iter(data['result'].values()))
+    return pair['c'][0]
+
+
+def _parse_bitstamp(data, symbol: str):
+    return data['last']
+
+
+def _parse_coingecko(data, symbol: str):
+    return data[symbol]['usd']
+
+
+@dataclass(frozen=True)
+class PriceOracle:
+    name: str
+    # Formatted with `symbol=` the exchange symbol requested.
+    url: str
+    # (response JSON, exchange symbol) → price (number or numeric string)
+    parse: Callable[[object, str], object]
+    # Our asset → this exchange's symbol for it.
+    symbols: Dict[str, str]
+
+
+PRICE_ORACLES = (
+    PriceOracle(
+        name='coinbase',
+        url='https://api.coinbase.com/v2/prices/{symbol}/spot',
+        parse=_parse_coinbase,
+        symbols={'ETH': 'ETH-USD', 'POL': 'POL-USD'},
+    ),
+    # api.binance.us instead of api.binance.com — the .com endpoint returns
+    # HTTP 451 from US-hosted prod, while api.binance.us responds globally
+    # with the same response shape. No geo-aware config needed.
+    PriceOracle(
+        name='binance',
+        url='https://api.binance.us/api/v3/ticker/price?symbol={symbol}',
+        parse=_parse_binance,
+        symbols={'ETH': 'ETHUSDT', 'POL': 'POLUSDT'},
+    ),
+    # Kraken doesn't list POL/USD spot.
+    PriceOracle(
+        name='kraken',
+        url='https://api.kraken.com/0/public/Ticker?pair={symbol}',
+        parse=_parse_kraken,
+        symbols={'ETH': 'ETHUSD'},
+    ),
+    # EU-based (Luxembourg) — independent of US-host risk and Binance
+    # geo-blocking, so it complements Coinbase + Kraken nicely.
+    PriceOracle(
+        name='bitstamp',
+        url='https://www.bitstamp.net/api/v2/ticker/{symbol}/',
+        parse=_parse_bitstamp,
+        symbols={'ETH': 'ethusd'},
+    ),
+    # Free public endpoint; (rebranded MATIC=) POL is `polygon-ecosystem-token`.
+    # Strictest rate limit of the set (~10-30 RPM) — only used for POL.
+    PriceOracle(
+        name='coingecko',
+        url='https://api.coingecko.com/api/v3/simple/price?ids={symbol}&vs_currencies=usd',
+        parse=_parse_coingecko,
+        symbols={'POL': 'polygon-ecosystem-token'},
+    ),
+)
+
+# Asset → cache key. Every asset here must be listed by ≥2 oracles above.
+PRICE_ASSETS = {
+    'ETH': ETH_PRICE_CACHE_KEY,
+    'POL': POL_PRICE_CACHE_KEY,
+}
 
 
 def _quorum_price(prices: dict, *, label: str) -> Optional[EthPriceResult]:
@@ -116,39 +254,218 @@ def _quorum_price(prices: dict, *, label: str) -> Optional[EthPriceResult]:
     return None
 
 
+# ---------------------------------------------------------------------------
+# Oracle health: rolling per-(asset, oracle) stats + demotion
+# ---------------------------------------------------------------------------
+#
+# An oracle that fails (or disagrees with the quorum) on most of its recent
+# attempts is demoted: instead of every refresh it only gets a probe request
+# every ORACLE_PROBE_INTERVAL_SECONDS, and ORACLE_PROMOTE_AFTER_PROBES good
+# probes in a row bring it back. The canonical case is Binance.US from EU
+# hosts — a guaranteed 451 that otherwise costs a request slot and a log
+# line on every refresh. Demotion never starves the quorum: if fewer than two
+# healthy oracles remain for an asset, every oracle is queried.
+
+ORACLE_HEALTH_WINDOW = 20
+ORACLE_DEMOTE_MIN_SAMPLES = 5
+ORACLE_DEMOTE_BELOW_SUCCESS_RATE = 0.5
+ORACLE_PROBE_INTERVAL_SECONDS = 300
+ORACLE_PROMOTE_AFTER_PROBES = 2
+
+
+class _OracleHealth:
+    def __init__(self):
+        # (ok, latency_seconds, deviation_pct or None) per attempt.
+        self.attempts = deque(maxlen=ORACLE_HEALTH_WINDOW)
+        self.demoted_at: Optional[float] = None
+        self.last_probe_at = 0.0
+        self.probe_streak = 0
+
+    @property
+    def success_rate(self) -> Optional[float]:
+        if not self.attempts:
+            return None
+        return sum(1 for ok, _, _ in self.attempts if ok) / len(self.attempts)
+
+    def as_dict(self) -> dict:
+        latencies = sorted(lat for _, lat, _ in self.attempts)
+        deviations = [d for _, _, d in self.attempts if d is not None]
+        return {
+            'demoted': self.demoted_at is not None,
+            'demotedAt': int(self.demoted_at) if self.demoted_at else None,
+            'lastProbeAt': int(self.last_probe_at) if self.last_probe_at else None,
+            'samples': len(self.attempts),
+            'successRate': self.success_rate,
+            'latencyMsP50': round(latencies[len(latencies) // 2] * 1000) if latencies else None,
+            'meanDeviationPct': sum(deviations) / len(deviations) if deviations else None,
+        }
+
+
+_oracle_health = {}
+_oracle_health_lock = threading.Lock()
+
+
+def _health(asset: str, name: str) -> _OracleHealth:
+    h = _oracle_health.get((asset, name))
+    if h is None:
+        h = _oracle_health.setdefault((asset, name), _OracleHealth())
+    return h
+
+
+def _select_oracles(asset: str, names, now: float) -> list:
+    """Names to query this refresh: all healthy oracles plus any demoted one
+    whose probe is due. Falls back to every oracle when fewer than two are
+    healthy, so demotion can cost latency but never the quorum itself."""
+    with _oracle_health_lock:
+        healthy = [n for n in names if _health(asset, n).demoted_at is None]
+        if len(healthy) < 2:
+            return list(names)
+        selected = list(healthy)
+        for n in names:
+            h = _health(asset, n)
+            if h.demoted_at is not None and now - h.last_probe_at >= ORACLE_PROBE_INTERVAL_SECONDS:
+                h.last_probe_at = now
+                selected.append(n)
+        return selected
+
+
+def _record_oracle_outcomes(asset: str, outcomes: dict, quorum: Optional[EthPriceResult], now: float) -> None:
+    """`outcomes` maps name → (price or exception, latency_seconds). A price
+    counts as good when it's within MAX_DIVERGENCE_PCT of the quorum (or no
+    quorum formed — then nobody is blamed for disagreeing)."""
+    with _oracle_health_lock:
+        for name, (value, latency) in outcomes.items():
+            h = _health(asset, name)
+            deviation = None
+            if isinstance(value, float):
+                if quorum is not None and quorum.price > 0:
+                    deviation = abs(value - quorum.price) / quorum.price * 100
+                ok = deviation is None or deviation <= MAX_DIVERGENCE_PCT
+            else:
+                ok = False
+            h.attempts.append((ok, latency, deviation))
+
+            if h.demoted_at is not None:
+                h.probe_streak = h.probe_streak + 1 if ok else 0
+                if h.probe_streak >= ORACLE_PROMOTE_AFTER_PROBES:
+                    log.info('%s oracle %s: promoted after %d good probes', asset, name, h.probe_streak)
+                    h.demoted_at = None
+                    h.probe_streak = 0
+                    h.attempts.clear()
+            elif (len(h.attempts) >= ORACLE_DEMOTE_MIN_SAMPLES
+                    and h.success_rate < ORACLE_DEMOTE_BELOW_SUCCESS_RATE):
+                log.warning(
+                    '%s oracle %s: demoted (success rate %.0f%% over %d attempts), probing every %ds',
+                    asset, name, h.success_rate * 100, len(h.attempts), ORACLE_PROBE_INTERVAL_SECONDS,
+                )
+                h.demoted_at = now
+                h.last_probe_at = now
+                h.probe_streak = 0
+
+
+def get_oracle_health() -> dict:
+    """Per-asset, per-oracle health snapshot for this process (admin view)."""
+    with _oracle_health_lock:
+        out = {}
+        for (asset, name), h in sorted(_oracle_health.items()):
+            out.setdefault(asset, {})[name] = h.as_dict()
+        return out
+
+
+async def _fetch_oracle(client: httpx.AsyncClient, oracle: PriceOracle, assets: Sequence[str]) -> dict:
+    """Fetch `assets` from one oracle, one request per asset. Returns
+    asset → (price or exception, latency_s)."""
+    out = {}
+
+    async def _one(asset):
+        sym = oracle.symbols[asset]
+        t0 = time.monotonic()
+        try:
+            r = await client.get(oracle.url.format(symbol=sym), timeout=ORACLE_TIMEOUT_SECONDS)
+            r.raise_for_status()
+            p = float(oracle.parse(r.json(), sym))
+            if p <= 0:
+                raise ValueError('invalid %s %s price' % (oracle.name, asset))
+            out[asset] = (p, time.monotonic() - t0)
+        except Exception as e:
+            out[asset] = (e, time.monotonic() - t0)
+
+    await asyncio.gather(*(_one(a) for a in assets))
+    return out
+
+
+async def refresh_prices(assets: Sequence[str]) -> Dict[str, Optional[EthPriceResult]]:
+    """Fetch fresh quorum prices for `assets`, bypassing the cache.
+
+    Plans one concurrent fan-out across every oracle that lists any of the
+    assets (minus demoted ones whose probe isn't due). Quorum and health
+    bookkeeping run per asset; successful results are cached."""
+    now = time.time()
+    by_name = {o.name: o for o in PRICE_ORACLES}
+    plan = {}
+    for asset in assets:
+        names = [o.name for o in PRICE_ORACLES if asset in o.symbols]
+        for name in _select_oracles(asset, names, now):
+            plan.setdefault(name, []).append(asset)
+    async with httpx.AsyncClient() as client:
+        fetched = await asyncio.gather(*(
+            _fetch_oracle(client, by_name[name], wanted) for name, wanted in plan.items()
+        ))
+    outcomes = {asset: {} for asset in assets}
+    for name, per_asset in zip(plan, fetched):
+        for asset, outcome in per_asset.items():
+            outcomes[asset][name] = outcome
+
+    results = {}
+    for asset in assets:
+        prices = {}
+        for name, (r, _) in outcomes[asset].items():
+            if isinstance(r, float):
+                prices[name] = r
+            elif _health(asset, name).demoted_at is None:
+                log.info('%s oracle %s failed: %r', asset, name, r)
+            else:
+                log.debug('%s oracle %s probe failed: %r', asset, name, r)
+        result = _quorum_price(prices, label=asset)
+        _record_oracle_outcomes(asset, outcomes[asset], result, now)
+        if result is not None:
+            _store_result(asset, PRICE_ASSETS[asset], result)
+        results[asset] = result
+    return results
+
+
+async def fetch_prices_usd(assets: Sequence[str] = tuple(PRICE_ASSETS)) -> Dict[str, Optional[EthPriceResult]]:
+    """Cached quorum prices for `assets`; whatever is missing from the cache
+    is refreshed concurrently in a single `refresh_prices` pass.
+
+    Cached for a volatility-derived TTL (`_adaptive_ttl`, 10s-5min, 30s until
+    there's history) — at high checkout concurrency this is what keeps us
+    under CoinGecko's free-tier rate limit (10-30 RPM) and avoids hammering
+    the others. `None` results aren't cached so a transient outage gets
+    retried on the next request rather than locked in for the full TTL."""
+    results = {}
+    for asset in assets:
+        cached = cache.get(PRICE_ASSETS[asset])
+        if cached:
+            results[asset] = EthPriceResult(**cached)
+    missing = [a for a in assets if a not in results]
+    if missing:
+        results.update(await refresh_prices(missing))
+    return results
+
+
 async def fetch_eth_price_usd() -> Optional[EthPriceResult]:
     """Return price as soon as ≥2 of {coinbase, binance, kraken, bitstamp}
     agree within 5%. Returns None only if fewer than 2 oracles respond OR no
     2 agree. Tolerates one or two oracles being unreachable — e.g. Binance
-    geo-block from EU prod hosts (we still get coinbase + kraken + bitstamp).
-
-    Cached for `PRICE_CACHE_TTL_SECONDS` (~30s) — at high checkout concurrency
-    this is what keeps us under CoinGecko's free-tier rate limit (10-30 RPM)
-    and avoids hammering the others. `None` results aren't cached so a
-    transient outage gets retried on the next request rather than locked in
-    for the full TTL."""
-    cached = cache.get(ETH_PRICE_CACHE_KEY)
-    if cached:
-        return EthPriceResult(**cached)
-    async with httpx.AsyncClient() as client:
-        results = await asyncio.gather(
-            _fetch_coinbase(client),
-            _fetch_binance(client),
-            _fetch_kraken_eth(client),
-            _fetch_bitstamp_eth(client),
-            return_exceptions=True,
-        )
-    names = ['coinbase', 'binance', 'kraken', 'bitstamp']
-    prices = {}
-    for name, r in zip(names, results):
-        if isinstance(r, float):
-            prices[name] = r
-        else:
-            log.info('ETH oracle %s failed: %r', name, r)
-    result = _quorum_price(prices, label='ETH')
-    if result is not None:
-        cache.set(ETH_PRICE_CACHE_KEY, asdict(result), PRICE_CACHE_TTL_SECONDS)
-    return result
+    geo-block from EU prod hosts (we still get coinbase + kraken + bitstamp)."""
+    return (await fetch_prices_usd(['ETH']))['ETH']
+
+
+async def fetch_pol_price_usd() -> Optional[EthPriceResult]:
+    """Return POL price as soon as ≥2 of {coinbase, binance, coingecko} agree
+    within 5%. Tolerates one oracle being unreachable (e.g. Binance geo-block)."""
+    return (await fetch_prices_usd(['POL']))['POL']
 
 
 # ---------------------------------------------------------------------------
@@ -241,73 +558,3 @@ def build_quote(*, order_code: str, order_total_usd: Decimal,
         'sig_chain_id': sig_chain_id,
         'payer_code_prefix': payer_code_prefix,
     }
-
-
-# ---------------------------------------------------------------------------
-# POL/USD dual-oracle (parallels ETH/USD above)
-# ---------------------------------------------------------------------------
-
-COINBASE_POL_URL = 'https://api.coinbase.com/v2/prices/POL-USD/spot'
-BINANCE_POL_URL = 'https://api.binance.us/api/v3/ticker/price?symbol=POLUSDT'
-# Kraken doesn't list POL/USD spot. CoinGecko's free public endpoint returns
-# (rebranded MATIC=) POL under the `polygon-ecosystem-token` id.
-COINGECKO_POL_URL = (
-    'https://api.coingecko.com/api/v3/simple/price'
-    '?ids=polygon-ecosystem-token&vs_currencies=usd'
-)
-
-
-async def _fetch_coinbase_pol(client: httpx.AsyncClient) -> float:
-    r = await client.get(COINBASE_POL_URL, timeout=2.0)
-    r.raise_for_status()
-    p = float(r.json()['data']['amount'])
-    if p <= 0:
-        raise ValueError('invalid coinbase POL price')
-    return p
-
-
-async def _fetch_binance_pol(client: httpx.AsyncClient) -> float:
-    r = await client.get(BINANCE_POL_URL, timeout=2.0)
-    r.raise_for_status()
-    p = float(r.json()['price'])
-    if p <= 0:
-        raise ValueError('invalid binance POL price')
-    return p
-
-
-async def _fetch_coingecko_pol(client: httpx.AsyncClient) -> float:
-    r = await client.get(COINGECKO_POL_URL, timeout=2.0)
-    r.raise_for_status()
-    p = float(r.json()['polygon-ecosystem-token']['usd'])
-    if p <= 0:
-        raise ValueError('invalid coingecko POL price')
-    return p
-
-
-async def fetch_pol_price_usd() -> Optional[EthPriceResult]:
-    """Return POL price as soon as ≥2 of {coinbase, binance, coingecko} agree
-    within 5%. Tolerates one oracle being unreachable (e.g. Binance geo-block).
-
-    Same 30s cache as ETH — particularly important here because CoinGecko's
-    free tier is the strictest of all our oracles (~10-30 RPM)."""
-    cached = cache.get(POL_PRICE_CACHE_KEY)
-    if cached:
-        return EthPriceResult(**cached)
-    async with httpx.AsyncClient() as client:
-        results = await asyncio.gather(
-            _fetch_coinbase_pol(client),
-            _fetch_binance_pol(client),
-            _fetch_coingecko_pol(client),
-            return_exceptions=True,
-        )
-    names = ['coinbase', 'binance', 'coingecko']
-    prices = {}
-    for name, r in zip(names, results):
-        if isinstance(r, float):
-            prices[name] = r
-        else:
-            log.info('POL oracle %s failed: %r', name, r)
-    result = _quorum_price(prices, label='POL')
-    if result is not None:
-        cache.set(POL_PRICE_CACHE_KEY, asdict(result), PRICE_CACHE_TTL_SECONDS)
-    return result
@@ -0,0 +1,231 @@
+"""Sliding-window rate limits on the shared Django cache.
+
+Each limit keeps one integer counter per (key, window) in the cache and
+judges a request against the estimate
+
+    previous window's count × (share of the previous window still in view)
+      + current window's count
+
+which smooths the burst a fixed window allows at its boundary (up to 2×
+the limit within a few seconds) without storing per-request timestamps.
+
+Counters are bumped with the cache's atomic `incr` (`add` seeds a new
+window), so concurrent requests can't all read the same count and slip past
+the limit together, and the window never restarts on every hit the way a
+`get` + `set(timeout=60)` pair does. The previous window's count can no
+longer change once that window has closed, so it is read from the cache
+once per process and then memoized: the steady-state cost of a check is the
+single `incr` round trip. A rejected request gives its slot back (one extra
+`decr`), so only admitted requests consume budget.
+
+`Retry-After` is computed from the same counters: the seconds until the
+estimate drops far enough to admit one more request, assuming no further
+traffic — rather than a fixed guess.
+
+    decision = ratelimit.hit('wc_verify_ip', f'{org}:{event}:{ip}', limit=120)
+    if not decision:
+        return _rate_limited(retry_after=decision.retry_after)
+
+Limits with a large budget can also opt into an in-process tier
+(`local_batch`): while a key is well below its limit — under
+`LOCAL_FRACTION` of it, judged from the last shared count this process saw
+plus its own unsynced hits — requests are admitted from a local counter
+without touching the cache. The accumulated hits are pushed to the shared
+counter in one `incr` when the key reaches the fraction, every
+`local_batch` hits, or once the process's view is `LOCAL_SYNC_SHARE` of a
+window old, whichever comes first; denials are only ever decided against
+the shared count. The sync period scales with the window rather than being
+a fixed second: a buyer polling a per-IP key every few seconds still
+syncs about once per batch, not on nearly every request.
+
+The local tier trades exactness for that round trip. A process judges its
+local admits against the shared count as of its own last sync — up to
+`LOCAL_SYNC_SHARE` of a window old, and never including the other processes'
+unsynced hits — so the headroom below the limit does not absorb anything:
+while other processes fill the key, each process can still admit up to
+`local_batch` requests the shared counter would have refused. With P
+processes hitting a key, the sliding estimate can therefore exceed the
+limit by up to P × local_batch (e.g. 120/min at batch 8 across 4 workers:
+up to 152 admitted). A process that syncs and finds the key over its limit
+admits nothing locally until the estimate has decayed back below
+`LOCAL_FRACTION` of it, so the overshoot recurs only as the window slides,
+not with every batch. Limits that must be exact pass `local_batch=0`.
+Unsynced hits left behind when a window rolls over are flushed into that
+window's counter on the key's next request.
+
+A cache outage fails open (logged): rate limits protect RPC quota, they are
+not worth taking checkout down for.
+"""
+import logging
+import math
+import os
+import threading
+import time
+from dataclasses import dataclass
+
+log = logging.getLogger(__name__)
+
+_KEY = 'pretix_eth_rl:{scope}:{key}:{window}:{index}'
+# Memoized closed-window counts; pruned of expired entries when it grows
+# past this, cleared outright if that doesn't help.
+_MEMO_MAX = 10000
+
+_memo = {}
+_memo_lock = threading.Lock()
+
+# Share of a limit below which the local tier may admit without the cache,
+# and the longest a process keeps local hits to itself, as a share of the
+# limit's window (15s for a per-minute limit).
+LOCAL_FRACTION = 0.5
+LOCAL_SYNC_SHARE = 0.25
+# `local_batch` the high-budget limits use (0 turns the local tier off).
+LOCAL_BATCH = int(os.environ.get('WC_RATE_LIMIT_LOCAL_BATCH', '8'))
+
+_local = {}
+_local_lock = threading.Lock()
+
+
+class _Local:
+    __slots__ = ('index', 'shared', 'previous', 'pending', 'synced_at')
+
+    def __init__(self, index):
+        self.index = index
+        self.shared = 0
+        self.previous = 0
+        self.pending = 0
+        self.synced_at = 0.0
+
+
+@dataclass(frozen=True)
+class RateDecision:
+    allowed: bool
+    limit: int
+    remaining: int
+    # Whole seconds until the next request would be admitted; 0 if allowed.
+    retry_after: int
+
+    def __bool__(self):
+        return self.allowed
+
+
+def _cache():
+    from django.core.cache import cache
+    return cache
+
+
+def _incr(cache, key, ttl, delta=1):
+    try:
+        return cache.incr(key, delta)
+    except ValueError:
+        if cache.add(key, delta, ttl):
+            return delta
+        return cache.incr(key, delta)
+
+
+def _previous_count(cache, key, expires_at, now):
+    with _memo_lock:
+        entry = _memo.get(key)
+    if entry is not None:
+        return entry[0]
+    count = cache.get(key) or 0
+    with _memo_lock:
+        if len(_memo) >= _MEMO_MAX:
+            for k in [k for k, (_, exp) in _memo.items() if exp <= now]:
+                del _memo[k]
+            if len(_memo) >= _MEMO_MAX:
+                _memo.clear()
+        _memo[key] = (count, expires_at)
+    return count
+
+
+def _retry_after(limit, window, previous, current, elapsed):
+    """Seconds until `previous × (1 - t/window) + current + 1 <= limit`,
+    rolling into the next window (where `current` becomes the previous
+    count) if the current window alone is already full."""
+    if current + 1 <= limit:
+        if previous <= 0:
+            return 0.0
+        need = window * (1 - (limit - current - 1) / previous)
+        return max(0.0, need - elapsed)
+    if limit < 1:
+        return float(window)
+    need = window * (1 - (limit - 1) / current) if current else 0.0
+    return (window - elapsed) + max(0.0, need)
+
+
+def _take_local(local_key, index, now, weight, limit, window, local_batch):
+    """Admit locally if this process's view of the key allows it. Returns
+    (decision or None, unsynced hits to flush: [(window index, count)])."""
+    with _local_lock:
+        state = _local.get(local_key)
+        if state is None:
+            if len(_local) >= _MEMO_MAX:
+                _local.clear()
+            state = _local[local_key] = _Local(index)
+        flush = []
+        if state.index != index:
+            if state.pending:
+                flush.append((state.index, state.pending))
+            state.index, state.shared, state.previous, state.pending = index, 0, 0, 0
+            state.synced_at = 0.0
+        elif state.pending < local_batch and now - state.synced_at < window * LOCAL_SYNC_SHARE:
+            estimate = state.previous * weight + state.shared + state.pending + 1
+            if estimate <= limit * LOCAL_FRACTION:
+                state.pending += 1
+                return RateDecision(True, limit, int(limit - estimate), 0), []
+        if state.pending:
+            flush.append((index, state.pending))
+            state.pending = 0
+        return None, flush
+
+
+def hit(scope: str, key: str, *, limit: int, window: int = 60, local_batch: int = 0) -> RateDecision:
+    """Count one request for `key` under the `scope` limit (`limit` requests
+    per sliding `window` seconds) and decide whether it is admitted. With
+    `local_batch`, up to that many requests at a time may be admitted by the
+    in-process tier (see the module docstring for the error bound)."""
+    now = time.time()
+    index = int(now // window)
+    elapsed = now - index * window
+    weight = 1 - elapsed / window
+    local_key = (scope, key, window)
+    flush = []
+    if local_batch > 0:
+        decision, flush = _take_local(local_key, index, now, weight, limit, window, local_batch)
+        if decision is not None:
+            return decision
+
+    cache = _cache()
+    current_key = _KEY.format(scope=scope, key=key, window=window, index=index)
+    previous_key = _KEY.format(scope=scope, key=key, window=window, index=index - 1)
+    try:
+        delta = 1
+        for flush_index, count in flush:
+            if flush_index == index:
+                delta += count
+            elif flush_index == index - 1:
+                _incr(cache, previous_key, 2 * window, count)
+        current = _incr(cache, current_key, 2 * window, delta)
+        previous = _previous_count(cache, previous_key, (index + 1) * window, now)
+    except Exception as e:
+        log.warning('rate limit %s: cache unavailable, failing open: %s', scope, e)
+        return RateDecision(True, limit, limit, 0)
+
+    admitted = previous * weight + current <= limit
+    if not admitted:
+        try:
+            cache.decr(current_key)
+        except Exception:
+            pass
+        current -= 1
+    if local_batch > 0:
+        with _local_lock:
+            state = _local.get(local_key)
+            if state is not None and state.index == index:
+                state.shared, state.previous, state.synced_at = current, previous, now
+    if admitted:
+        remaining = int(limit - previous * weight - current)
+        return RateDecision(True, limit, max(0, remaining), 0)
+
+    wait = _retry_after(limit, window, previous, current, elapsed)
+    return RateDecision(False, limit, 0, max(1, math.ceil(wait)))
@@ -0,0 +1,273 @@
+"""Re-screen past payers against the current OFAC list.
+
+Quote-time and settlement-time checks only cover the list as it was then;
+when OFAC later adds an address that already paid us, nothing notices.
+`rescreen_payers()` closes that gap in batch, off the request path:
+
+  1. Ingest: every distinct payer from `X402CompletedOrder.payer` and
+     `WCPaymentAttempt.payer` is streamed into `ScreenedPayer` (one
+     lowercase row per address). Per-source watermarks in the cache mean each
+     run only reads rows added since the previous one. Both rows are written
+     when the payment settles, payer included. Walletconnect
+     `OrderPayment.info_data['payer']` is only read on a full pass: the
+     payer is written there at settlement, long after the payment row was
+     created, so an id watermark would skip it — and every settlement that
+     writes it also creates a `WCPaymentAttempt`; the full pass picks up
+     payments that predate those.
+  2. Screen: newly ingested payers are intersected with the whole current
+     list; already-known payers only with the addresses the list GAINED
+     since the previously screened version (looked up via the unique index
+     on `ScreenedPayer.address`). A run therefore costs the new payers plus
+     the list diff, not the full payment history.
+     Payers seen again this run (a repeat payment) are checked against the
+     whole list too, so a flagged payer's later orders surface as well.
+  3. Record: each hit is logged once on every order it paid for
+     (`pretix_eth.ofac_rescreen_hit`; orders that already carry the entry for
+     that payer are skipped) and the payer row marked flagged, for a human to
+     review — nothing is cancelled or refunded automatically (a refund to a
+     sanctioned address is itself a violation).
+
+If the cached state (watermarks, previously screened list) is missing — first
+run, cache flushed — the run falls back to a full pass: ingest everything,
+intersect every known payer with the full list. Same result, just slower.
+
+Driven by `rescreen_payers_task` (chained after each sanctions refresh) and
+callable directly, e.g. `rescreen_payers(full=True)` from a shell.
+"""
+import json
+import logging
+import os
+import secrets
+
+from django.db.models import Max
+from django.utils import timezone
+from django_scopes import scopes_disabled
+
+from pretix_eth import sanctions
+
+log = logging.getLogger(__name__)
+
+# Watermarks + the version screened last: {'x402_completed_at', 'wc_attempt_id',
+# 'list_version'}. The list itself is kept separately (large).
+_STATE_KEY = 'pretix_eth_rescreen_state'
+_LIST_KEY = 'pretix_eth_rescreen_list'
+# Holds a per-run token; a run deletes it only while it still holds its own,
+# so one that outlives _LOCK_SECONDS can't release the next run's lock.
+_LOCK_KEY = 'pretix_eth_rescreen_lock'
+_LOCK_SECONDS = 15 * 60
+_CHUNK = 2000
+
+HIT_ACTION = 'pretix_eth.ofac_rescreen_hit'
+
+
+def _cache():
+    from django.core.cache import cache
+    return cache
+
+
+def _chunks(iterable, size=_CHUNK):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _normalize(address):
+    s = str(address or '').strip().lower()
+    return s if len(s) == 42 and s.startswith('0x') else None
+
+
+def _payment_payer(info):
+    try:
+        data = json.loads(info) if info else {}
+    except ValueError:
+        return None
+    return _normalize(data.get('payer')) if isinstance(data, dict) else None
+
+
+def _ingest(state):
+    """Stream payers added since the watermarks in `state` into
+    `ScreenedPayer` (everything, payment info included, if `state` is
+    empty). Returns (new payer addresses, every payer address read,
+    updated watermarks)."""
+    from pretix.base.models import OrderPayment
+
+    from pretix_eth.models import ScreenedPayer, WCPaymentAttempt, X402CompletedOrder
+
+    marks = dict(state)
+    seen = set()
+
+    x402 = X402CompletedOrder.objects.all()
+    if marks.get('x402_completed_at'):
+        x402 = x402.filter(completed_at__gte=marks['x402_completed_at'])
+    latest = x402.aggregate(m=Max('completed_at'))['m']
+    for payer in x402.values_list('payer', flat=True).iterator(chunk_size=_CHUNK):
+        seen.add(_normalize(payer))
+    if latest:
+        marks['x402_completed_at'] = latest.isoformat()
+
+    attempts = WCPaymentAttempt.objects.filter(id__gt=marks.get('wc_attempt_id') or 0)
+    for pk, payer in attempts.values_list('id', 'payer').order_by('id').iterator(chunk_size=_CHUNK):
+        seen.add(_normalize(payer))
+        marks['wc_attempt_id'] = pk
+
+    if not state:
+        payments = OrderPayment.objects.filter(provider='walletconnect')
+        for info in payments.values_list('info', flat=True).iterator(chunk_size=_CHUNK):
+            seen.add(_payment_payer(info))
+
+    seen.discard(None)
+    new = set()
+    for chunk in _chunks(sorted(seen)):
+        known = set(ScreenedPayer.objects.filter(address__in=chunk).values_list('address', flat=True))
+        fresh = [a for a in chunk if a not in known]
+        ScreenedPayer.objects.bulk_create([ScreenedPayer(address=a) for a in fresh], ignore_conflicts=True)
+        new.update(fresh)
+    return new, seen, marks
+
+
+def _orders_paid_by(address):
+    """Orders `address` paid for, across both flows. Only called for hits,
+    so the case-insensitive scans here run a handful of times per run."""
+    from pretix.base.models import Order, OrderPayment
+
+    from pretix_eth.models import WCPaymentAttempt, X402CompletedOrder
+
+    orders = {}
+    for event_id, code in X402CompletedOrder.objects.filter(payer__iexact=address).values_list('event_id', 'pretix_order_code'):
+        for order in Order.objects.filter(event_id=event_id, code=code):
+            orders[order.pk] = (order, 'x402')
+    # Attempts carry only the order code, which repeats across events and
+    # organizers: pin each to the order whose walletconnect payment recorded
+    # the attempt's tx hash.
+    for code, tx_hash in WCPaymentAttempt.objects.filter(payer__iexact=address).values_list('order_code', 'tx_hash'):
+        matches = Order.objects.filter(
+            code=code, payments__provider='walletconnect', payments__info__icontains=tx_hash[2:],
+        ).distinct()
+        for order in matches:
+            orders.setdefault(order.pk, (order, 'walletconnect'))
+    payments = OrderPayment.objects.filter(provider='walletconnect', info__icontains=address[2:]).select_related('order')
+    for payment in payments:
+        if _payment_payer(payment.info) == address:
+            orders.setdefault(payment.order.pk, (payment.order, 'walletconnect'))
+    return list(orders.values())
+
+
+def _already_recorded(order, address):
+    for data in order.all_logentries().filter(action_type=HIT_ACTION).values_list('data', flat=True):
+        try:
+            if json.loads(data or '{}').get('payer') == address:
+                return True
+        except (ValueError, AttributeError):
+            continue
+    return False
+
+
+def _record_hits(addresses, list_version):
+    """Log `HIT_ACTION` on every order paid by `addresses` that doesn't
+    carry it for that payer yet, and flag payers not flagged before. Returns
+    one entry per payer with anything new."""
+    from pretix_eth.models import ScreenedPayer
+
+    hits = []
+    now = timezone.now()
+    for payer in ScreenedPayer.objects.filter(address__in=sorted(addresses)).order_by('address'):
+        orders = [(o, flow) for o, flow in _orders_paid_by(payer.address)
+                  if not _already_recorded(o, payer.address)]
+        if payer.flagged_at is not None and not orders:
+            continue
+        for order, flow in orders:
+            try:
+                order.log_action(HIT_ACTION, data={
+                    'payer': payer.address, 'flow': flow, 'list_version': list_version,
+                })
+            except Exception:
+                log.exception('rescreen: failed to write %s log action for order %s', HIT_ACTION, order.code)
+        log.error('rescreen: past payer %s is now OFAC-sanctioned (orders: %s) — escalate',
+                  payer.address, ', '.join(sorted(o.code for o, _ in orders)) or 'none found')
+        if payer.flagged_at is None:
+            payer.flagged_at, payer.flagged_version = now, list_version
+            payer.save(update_fields=['flagged_at', 'flagged_version'])
+        hits.append({'payer': payer.address, 'orders': sorted(o.code for o, _ in orders)})
+    return hits
+
+
+def rescreen_payers(*, full: bool = False) -> dict:
+    """Ingest new payers and screen them (and, for list additions, all known
+    payers) against the current OFAC list. Incremental unless `full` or the
+    cached state is gone. Returns a summary; hits are also logged on their
+    orders. Skips (``{'skipped': True}``) while another run holds the lock."""
+    cache = _cache()
+    token = f'{os.getpid()}:{secrets.token_hex(8)}'
+    try:
+        if not cache.add(_LOCK_KEY, token, _LOCK_SECONDS):
+            return {'skipped': True}
+    except Exception:
+        pass
+    try:
+        with scopes_disabled():
+            return _rescreen(cache, full=full)
+    finally:
+        try:
+            if cache.get(_LOCK_KEY) == token:
+                cache.delete(_LOCK_KEY)
+        except Exception:
+            pass
+
+
+def _rescreen(cache, *, full):
+    from pretix_eth.models import ScreenedPayer
+
+    index = sanctions.get_ofac_addresses()
+    state, previous = {}, None
+    if not full:
+        try:
+            state = cache.get(_STATE_KEY) or {}
+            blob = cache.get(_LIST_KEY)
+            previous = sanctions.AddressIndex(blob) if blob else None
+        except Exception:
+            state, previous = {}, None
+        if previous is None or previous.version != state.get('list_version'):
+            state, previous = {}, None
+    mode = 'incremental' if previous is not None else 'full'
+
+    new, seen, marks = _ingest(state)
+    listed = set(index)
+    # New payers and repeat payers alike: a listed payer's latest order
+    # needs recording whether or not the payer was flagged before.
+    hits = listed.intersection(seen)
+    if previous is None:
+        screened = 0
+        for chunk in _chunks(ScreenedPayer.objects.values_list('address', flat=True).iterator(chunk_size=_CHUNK)):
+            hits.update(listed.intersection(chunk))
+            screened += len(chunk)
+        added = len(listed)
+    else:
+        delta = listed.difference(previous)
+        screened = len(seen)
+        for chunk in _chunks(sorted(delta)):
+            hits.update(ScreenedPayer.objects.filter(address__in=chunk).values_list('address', flat=True))
+        added = len(delta)
+
+    recorded = _record_hits(hits, index.version)
+    marks['list_version'] = index.version
+    try:
+        cache.set(_LIST_KEY, index.to_bytes(), None)
+        cache.set(_STATE_KEY, marks, None)
+    except Exception:
+        log.warning('rescreen: could not persist state — next run will be a full pass')
+    summary = {
+        'mode': mode,
+        'listVersion': index.version,
+        'newPayers': len(new),
+        'listAdded': added,
+        'screened': screened,
+        'hits': recorded,
+    }
+    log.info('rescreen: %s pass, list %s, %d new payer(s), %d listed address(es) checked, %d new hit(s)',
+             mode, index.version, len(new), added, len(recorded))
+    return summary
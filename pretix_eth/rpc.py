@@ -35,3 +35,10 @@ def get_rpc_url(chain_id: int, settings_key: Optional[str]) -> str:
     if key:
         return ALCHEMY_URL_TEMPLATES[chain_id].format(key=key)
     return PUBLIC_RPC_FALLBACKS[chain_id]
+
+
+def get_web3(chain_id: int, settings_key: Optional[str]):
+    """HTTP Web3 client for `chain_id` (10 s request timeout)."""
+    from web3 import Web3
+    url = get_rpc_url(chain_id, settings_key=settings_key)
+    return Web3(Web3.HTTPProvider(url, request_kwargs={'timeout': 10}))
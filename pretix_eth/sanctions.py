@@ -16,18 +16,49 @@ keypair on every chain — so we union every ticker list that contains 0x
 addresses (the ETH file alone misses addresses listed only under
 ARB/USDC/USDT/BSC/ETC). Same source as devcon's `src/scripts/ofac-scan.ts`.
 
-Availability: the fetched union is cached (Django cache) for 24h, a last-good
-copy is kept without expiry, and a static snapshot is bundled below — so
+Representation: each list is an `AddressIndex` — sorted 20-byte addresses
+in one buffer, binary-searched. The shared Django cache holds the index as a
+single blob (kept without expiry, so it doubles as the last-good copy) plus a
+short version hash that expires after 24h; workers poll only the version.
+
+Per host, the index also lives in a snapshot file (`<list>.idx` under
+`_snapshot_dir()`: a small header with the version and count, then the
+records) that every worker `mmap`s read-only — the list costs memory once
+per host instead of once per worker, and a restarted worker screens from the
+file without downloading anything. Updates are written to a temp file and
+`os.replace`d into place; workers notice the new inode on their next
+version check and remap (the old mapping is released once no lookup holds
+it). The first worker on a host to see a version it has no file for writes
+the file from the cache blob, so hosts without a refresher converge too.
+
+Refresh: `refresh_lists()` downloads and publishes both lists through one
+`_ListManager` per list (single-flight per process and, via a `cache.add`
+lock, across processes and hosts; last-good copy; retry window; metrics for
+`/plugin/admin/sanctions/`). It runs from
+the hourly `periodic_task` receiver (signals.py →
+`refresh_sanctions_lists_task`) and the `refresh_sanctions_lists` management
+command (run it once at deploy to seed a cold cache). Request-path checks
+(`is_sanctioned` / `is_scam_flagged`) only ever read: memo → published copy →
+bundled snapshot, so no buyer request stalls on a GitHub download. Workers
+pick up a newly published version within `_VERSION_CHECK_SECONDS`.
+
+Availability: the version marks the fetched union fresh for 24h, the
+last-good blob outlives it, and a static snapshot is bundled below — so
 screening never fails open to "unknown", and a GitHub outage never blocks
-checkout. The bundled snapshot only grows monotonically stale; the fetch
-refreshes it whenever it succeeds.
+checkout. The bundled snapshot only grows monotonically stale; the refresher
+supersedes it whenever a fetch succeeds.
 
 The ScamSniffer community blacklist (refund warnings only, NOT used for buyer
 screening: false positives there would block legitimate buyers) is fetched
-the same way but has no bundled fallback — on total fetch failure scam
-screening fails open (returns False) with a loud log line.
+the same way but has no bundled fallback — until a copy has been published,
+scam screening fails open (returns False) with a loud log line.
 """
+import hashlib
 import logging
+import mmap
+import os
+import secrets
+import struct
 import threading
 import time
 
@@ -45,140 +76,527 @@ _CACHE_FRESH_SECONDS = 24 * 3600
 # a full freshness window — a single GitHub blip must not degrade screening
 # to the bundled snapshot (or disable scam checks) for 24h.
 _FAILURE_RETRY_SECONDS = 300
-# Short timeout: these fetches sit on the buyer checkout path (create_quote /
-# verify) when caches are cold. 6 tickers x this timeout is the worst-case
-# inline stall for the ONE request that does the refresh.
+# How often a worker asks the shared cache whether the published list
+# version changed. One tiny `get` per list per minute; the (large) index
+# blob is only transferred when the version actually moved.
+_VERSION_CHECK_SECONDS = 60
+# Per-request timeout for the list downloads. Refreshes run in the periodic
+# task / management command, never inline in a buyer request; the ticker
+# lists are fetched concurrently, so this also bounds a whole OFAC refresh.
 _FETCH_TIMEOUT = 5
 
-# Single-flight: only one thread per process refreshes; everyone else serves
-# whatever they have (stale memo, last-good cache, bundled fallback) without
-# blocking. Prevents a cold-cache thundering herd during an on-sale.
-_refresh_lock = threading.Lock()
+# Shared-cache layout per list: the index blob (no expiry — it doubles as
+# the last-good copy) and its version hash (expires after the freshness
+# window; its absence is what triggers a refresh).
+_OFAC_INDEX_KEY = 'pretix_eth_ofac_index'
+_OFAC_VERSION_KEY = 'pretix_eth_ofac_version'
+_SCAM_INDEX_KEY = 'pretix_eth_scam_index'
+_SCAM_VERSION_KEY = 'pretix_eth_scam_version'
+# Per-ticker conditional-GET state: {etag, last_modified, addresses}.
+_OFAC_TICKER_KEY = 'pretix_eth_ofac_ticker:{ticker}'
+
+# Cross-process single-flight: a refresher holds this cache key (via `add`)
+# while downloading, so concurrent periodic runs on other workers/hosts skip
+# instead of each pulling the list. Expires on its own if the holder dies;
+# the value is a per-run token, and the holder deletes the key only while it
+# still holds that token, so a download that outlives the lock can't release
+# the lock a later refresher has since taken.
+_REFRESH_LOCK_KEY = 'pretix_eth_sanctions_refresh:{name}'
+_REFRESH_LOCK_SECONDS = 120
 
 # Module-level memo so a cache backend miss doesn't mean a refetch per
-# request within one process.
+# request within one process. `*_at` is when the memo was last confirmed
+# against the shared cache.
 _memo = {'ofac': None, 'ofac_at': 0.0, 'scam': None, 'scam_at': 0.0}
 
+_ADDRESS_BYTES = 20
+
+# Snapshot file header: magic, 16-char version, record count (little-endian).
+_SNAPSHOT_MAGIC = b'PXETHSN1'
+_SNAPSHOT_HEADER = struct.Struct('<8s16sQ')
+
+# list name → ((st_ino, st_mtime_ns, st_size), AddressIndex) of the snapshot
+# file this process currently has mapped.
+_snapshots = {}
+
+
+def _address_key(address):
+    """20-byte form of a `0x`-prefixed hex address, or None if it isn't one.
+    `bytes.fromhex` is case-insensitive, so no lower() round trip."""
+    s = str(address).strip()
+    if len(s) != 42 or s[:2] not in ('0x', '0X'):
+        return None
+    try:
+        return bytes.fromhex(s[2:])
+    except ValueError:
+        return None
+
+
+class AddressIndex:
+    """A set of EVM addresses stored as sorted, de-duplicated 20-byte records
+    in one contiguous buffer, with binary-search membership.
+
+    Versus a frozenset of 42-char strings this is ~20 bytes per address
+    instead of ~130, crosses the cache as a single bytes blob (no per-entry
+    pickling), and a lookup builds no strings or sets — just the 20-byte key
+    and slice comparisons. `version` is a content hash, so workers can tell
+    whether a published blob differs from what they already hold without
+    transferring it.
+
+    The buffer may be `bytes` or a read-only `mmap` (see `from_snapshot`);
+    both return `bytes` from slicing, so lookups are the same either way."""
+
+    __slots__ = ('_buf', '_off', '_n', '_version')
+
+    def __init__(self, buf=b'', *, offset=0, version=None):
+        size = len(buf) - offset
+        if size < 0 or size % _ADDRESS_BYTES:
+            raise ValueError('address index length is not a multiple of 20')
+        self._buf = buf
+        self._off = offset
+        self._n = size // _ADDRESS_BYTES
+        self._version = version
+
+    @classmethod
+    def from_addresses(cls, addresses) -> 'AddressIndex':
+        keys = {k for k in map(_address_key, addresses) if k is not None}
+        return cls(b''.join(sorted(keys)))
+
+    @classmethod
+    def from_snapshot(cls, buf) -> 'AddressIndex':
+        """Index over a snapshot file's contents (header + records) without
+        copying them. The version comes from the header, so a mapped index
+        is never hashed."""
+        if len(buf) < _SNAPSHOT_HEADER.size:
+            raise ValueError('snapshot too short')
+        magic, version, count = _SNAPSHOT_HEADER.unpack(buf[:_SNAPSHOT_HEADER.size])
+        if magic != _SNAPSHOT_MAGIC:
+            raise ValueError('not a sanctions snapshot')
+        if len(buf) != _SNAPSHOT_HEADER.size + count * _ADDRESS_BYTES:
+            raise ValueError('snapshot size does not match its header')
+        return cls(buf, offset=_SNAPSHOT_HEADER.size, version=version.decode('ascii'))
+
+    def snapshot_header(self) -> bytes:
+        return _SNAPSHOT_HEADER.pack(_SNAPSHOT_MAGIC, self.version.encode('ascii'), self._n)
+
+    @property
+    def version(self) -> str:
+        if self._version is None:
+            self._version = hashlib.sha256(self.to_bytes()).hexdigest()[:16]
+        return self._version
+
+    def to_bytes(self) -> bytes:
+        if self._off == 0 and isinstance(self._buf, bytes):
+            return self._buf
+        return bytes(self._buf[self._off:self._off + self._n * _ADDRESS_BYTES])
+
+    def __len__(self):
+        return self._n
+
+    def __iter__(self):
+        buf, off = self._buf, self._off
+        for i in range(self._n):
+            start = off + i * _ADDRESS_BYTES
+            yield '0x' + buf[start:start + _ADDRESS_BYTES].hex()
+
+    def __contains__(self, address) -> bool:
+        key = address if isinstance(address, bytes) else _address_key(address)
+        if key is None or len(key) != _ADDRESS_BYTES:
+            return False
+        buf, off, lo, hi = self._buf, self._off, 0, self._n
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start = off + mid * _ADDRESS_BYTES
+            probe = buf[start:start + _ADDRESS_BYTES]
+            if probe < key:
+                lo = mid + 1
+            elif probe > key:
+                hi = mid
+            else:
+                return True
+        return False
+
 
 def _cache():
     from django.core.cache import cache
     return cache
 
 
-def _fetch_ofac_union():
-    import requests
-    addresses = set()
-    for ticker in _OFAC_EVM_TICKERS:
-        resp = requests.get(_OFAC_URL.format(ticker=ticker), timeout=_FETCH_TIMEOUT)
-        resp.raise_for_status()
-        for line in resp.text.splitlines():
-            addr = line.strip().lower()
-            if addr.startswith('0x') and len(addr) == 42:
-                addresses.add(addr)
-    if not addresses:
-        raise ValueError('OFAC fetch returned no addresses')
-    return frozenset(addresses)
+def _snapshot_dir():
+    """Directory for the per-host snapshot files: `PRETIX_ETH_SANCTIONS_DIR`
+    if set, else `<DATA_DIR>/pretix_eth_sanctions`. None disables the file
+    layer (the cache blob is then held per worker, as before)."""
+    from django.conf import settings
+    configured = os.environ.get('PRETIX_ETH_SANCTIONS_DIR') or getattr(settings, 'PRETIX_ETH_SANCTIONS_DIR', None)
+    if configured:
+        return configured
+    data_dir = getattr(settings, 'DATA_DIR', None)
+    return os.path.join(data_dir, 'pretix_eth_sanctions') if data_dir else None
+
+
+def _snapshot_path(name):
+    directory = _snapshot_dir()
+    return os.path.join(directory, name + '.idx') if directory else None
+
+
+def _load_snapshot(name):
+    """The mapped snapshot for list `name`, or None if there is no (valid)
+    file. One `stat` when the file is unchanged; a replaced file (new inode)
+    is mapped afresh and the previous mapping left to the GC — a lookup
+    still running against it keeps it alive until it finishes."""
+    path = _snapshot_path(name)
+    if path is None:
+        return None
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    ident = (st.st_ino, st.st_mtime_ns, st.st_size)
+    mapped = _snapshots.get(name)
+    if mapped is not None and mapped[0] == ident:
+        return mapped[1]
+    try:
+        with open(path, 'rb') as f:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        index = AddressIndex.from_snapshot(buf)
+    except (OSError, ValueError) as e:
+        log.warning('sanctions: ignoring unreadable snapshot %s (%s)', path, e)
+        return None
+    _snapshots[name] = (ident, index)
+    return index
 
 
-def _best_known_ofac():
-    """Best non-fresh source, cheapest first: memoized set, last-good cache
-    copy (stored without expiry), bundled snapshot."""
-    if _memo['ofac'] is not None:
-        return _memo['ofac']
+def _write_snapshot(name, index: AddressIndex):
+    """Atomically (temp file + `os.replace`) write `index` as the snapshot
+    for `name` and return it mapped. Returns None if the file layer is off
+    or the write failed — callers then keep the in-memory index."""
+    path = _snapshot_path(name)
+    if path is None:
+        return None
+    tmp = '%s.%d.%d.tmp' % (path, os.getpid(), threading.get_ident())
     try:
-        last_good = _cache().get('pretix_eth_ofac_addresses_lastgood')
-        if last_good:
-            return frozenset(last_good)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp, 'wb') as f:
+            f.write(index.snapshot_header())
+            f.write(index.to_bytes())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except OSError as e:
+        log.warning('sanctions: could not write snapshot %s (%s)', path, e)
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        return None
+    return _load_snapshot(name)
+
+
+def _read_published(index_key, version_key, memo_key, now):
+    """Sync the memo with the shared cache. Returns (index, fresh): the index
+    to serve (None if nothing is known) and whether the published version is
+    still inside its freshness window. Prefers the host's snapshot file; the
+    cache blob is only transferred when the file is missing or behind, and
+    is then written to the file for the host's other workers."""
+    current = _memo[memo_key]
+    try:
+        version = _cache().get(version_key)
+        cache_ok = True
     except Exception:
-        pass
-    return _OFAC_FALLBACK
+        version, cache_ok = None, False
+    if version and current is not None and current.version == version:
+        _memo[memo_key + '_at'] = now
+        return current, True
+    snapshot = _load_snapshot(memo_key)
+    if version and snapshot is not None and snapshot.version == version:
+        _memo[memo_key], _memo[memo_key + '_at'] = snapshot, now
+        return snapshot, True
+    if snapshot is not None:
+        # File present but the published version is unknown or newer: the
+        # file is still a better last-good copy than the one in memory.
+        current = snapshot
+    blob = None
+    if cache_ok and (version or snapshot is None):
+        try:
+            blob = _cache().get(index_key)
+        except Exception:
+            blob = None
+    if blob:
+        try:
+            published = AddressIndex(blob)
+        except ValueError:
+            pass
+        else:
+            if version and published.version == version:
+                published = _write_snapshot(memo_key, published) or published
+                _memo[memo_key], _memo[memo_key + '_at'] = published, now
+                return published, True
+            if snapshot is None:
+                current = published
+    if current is not None:
+        _memo[memo_key] = current
+    return current, False
 
 
-def get_ofac_addresses():
-    """The current OFAC EVM address set. Never raises and never blocks more
-    than one thread per process: falls back to the last-good copy, then to
-    the bundled snapshot."""
-    now = time.time()
-    if _memo['ofac'] is not None and now - _memo['ofac_at'] < _CACHE_FRESH_SECONDS:
-        return _memo['ofac']
-    cached = None
+def _publish(name, index_key, version_key, index: AddressIndex) -> AddressIndex:
+    """Publish `index` to the shared cache and this host's snapshot file.
+    Returns the index to memoize (the mapped one when the file was written)."""
     try:
-        cached = _cache().get('pretix_eth_ofac_addresses')
+        _cache().set(index_key, index.to_bytes(), None)
+        _cache().set(version_key, index.version, _CACHE_FRESH_SECONDS)
     except Exception:
         pass
-    if cached:
-        _memo['ofac'], _memo['ofac_at'] = frozenset(cached), now
-        return _memo['ofac']
-    # Cold or expired: exactly one thread refreshes; the rest serve the best
-    # known copy immediately.
-    if not _refresh_lock.acquire(blocking=False):
-        return _best_known_ofac()
+    return _write_snapshot(name, index) or index
+
+
+def _fetch_ofac_ticker(ticker):
+    """One ticker list, conditionally. The last 200 body's addresses and its
+    ETag / Last-Modified live in the cache (no expiry); a 304 reuses them, so
+    an unchanged list costs a header round trip instead of a download."""
+    import requests
+    state_key = _OFAC_TICKER_KEY.format(ticker=ticker)
+    try:
+        state = _cache().get(state_key)
+    except Exception:
+        state = None
+    headers = {}
+    if state and state.get('addresses') is not None:
+        if state.get('etag'):
+            headers['If-None-Match'] = state['etag']
+        if state.get('last_modified'):
+            headers['If-Modified-Since'] = state['last_modified']
+    resp = requests.get(_OFAC_URL.format(ticker=ticker), headers=headers, timeout=_FETCH_TIMEOUT)
+    if resp.status_code == 304 and headers:
+        return state['addresses']
+    resp.raise_for_status()
+    addresses = []
+    for line in resp.text.splitlines():
+        addr = line.strip().lower()
+        if addr.startswith('0x') and len(addr) == 42:
+            addresses.append(addr)
     try:
-        fresh = _fetch_ofac_union()
+        _cache().set(state_key, {
+            'etag': resp.headers.get('ETag'),
+            'last_modified': resp.headers.get('Last-Modified'),
+            'addresses': addresses,
+        }, None)
+    except Exception:
+        pass
+    return addresses
+
+
+def _fetch_ofac_union():
+    """Union of every OFAC EVM ticker list, fetched concurrently — the
+    refresh costs the slowest single request, not the sum. Any ticker
+    failing fails the refresh (callers fall back to the last-good union)
+    rather than publishing a silently partial list."""
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=len(_OFAC_EVM_TICKERS)) as pool:
+        per_ticker = list(pool.map(_fetch_ofac_ticker, _OFAC_EVM_TICKERS))
+    addresses = set()
+    for ticker_addresses in per_ticker:
+        addresses.update(ticker_addresses)
+    if not addresses:
+        raise ValueError('OFAC fetch returned no addresses')
+    return frozenset(addresses)
+
+
+def _fetch_scam_list():
+    import requests
+    resp = requests.get(_SCAM_URL, timeout=_FETCH_TIMEOUT)
+    resp.raise_for_status()
+    return [a for a in resp.json() if str(a).startswith('0x')]
+
+
+class _ListManager:
+    """Refresh and read-path machinery shared by the OFAC and ScamSniffer
+    lists: single-flight refresh (a per-process lock plus a cross-process
+    cache lock — a concurrent caller gets the current copy instead of
+    starting another download), publish to cache + snapshot file, read via
+    memo → snapshot/cache → `fallback`, a short retry window while nothing
+    fresh is published, and per-list metrics.
+
+    State lives in the module-level `_memo` under `name` / `name + '_at'`;
+    the metrics are this process's view."""
+
+    def __init__(self, name, label, index_key, version_key, fetch, fallback=None):
+        self.name = name
+        self.label = label
+        self.index_key = index_key
+        self.version_key = version_key
+        self._fetch = fetch
+        self.fallback = fallback
+        self._lock = threading.Lock()
+        self.fresh = False
+        self.checked_at = None
+        self.refreshes = 0
+        self.refresh_failures = 0
+        self.refresh_skips = 0
+        self.last_refresh_at = None
+        self.last_refresh_seconds = None
+        self.last_error = None
+        self.last_error_at = None
+
+    def get(self):
+        """The index to screen against. Read-only and never raises; None
+        only for a list without a fallback that was never published."""
+        now = time.time()
+        if _memo[self.name] is not None and now - _memo[self.name + '_at'] < _VERSION_CHECK_SECONDS:
+            return _memo[self.name]
+        known, fresh = _read_published(self.index_key, self.version_key, self.name, now)
+        self.fresh, self.checked_at = fresh, now
+        if known is None:
+            known = self.fallback
+        if not fresh and known is not None:
+            # Nothing fresh published (refresher not run yet, or failing):
+            # serve the best copy and look again after the retry interval.
+            _memo[self.name], _memo[self.name + '_at'] = known, now - _VERSION_CHECK_SECONDS + _FAILURE_RETRY_SECONDS
+        return known
+
+    def published_version(self):
         try:
-            _cache().set('pretix_eth_ofac_addresses', list(fresh), _CACHE_FRESH_SECONDS)
-            _cache().set('pretix_eth_ofac_addresses_lastgood', list(fresh), None)
+            return _cache().get(self.version_key)
         except Exception:
-            pass
-        _memo['ofac'], _memo['ofac_at'] = fresh, now
-        log.info('sanctions: refreshed OFAC EVM list (%d addresses)', len(fresh))
-        return fresh
-    except Exception as e:
-        best = _best_known_ofac()
-        log.warning('sanctions: OFAC list fetch failed (%s) — serving %d known addresses, retry in %ds',
-                    e, len(best), _FAILURE_RETRY_SECONDS)
-        # Memoize with a short freshness window so the next request after the
-        # retry interval attempts a fresh fetch, not 24h later.
-        _memo['ofac'], _memo['ofac_at'] = best, now - _CACHE_FRESH_SECONDS + _FAILURE_RETRY_SECONDS
-        return best
-    finally:
-        _refresh_lock.release()
+            return None
+
+    def refresh(self):
+        """Fetch, publish and memoize the list. Raises on fetch failure (the
+        published copy stays in place). If a refresh of this list is already
+        running — in this process or, per the cache lock, anywhere else — the
+        current copy is returned instead of downloading again."""
+        if not self._lock.acquire(blocking=False):
+            return self._skip()
+        lock_key = _REFRESH_LOCK_KEY.format(name=self.name)
+        token = f'{os.getpid()}:{secrets.token_hex(8)}'
+        try:
+            try:
+                held_elsewhere = not _cache().add(lock_key, token, _REFRESH_LOCK_SECONDS)
+            except Exception:
+                held_elsewhere = False  # no shared cache → nothing to coordinate with
+            if held_elsewhere:
+                return self._skip()
+            t0 = time.monotonic()
+            try:
+                index = _publish(self.name, self.index_key, self.version_key,
+                                 AddressIndex.from_addresses(self._fetch()))
+            except Exception as e:
+                self.refresh_failures += 1
+                self.last_error, self.last_error_at = str(e), time.time()
+                raise
+            finally:
+                try:
+                    if _cache().get(lock_key) == token:
+                        _cache().delete(lock_key)
+                except Exception:
+                    pass
+            now = time.time()
+            _memo[self.name], _memo[self.name + '_at'] = index, now
+            self.fresh, self.checked_at = True, now
+            self.refreshes += 1
+            self.last_refresh_at, self.last_refresh_seconds = now, time.monotonic() - t0
+            log.info('sanctions: refreshed %s list (%d addresses, version %s)', self.label, len(index), index.version)
+            return index
+        finally:
+            self._lock.release()
+
+    def _skip(self):
+        self.refresh_skips += 1
+        known = self.get()
+        return known if known is not None else AddressIndex()
+
+    def metrics(self) -> dict:
+        served = _memo[self.name]
+        if served is None:
+            source = None
+        elif served is self.fallback:
+            source = 'bundled'
+        elif _snapshots.get(self.name, (None, None))[1] is served:
+            source = 'snapshot'
+        else:
+            source = 'memory'
+        return {
+            'publishedVersion': self.published_version(),
+            'servedVersion': served.version if served is not None else None,
+            'addresses': len(served) if served is not None else 0,
+            'source': source,
+            'fresh': self.fresh,
+            'checkedAt': self.checked_at,
+            'refreshes': self.refreshes,
+            'refreshFailures': self.refresh_failures,
+            'refreshSkips': self.refresh_skips,
+            'lastRefreshAt': self.last_refresh_at,
+            'lastRefreshSeconds': self.last_refresh_seconds,
+            'lastError': self.last_error,
+            'lastErrorAt': self.last_error_at,
+        }
+
+
+def refresh_ofac() -> AddressIndex:
+    """Fetch the OFAC union, publish it and install it in this process.
+    Raises on fetch failure; single-flight (see `_ListManager.refresh`)."""
+    return _OFAC.refresh()
+
+
+def refresh_scam_list() -> AddressIndex:
+    """Same as `refresh_ofac` for the ScamSniffer blacklist."""
+    return _SCAM.refresh()
+
+
+def refresh_lists(*, force: bool = False) -> dict:
+    """Refresh every list whose published version has expired (or all of
+    them with `force`). Driven by the periodic task and the
+    `refresh_sanctions_lists` management command — never by a request.
+    Returns a per-list summary; a failing list is reported, not raised, so
+    one source being down doesn't stop the other from refreshing."""
+    summary = {}
+    for lst in _LISTS:
+        if not force:
+            published = lst.published_version()
+            if published:
+                summary[lst.name] = {'refreshed': False, 'version': published}
+                continue
+        try:
+            refreshes = lst.refreshes
+            index = lst.refresh()
+            summary[lst.name] = {'refreshed': lst.refreshes > refreshes, 'version': index.version, 'addresses': len(index)}
+        except Exception as e:
+            log.warning('sanctions: %s list refresh failed (%s)', lst.name, e)
+            summary[lst.name] = {'refreshed': False, 'error': str(e)}
+    return summary
+
+
+def get_list_metrics() -> dict:
+    """Per-list freshness, size and refresh counters (this process's view)."""
+    return {lst.name: lst.metrics() for lst in _LISTS}
+
+
+def get_ofac_addresses() -> AddressIndex:
+    """The current OFAC EVM address index. Read-only and never raises: the
+    published (fresh or last-good) copy, else the bundled snapshot. Lists
+    are fetched by `refresh_lists`, off the request path."""
+    return _OFAC.get()
 
 
 def is_sanctioned(address) -> bool:
     """True if `address` is on the OFAC SDN list. Empty/None → False."""
     if not address:
         return False
-    return str(address).strip().lower() in get_ofac_addresses()
+    return address in get_ofac_addresses()
 
 
 def is_scam_flagged(address) -> bool:
     """True if `address` is on the ScamSniffer community blacklist.
-    Fails OPEN (False + warning log) if the list cannot be fetched — this
-    list only gates refund warnings, never buyer checkout."""
+    Fails OPEN (False + warning log) if no copy has been published yet —
+    this list only gates refund warnings, never buyer checkout."""
     if not address:
         return False
-    addr = str(address).strip().lower()
-    now = time.time()
-    if _memo['scam'] is not None and now - _memo['scam_at'] < _CACHE_FRESH_SECONDS:
-        return addr in _memo['scam']
-    cached = None
-    try:
-        cached = _cache().get('pretix_eth_scam_addresses')
-    except Exception:
-        pass
-    if cached:
-        _memo['scam'], _memo['scam_at'] = frozenset(cached), now
-        return addr in _memo['scam']
-    try:
-        import requests
-        resp = requests.get(_SCAM_URL, timeout=_FETCH_TIMEOUT)
-        resp.raise_for_status()
-        entries = frozenset(str(a).strip().lower() for a in resp.json() if str(a).startswith('0x'))
-        try:
-            _cache().set('pretix_eth_scam_addresses', list(entries), _CACHE_FRESH_SECONDS)
-        except Exception:
-            pass
-        _memo['scam'], _memo['scam_at'] = entries, now
-        log.info('sanctions: refreshed ScamSniffer list (%d addresses)', len(entries))
-        return addr in entries
-    except Exception as e:
-        log.warning('sanctions: ScamSniffer fetch failed (%s) — scam screening fails open, retry in %ds',
-                    e, _FAILURE_RETRY_SECONDS)
-        # Short failure memo: one blip must not disable scam screening for 24h.
-        _memo['scam'], _memo['scam_at'] = frozenset(), now - _CACHE_FRESH_SECONDS + _FAILURE_RETRY_SECONDS
-        return False
-
+    known = _SCAM.get()
+    if known is None:
+        log.warning('sanctions: no ScamSniffer list published yet — scam screening fails open, '
+                    'retry in %ds (run `refresh_sanctions_lists`)', _FAILURE_RETRY_SECONDS)
+        known = AddressIndex()
+        _memo['scam'], _memo['scam_at'] = known, time.time() - _VERSION_CHECK_SECONDS + _FAILURE_RETRY_SECONDS
+    return address in known
 
 # Bundled snapshot of the OFAC EVM union (2026-08-12, 104 addresses).
 # Refresh with: devcon `pnpm ofac:scan` sources, or re-run the fetch above.
@@ -288,3 +706,11 @@ _OFAC_FALLBACK = frozenset([
     '0xfda1ec4a6178d4916b001a065422d31ebe5f62ff',
     '0xfec8a60023265364d066a1212fde3930f6ae8da7',
 ])
+
+_OFAC_FALLBACK_INDEX = AddressIndex.from_addresses(_OFAC_FALLBACK)
+
+_OFAC = _ListManager('ofac', 'OFAC EVM', _OFAC_INDEX_KEY, _OFAC_VERSION_KEY,
+                     lambda: _fetch_ofac_union(), fallback=_OFAC_FALLBACK_INDEX)
+_SCAM = _ListManager('scam', 'ScamSniffer', _SCAM_INDEX_KEY, _SCAM_VERSION_KEY,
+                     lambda: _fetch_scam_list())
+_LISTS = (_OFAC, _SCAM)
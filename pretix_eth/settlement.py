@@ -0,0 +1,473 @@
+"""Asynchronous settlement of WalletConnect payments.
+
+`/plugin/wc/verify/` used to run the whole settlement inside the buyer's
+request: on-chain verification (several RPC round trips), the settlement-time
+signer and OFAC re-checks, the row-locked claim and `payment.confirm()`, which
+renders and sends the order-paid email. Now verify only validates the request
+and submits a settlement job; `settle_wc_payment_task` does the rest on a
+Celery worker and records its progress on the job's `WCSettlementJob` row:
+
+    pending → confirming (n/N) → settled
+                               ↘ failed
+
+One job per (quote_id, tx_hash). `submit()` is idempotent — re-posting the
+same pair returns the job's current state instead of starting another one —
+and the status resource (`/plugin/wc/verify/status/`) only reads the job
+state, through a short-lived cache copy so that polling clients don't each
+hit the database. While the tx is still short of its confirmations (or the RPC lags),
+the task re-schedules itself about once a block until `SETTLE_DEADLINE`
+after submission, after which the job fails as "not confirmed in time".
+RPC trouble on our side (including a signer re-check that cannot reach the
+chain) is waited out the same way, and a job that failed only because of
+it is started over when the buyer re-posts verify.
+
+Clients can also wait on a job instead of polling it: `watch()` yields the
+state each time a writer saves a new version of it, which the status
+resource serves as a long poll (`?wait=`) or a server-sent-event stream.
+
+The row is the job record; every write goes through it under a row lock,
+so the job works the same with Pretix's default dummy cache. Settlement
+itself stays one-time through the `WCPaymentAttempt.tx_hash` unique
+constraint, as before. If a job stops
+moving — its worker died, or the deployment has no Celery broker and Pretix
+runs tasks eagerly in-process, where a task cannot re-schedule itself — the
+next verify or status request that finds it overdue enqueues it again. Each
+enqueue carries a fresh run token recorded in the state; a task whose token
+is no longer the current one stops without re-scheduling, so a kick
+replaces a lagging chain of retries instead of adding a second one.
+Finished (and abandoned) jobs are deleted a day after their last write.
+"""
+import logging
+from datetime import timedelta
+import os
+import secrets
+import time
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.utils.timezone import now as tz_now
+from django_scopes import scopes_disabled
+
+from pretix_eth import rpc
+from pretix_eth.verification import revalidate_quote_signer, verify_erc20_transfer, verify_native_eth
+from pretix_eth.wcconfig import check_wc_config
+
+log = logging.getLogger(__name__)
+
+PENDING = 'pending'
+CONFIRMING = 'confirming'
+SETTLED = 'settled'
+FAILED = 'failed'
+TERMINAL = (SETTLED, FAILED)
+
+SETTLE_DEADLINE = int(os.environ.get('WC_SETTLE_DEADLINE_SECONDS', '1800'))
+# How long an in-flight job may sit past its next scheduled check before a
+# verify/status request re-enqueues it (with a broker; eager runs use 0).
+SETTLE_STALL_SECONDS = 30
+# Finished jobs stay readable this long for late status polls.
+_STATE_TTL = 24 * 3600
+# Lifetime of the cached copy of a job's state that status reads are served
+# from. Writers refresh it; it only bounds how stale a copy another writer's
+# lost update can leave behind.
+_READ_CACHE_SECONDS = 2
+_KEY = 'pretix_eth_wc_settle:{quote_id}:{tx_hash}'
+
+# Seconds between checks while confirming: about once a block, floored at
+# 2 s, and half an L1 block on Ethereum (receipt indexing lags the block).
+_RECHECK_SECONDS = {1: 6, 10: 2, 137: 2, 8453: 2, 42161: 2}
+
+# How often a watcher re-reads the job state. The writers are the settlement
+# task and the stall kicks; neither the row nor its cached copy has a change
+# notification to wait on.
+WATCH_INTERVAL = 0.5
+
+# Errors raised by our own RPC access rather than by the tx or the quote.
+_INFRA = (
+    'RPC error', 'failed to fetch block timestamp',
+    'signer re-check web3 error', 'signer re-check errored', 'signer code re-check errored',
+)
+# Verification errors that clear up by waiting rather than failing the job.
+_TRANSIENT = _INFRA + ('tx not mined yet', 'insufficient confirmations')
+_DEADLINE_ERROR = 'transaction not confirmed in time'
+
+
+def _key(quote_id, tx_hash):
+    return _KEY.format(quote_id=quote_id, tx_hash=tx_hash)
+
+
+def get_state(quote_id: str, tx_hash: str) -> Optional[dict]:
+    """The job's state as last written, from the cached copy if there is
+    one."""
+    state = cache.get(_key(quote_id, tx_hash))
+    if state is None:
+        state = _load(quote_id, tx_hash)
+        if state is not None:
+            cache.set(_key(quote_id, tx_hash), state, _READ_CACHE_SECONDS)
+    return state
+
+
+def _load(quote_id, tx_hash, *, lock=False):
+    from pretix_eth.models import WCSettlementJob
+    qs = WCSettlementJob.objects.filter(quote_id=quote_id, tx_hash=tx_hash)
+    if lock:
+        qs = qs.select_for_update()
+    return qs.values_list('data', flat=True).first()
+
+
+def _store(state):
+    """Write `state` to the job's row (creating it if need be) and refresh
+    the cached copy. Callers hold the row lock."""
+    from pretix_eth.models import WCSettlementJob
+    WCSettlementJob.objects.update_or_create(
+        quote_id=state['quote_id'], tx_hash=state['tx_hash'],
+        defaults={'state': state['state'], 'data': state},
+    )
+    cache.set(_key(state['quote_id'], state['tx_hash']), state, _READ_CACHE_SECONDS)
+    return state
+
+
+def _save(state):
+    with transaction.atomic():
+        current = _load(state['quote_id'], state['tx_hash'], lock=True)
+        # A duplicate run (a re-enqueued job racing the original) must not
+        # report a failure over the run that already settled the payment.
+        if current is not None and current['state'] == SETTLED:
+            return current
+        # Only a kick hands the job to a new run (`_kick_if_stalled`); a run
+        # saving its progress keeps whichever token is current.
+        if current is not None and current.get('run'):
+            state['run'] = current['run']
+        state['updated_at'] = int(time.time())
+        state['version'] = int((current or state).get('version') or 0) + 1
+        return _store(state)
+
+
+def _new_state(quote_id, tx_hash, chain_id, order_code=None):
+    now = int(time.time())
+    return {
+        'quote_id': quote_id, 'tx_hash': tx_hash, 'chain_id': chain_id, 'order_code': order_code,
+        'state': PENDING, 'confirmations': None, 'confirmations_required': None,
+        'error': None, 'http_status': None, 'block_number': None,
+        'submitted_at': now, 'next_check_at': now, 'updated_at': now, 'version': 1,
+        'run': secrets.token_hex(8),
+    }
+
+
+def _enqueue(state):
+    from pretix_eth.tasks import settle_wc_payment_task
+    settle_wc_payment_task.apply_async(
+        args=(state['quote_id'], state['tx_hash'], state['chain_id']),
+        kwargs={'run': state['run']},
+    )
+
+
+def _kick_if_stalled(state):
+    """Re-enqueue a job that is past its next check. With a broker that
+    only publishes a task, after `SETTLE_STALL_SECONDS` of grace. Without
+    one the task runs eagerly, i.e. the whole settlement check (RPC,
+    row lock, `payment.confirm()`) runs inside the calling request as soon
+    as the job is due. The kick hands the job to a new run and moves its
+    next check on under the row lock, which keeps that to one caller per
+    job every 2 s however many requests or watchers are polling it."""
+    if state['state'] in TERMINAL:
+        return
+    grace = SETTLE_STALL_SECONDS if getattr(settings, 'HAS_CELERY', False) else 0
+    if time.time() < state.get('next_check_at', 0) + grace:
+        return
+    with transaction.atomic():
+        current = _load(state['quote_id'], state['tx_hash'], lock=True)
+        if current is None or current['state'] in TERMINAL:
+            return
+        now = time.time()
+        if now < current.get('next_check_at', 0) + grace:
+            return
+        current = _store(dict(
+            current, run=secrets.token_hex(8), updated_at=int(now),
+            next_check_at=int(now) + max(grace, 2),
+            version=int(current.get('version') or 0) + 1,
+        ))
+    _enqueue(current)
+
+
+def submit(*, quote_id: str, tx_hash: str, chain_id: int, order_code: str) -> dict:
+    """Start settling `tx_hash` against the quote, or return the job already
+    running for that pair (re-enqueueing it if it stalled, starting it over
+    if it failed on an RPC outage, see `retryable`)."""
+    from pretix_eth.models import WCSettlementJob
+
+    state = get_state(quote_id, tx_hash)
+    if state is None:
+        fresh = _new_state(quote_id, tx_hash, chain_id, order_code)
+        try:
+            with transaction.atomic():
+                WCSettlementJob.objects.create(
+                    quote_id=quote_id, tx_hash=tx_hash, state=fresh['state'], data=fresh,
+                )
+        except IntegrityError:
+            state = _load(quote_id, tx_hash) or fresh
+        else:
+            _enqueue(fresh)
+            return get_state(quote_id, tx_hash) or fresh
+    if retryable(state):
+        _rearm(state)
+    else:
+        _kick_if_stalled(state)
+    return get_state(quote_id, tx_hash) or state
+
+
+def retryable(state) -> bool:
+    """Whether a failed job failed on our side — the RPC stayed unreachable
+    until the deadline — so that re-posting verify starts it over."""
+    error = state.get('error') or ''
+    if error.startswith(_DEADLINE_ERROR + ' ('):
+        error = error[len(_DEADLINE_ERROR) + 2:]
+    return state['state'] == FAILED and error.startswith(_INFRA)
+
+
+def _rearm(state):
+    """Start a retryable failed job over as a fresh submission."""
+    with transaction.atomic():
+        current = _load(state['quote_id'], state['tx_hash'], lock=True)
+        if current is None or not retryable(current):
+            return
+        fresh = _new_state(current['quote_id'], current['tx_hash'], current['chain_id'], current.get('order_code'))
+        fresh['version'] = int(current.get('version') or 0) + 1
+        _store(fresh)
+    _enqueue(fresh)
+
+
+def poll(quote_id: str, tx_hash: str) -> Optional[dict]:
+    """The job's current state (None if unknown), re-enqueueing it if it
+    stalled."""
+    state = get_state(quote_id, tx_hash)
+    if state is not None:
+        _kick_if_stalled(state)
+        state = get_state(quote_id, tx_hash) or state
+    return state
+
+
+def watch(quote_id: str, tx_hash: str, *, since: Optional[int] = None, timeout: float):
+    """Yield the job's state whenever its version changes — first the
+    current state, unless that is version `since` — until the job has
+    settled or failed, it is unknown, or `timeout` seconds have passed.
+    Reads go through `poll()`, so without a broker a watcher may run a
+    due settlement check itself (see `_kick_if_stalled`)."""
+    deadline = time.monotonic() + timeout
+    seen = since
+    while True:
+        state = poll(quote_id, tx_hash)
+        if state is None:
+            return
+        if state.get('version') != seen:
+            seen = state.get('version')
+            yield state
+        if state['state'] in TERMINAL or time.monotonic() >= deadline:
+            return
+        time.sleep(WATCH_INTERVAL)
+
+
+def _fail(state, error, http_status=400, **extra):
+    log.warning('wc_settle failed: %s (quote=%s tx=%s extra=%s)',
+                error, state['quote_id'], state['tx_hash'], extra or '-')
+    state.update(extra, state=FAILED, error=error, http_status=http_status)
+    _save(state)
+    return None
+
+
+def _wait(state, error, *, confirmations=None, confirmations_required=None):
+    """Keep the job in flight; returns the delay until its next check, or
+    fails it once the deadline has passed."""
+    if time.time() > state['submitted_at'] + SETTLE_DEADLINE:
+        return _fail(state, f'{_DEADLINE_ERROR} ({error})',
+                     confirmations=confirmations, confirmations_required=confirmations_required)
+    delay = _RECHECK_SECONDS.get(state['chain_id'], 4)
+    state.update(state=CONFIRMING, error=error, confirmations=confirmations,
+                 confirmations_required=confirmations_required,
+                 next_check_at=int(time.time()) + delay)
+    _save(state)
+    return delay
+
+
+def settle(quote_id: str, tx_hash: str, chain_id: int, run: Optional[str] = None) -> Optional[int]:
+    """Run one settlement check for the job. Returns the seconds until the
+    next check while the tx still needs to confirm, None once the job has
+    settled or failed — or if `run` is no longer the job's current run."""
+    state = _load(quote_id, tx_hash)
+    if run is not None and (state is None or state.get('run') != run):
+        log.info('wc_settle: run %s superseded (quote=%s tx=%s)', run, quote_id, tx_hash)
+        return None
+    state = state or _new_state(quote_id, tx_hash, chain_id)
+    if state['state'] in TERMINAL:
+        return None
+    with scopes_disabled():
+        return _settle(state)
+
+
+def _settle(state):
+    from pretix.base.models import Order
+
+    from pretix_eth.models import WCPaymentAttempt, WCQuote
+    from pretix_eth.payment import WalletConnectPayment
+    from pretix_eth.sanctions import is_sanctioned
+
+    quote_id, tx_hash, chain_id = state['quote_id'], state['tx_hash'], state['chain_id']
+    row = (
+        WCQuote.objects
+        .select_related('payment__order__event')
+        .filter(quote_id=quote_id, payment__provider='walletconnect', payment__state='created')
+        .first()
+    )
+    if row is None or WCQuote.current_quote_id(row.payment) != row.quote_id:
+        return _fail(state, 'quote not found', 404)
+    payment = row.payment
+    order = payment.order
+    quote = row.data
+    state['order_code'] = order.code
+
+    # V46: the operator may have disabled the rail since the quote (or since
+    # verify accepted the job).
+    config, reason, status = check_wc_config(order.event, chain_id=chain_id, symbol=quote.get('symbol'))
+    if config is None:
+        return _fail(state, reason, status)
+
+    settings_key = config.alchemy_api_key
+    min_conf = config.min_confirmations
+
+    # V75/V79: re-establish the signer against the order's OWN stored quote
+    # before settling. A validator that was only transiently authorized at
+    # quote time (ERC-1271 toggle, EIP-7702 delegation) no longer validates.
+    # A re-check that could not reach the chain is retried, not a rejection.
+    signer_ok, signer_reason = revalidate_quote_signer(quote, settings_key)
+    if not signer_ok:
+        if signer_reason.startswith(_TRANSIENT):
+            return _wait(state, signer_reason)
+        return _fail(state, signer_reason)
+
+    w3 = rpc.get_web3(chain_id, settings_key)
+
+    amount_raw = int(quote['amount_raw'])
+    if quote['symbol'] == 'ETH':
+        vr = verify_native_eth(
+            w3=w3, tx_hash=tx_hash,
+            expected_from=quote['intended_payer'],
+            expected_to=quote['receive_address'],
+            expected_amount_wei=amount_raw,
+            min_confirmations=min_conf,
+        )
+    else:
+        vr = verify_erc20_transfer(
+            w3=w3, chain_id=chain_id, tx_hash=tx_hash,
+            expected_from=quote['intended_payer'],
+            expected_to=quote['receive_address'],
+            expected_token=quote['token_address'],
+            expected_amount=amount_raw,
+            min_confirmations=min_conf,
+        )
+
+    if not vr.verified:
+        if vr.error and vr.error.startswith(_TRANSIENT):
+            return _wait(state, vr.error, confirmations=vr.confirmations,
+                         confirmations_required=vr.min_confirmations)
+        return _fail(state, vr.error, confirmations=vr.confirmations,
+                     confirmations_required=vr.min_confirmations)
+
+    # V49: bind the on-chain transfer to the quote's freshness window.
+    # Without this, any prior matching transfer (e.g. a refund, a stale
+    # canceled-quote transfer, or an out-of-band send to the merchant)
+    # could be replayed once into a future quote. The plain ERC-20
+    # `Transfer` log carries no order/quote binding, so the only way to
+    # require "this transfer was made FOR this quote" is to constrain the
+    # block timestamp to the quote window.
+    try:
+        block_ts = int(w3.eth.get_block(vr.block_number).timestamp)
+    except Exception as e:
+        return _wait(state, f'failed to fetch block timestamp: {e}')
+    quote_created = int(quote.get('created_at', 0))
+    quote_expires = int(quote.get('expires_at', 0))
+    if quote_created and block_ts < quote_created:
+        return _fail(state, 'tx mined before quote was issued', block_ts=block_ts)
+    if quote_expires and block_ts > quote_expires:
+        return _fail(state, 'tx mined after quote expired', block_ts=block_ts)
+
+    # OFAC re-check at settlement: the SDN list may have gained the payer
+    # between quote time and now. The funds are already on-chain at this
+    # point — do NOT confirm, do NOT auto-refund (refunding a sanctioned
+    # address is itself a violation). Leave the payment pending, tag the
+    # order for a human, and escalate.
+    if is_sanctioned(quote['intended_payer']):
+        log.error(
+            'wc_settle BLOCKED: OFAC-sanctioned payer %s order=%s tx=%s — order left pending, escalate',
+            quote['intended_payer'], order.code, tx_hash,
+        )
+        try:
+            order.log_action('pretix_eth.ofac_hold', data={
+                'payer': quote['intended_payer'], 'tx_hash': tx_hash,
+            })
+        except Exception:
+            log.exception('wc_settle: failed to write ofac_hold log action for order %s', order.code)
+        return _fail(state, 'payment could not be accepted', 403)
+
+    # Atomic claim: unique constraint on tx_hash prevents race; the
+    # SELECT FOR UPDATE on Order + re-check of order.status closes the
+    # V51 window (mark_order_expired() flipped the order to expired
+    # while a settlement was mid-flight). The unique-constraint catch in
+    # `except IntegrityError` below is the actual one-time-use guarantee.
+    try:
+        with transaction.atomic():
+            order = Order.objects.select_for_update().get(pk=order.pk)
+            if order.status != Order.STATUS_PENDING:
+                return _fail(state, 'order is not in pending state', 410, order_status=order.status)
+            if order.expires and order.expires < tz_now():
+                return _fail(state, 'order payment deadline has elapsed', 410)
+
+            WCPaymentAttempt.objects.create(
+                tx_hash=tx_hash, quote_id=quote['quote_id'],
+                order_code=order.code, payer=quote['intended_payer'],
+                chain_id=chain_id, state='completed',
+            )
+
+            info = payment.info_data or {}
+            info['tx_hash'] = tx_hash
+            info['chain_id'] = chain_id
+            info['token_symbol'] = quote['symbol']
+            info['token_address'] = quote.get('token_address')
+            info['payer'] = quote['intended_payer']
+            # Store as a plain integer string — the payment_control_render
+            # helper formats it to human-readable decimals using the token
+            # symbol. The old `f"{raw} (raw)"` format leaked into the Pretix
+            # admin UI as literal text.
+            info['amount'] = str(quote['amount_raw'])
+            info['block_number'] = vr.block_number
+            payment.info_data = info
+            payment.save()
+
+            # Render the payment recap for the order-paid email. The paid
+            # email path uses `{payment_info}` = whatever we pass as
+            # `mail_text=` to payment.confirm() — it does NOT call
+            # `order_pending_mail_render` on its own. Without this, the
+            # confirmation email's {payment_info} placeholder renders empty.
+            try:
+                mail_text = WalletConnectPayment(order.event).order_pending_mail_render(order, payment)
+            except Exception as e:
+                log.warning('[wc settle] failed to render mail_text for %s: %s', order.code, e)
+                mail_text = ''
+            payment.confirm(mail_text=mail_text)
+    except IntegrityError:
+        return _fail(state, 'tx already used (race)', 409)
+
+    state.update(state=SETTLED, error=None, http_status=None, block_number=vr.block_number,
+                 confirmations=vr.confirmations, confirmations_required=vr.min_confirmations)
+    _save(state)
+    return None
+
+
+def cleanup_jobs() -> int:
+    """Delete jobs nothing has written for `_STATE_TTL`: finished ones past
+    their late status polls, and in-flight ones nobody came back for."""
+    from pretix_eth.models import WCSettlementJob
+    deleted, _ = WCSettlementJob.objects.filter(
+        updated_at__lt=tz_now() - timedelta(seconds=_STATE_TTL),
+    ).delete()
+    return deleted
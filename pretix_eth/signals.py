@@ -1,13 +1,17 @@
-from django.db.models.signals import pre_save
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 from django.utils.html import format_html
 
 from pretix.base.middleware import _parse_csp, _merge_csp, _render_csp
-from pretix.base.models import OrderFee
+from pretix.base.models import Event, Event_SettingsStore, OrderFee, Organizer_SettingsStore
 from pretix.presale.signals import html_head, process_response
 from pretix.base.signals import register_payment_providers, register_text_placeholders
 from pretix.base.services.placeholders import SimpleFunctionalTextPlaceholder
 
+from pretix_eth import wcconfig
+from pretix_eth.models import WCPaymentAttempt, X402CompletedOrder
+
 
 @receiver(process_response, dispatch_uid='wc_checkout_csp')
 def add_wc_csp(sender, request, response, **kwargs):
@@ -148,9 +152,20 @@ try:
     @receiver(periodic_task, dispatch_uid='pretix_eth_x402_cleanup')
     def register_x402_cleanup(sender, **kwargs):
         # Runs every hour via Pretix's built-in periodic_task signal
-        from pretix_eth.x402.tasks import cleanup_expired_pending_task, cleanup_verify_attempts_task
+        from pretix_eth.x402.tasks import cleanup_expired_pending_task
         cleanup_expired_pending_task.apply_async()
-        cleanup_verify_attempts_task.apply_async()
+
+    @receiver(periodic_task, dispatch_uid='pretix_eth_sanctions_refresh')
+    def register_sanctions_refresh(sender, **kwargs):
+        # Keeps the OFAC / ScamSniffer lists published in the shared cache so
+        # request-path screening never has to download them inline.
+        from pretix_eth.tasks import refresh_sanctions_lists_task
+        refresh_sanctions_lists_task.apply_async()
+
+    @receiver(periodic_task, dispatch_uid='pretix_eth_wc_settlement_cleanup')
+    def register_settlement_cleanup(sender, **kwargs):
+        from pretix_eth.tasks import cleanup_settlement_jobs_task
+        cleanup_settlement_jobs_task.apply_async()
 except ImportError:
     # Fallback: no periodic scheduling (dev/test environments)
     pass
@@ -447,3 +462,42 @@ def set_stripe_fee_label(sender, instance, **kwargs):
         num = format(value, 'f').rstrip('0').rstrip('.')
     amount_str = f'${num}' if currency == 'USD' else f'{num} {currency}'.strip()
     instance.description = f'Credit card processing fee ({amount_str})'
+
+
+@receiver(post_save, sender=WCPaymentAttempt, dispatch_uid='wc_settlement_balance_invalidate')
+@receiver(post_save, sender=X402CompletedOrder, dispatch_uid='x402_settlement_balance_invalidate')
+def invalidate_payer_balances(sender, instance, created, **kwargs):
+    """A settled payment just moved the payer's funds: drop their cached
+    wallet balances (once the settling transaction commits) so the next
+    picker load doesn't show the pre-payment amounts."""
+    if not created or not instance.payer:
+        return
+    from pretix_eth.x402.balances import invalidate_wallet_balances
+    payer = instance.payer
+    transaction.on_commit(lambda: invalidate_wallet_balances(payer))
+
+
+@receiver(post_save, sender=Event_SettingsStore, dispatch_uid='wc_config_invalidate_event_save')
+@receiver(post_delete, sender=Event_SettingsStore, dispatch_uid='wc_config_invalidate_event_delete')
+@receiver(post_save, sender=Organizer_SettingsStore, dispatch_uid='wc_config_invalidate_organizer_save')
+@receiver(post_delete, sender=Organizer_SettingsStore, dispatch_uid='wc_config_invalidate_organizer_delete')
+def invalidate_wc_config(sender, instance, **kwargs):
+    """A WalletConnect setting changed: drop the affected events' config
+    snapshots now, and again once the write commits so a request racing the
+    transaction can't leave a pre-change snapshot behind. Organizer-level
+    values are inherited by every event of the organizer."""
+    if not instance.key.startswith(wcconfig.SETTINGS_PREFIX):
+        return
+    if sender is Organizer_SettingsStore:
+        from django_scopes import scopes_disabled
+        with scopes_disabled():
+            event_ids = list(Event.objects.filter(organizer_id=instance.object_id).values_list('pk', flat=True))
+    else:
+        event_ids = [instance.object_id]
+
+    def _drop():
+        for event_id in event_ids:
+            wcconfig.invalidate(event_id)
+
+    _drop()
+    transaction.on_commit(_drop)
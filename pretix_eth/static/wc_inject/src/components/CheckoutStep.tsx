@@ -148,6 +148,17 @@ function ethReasonText(reason: string, fallbackSymbols: string[]): string {
   return `ETH payments temporarily unavailable. ${fallback}`
 }
 
+/** Body of verify (POST) and of its settlement status resource (GET). */
+type SettlementStatus = {
+  status?: 'pending' | 'confirming' | 'settled' | 'failed'
+  version?: number
+  verified?: boolean
+  error?: string
+  confirmations?: number | null
+  confirmations_required?: number | null
+  status_url?: string
+}
+
 type Status =
   | 'idle'
   | 'challenge'
@@ -913,6 +924,47 @@ export function CheckoutStep({
     // and strand a paid buyer on a "timed out" error.
     let rlBackoff = 0
 
+    // Set from verify's 202 once the settlement job exists.
+    let statusUrl: string | null = null
+    // Last job version seen — lets a status long-poll wait for the next one.
+    let statusVersion: number | null = null
+    // Cleared if the status stream can't be opened; we then long-poll.
+    let useStream = typeof EventSource !== 'undefined'
+
+    // Watch the settlement job over server-sent events: one connection that
+    // the server pushes every confirmation and the final result down
+    // (EventSource reconnects by itself when the server rotates it).
+    // Resolves 'settled', 'fallback' if the stream is unavailable, or
+    // 'timeout' once the poll budget is spent; rejects if the job failed.
+    const watchSettlement = (url: string) => new Promise<'settled' | 'fallback' | 'timeout'>((resolve, reject) => {
+      const es = new EventSource(`${url}&format=sse`, { withCredentials: true })
+      const timer = setInterval(() => {
+        if (Date.now() - startedAt >= budget) finish(() => resolve('timeout'))
+      }, 1_000)
+      const finish = (done: () => void) => {
+        clearInterval(timer)
+        es.close()
+        done()
+      }
+      es.addEventListener('status', (ev) => {
+        const body = JSON.parse((ev as MessageEvent).data) as SettlementStatus
+        if (typeof body.version === 'number') statusVersion = body.version
+        if (body.verified) {
+          finish(() => resolve('settled'))
+        } else if (body.status === 'failed') {
+          finish(() => reject(new Error(body.error || 'Payment verification failed')))
+        } else if (typeof body.confirmations === 'number' && typeof body.confirmations_required === 'number') {
+          setConfirmProgress({ current: body.confirmations, required: body.confirmations_required })
+          budget = pollMaxDurationMs(q.chain_id, body.confirmations_required) + (budget - initialBudget)
+        }
+      })
+      es.onerror = () => {
+        // CLOSED means the browser gave up (e.g. 404 for a lost job);
+        // CONNECTING is a routine reconnect.
+        if (es.readyState === EventSource.CLOSED) finish(() => resolve('fallback'))
+      }
+    })
+
     // Default exponential backoff (2s → 4s → 8s …, capped 30s) with jitter.
     const backoffMs = () => Math.min(30_000, 2_000 * Math.pow(2, rlBackoff)) + Math.floor(Math.random() * 1_000)
 
@@ -959,22 +1011,53 @@ export function CheckoutStep({
           continue
         }
 
-        const r = await fetch(`${config.urlPrefix}/verify/`, {
-          method: 'POST',
-          headers: { 'Content-Type': 'application/json' },
-          credentials: 'same-origin',
-          body: JSON.stringify({
-            quote_id: q.quote_id, tx_hash: txHash, chain_id: q.chain_id,
-            organizer, event,
-          }),
-        })
+        if (statusUrl && useStream) {
+          const outcome = await watchSettlement(statusUrl)
+          if (outcome === 'settled') {
+            setConfirmProgress(null)
+            return
+          }
+          if (outcome === 'timeout') break
+          useStream = false
+          continue
+        }
+
+        // Verify submits a settlement job and answers 202 with a status URL;
+        // after that we only read the job's status, held open until the job
+        // moves on. A 404 there means the job state
+        // is gone — submit again.
+        const r = statusUrl
+          ? await fetch(`${statusUrl}&wait=20&since=${statusVersion ?? ''}`, { credentials: 'same-origin', cache: 'no-store' })
+          : await fetch(`${config.urlPrefix}/verify/`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            credentials: 'same-origin',
+            body: JSON.stringify({
+              quote_id: q.quote_id, tx_hash: txHash, chain_id: q.chain_id,
+              organizer, event,
+            }),
+          })
+        if (statusUrl && r.status === 404) {
+          statusUrl = null
+          continue
+        }
         if (r.ok) {
           rlBackoff = 0
-          const body = await r.json()
+          const body = await r.json() as SettlementStatus
           if (body.verified) {
             setConfirmProgress(null)
             return
           }
+          if (body.status === 'failed') {
+            setConfirmProgress(null)
+            throw new Error(body.error || 'Payment verification failed')
+          }
+          if (body.status_url) statusUrl = body.status_url
+          if (typeof body.version === 'number') statusVersion = body.version
+          if (typeof body.confirmations === 'number' && typeof body.confirmations_required === 'number') {
+            setConfirmProgress({ current: body.confirmations, required: body.confirmations_required })
+            budget = pollMaxDurationMs(q.chain_id, body.confirmations_required) + (budget - initialBudget)
+          }
         } else if (r.status === 429) {
           // Honor server Retry-After if present, else exponential backoff.
           const retryAfterHeader = parseInt(r.headers.get('Retry-After') || '', 10)
@@ -984,8 +1067,8 @@ export function CheckoutStep({
           dbgWarn('verify:rate-limited', { wait, attempt: rlBackoff + 1 })
           await cooldownSleep(wait)
         } else {
-          const body = await r.json().catch(() => ({} as { error?: string; confirmations?: number | null; confirmations_required?: number | null }))
-          const errMsg = (body.error as string | undefined) || `verify HTTP ${r.status}`
+          const body: SettlementStatus = await r.json().catch(() => ({} as SettlementStatus))
+          const errMsg = body.error || `verify HTTP ${r.status}`
           // Defensive: some deployments surface the rate limit as a string
           // body rather than a 429 status — treat that as retryable too.
           const isRateLimit = errMsg.toLowerCase().includes('rate limit')
@@ -994,7 +1077,8 @@ export function CheckoutStep({
             continue
           }
           rlBackoff = 0
-          if (!RETRYABLE_ERROR_SUBSTRINGS.some((s) => errMsg.includes(s))) {
+          // A settlement job that failed is final, whatever its error says.
+          if (body.status === 'failed' || !RETRYABLE_ERROR_SUBSTRINGS.some((s) => errMsg.includes(s))) {
             setConfirmProgress(null)
             throw new Error(errMsg)
           }
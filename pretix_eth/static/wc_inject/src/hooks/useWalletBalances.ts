@@ -1,4 +1,4 @@
-import { useQuery } from '@tanstack/react-query'
+import { useQuery, useQueryClient } from '@tanstack/react-query'
 import type { WCConfig } from '../config'
 
 /** Plugin-side balance entry (matches `balances.fetch_balances_for_wallet`). */
@@ -12,15 +12,64 @@ export interface BalanceEntry {
   token_address: string | null
 }
 
+/** A (chain, token) the plugin could not read in time (RPC error or the
+ *  per-chain deadline). Unknown — not zero. */
+export interface MissingBalanceEntry extends Omit<BalanceEntry, 'balance'> {
+  balance: null
+  missing: true
+}
+
 export interface WalletBalancesResponse {
   wallet: string
-  balances: BalanceEntry[]
+  balances: (BalanceEntry | MissingBalanceEntry)[]
+}
+
+/** One line of the `?format=ndjson` stream. */
+type BalanceStreamLine =
+  | { type: 'balances'; balances: (BalanceEntry | MissingBalanceEntry)[] }
+  | { type: 'done'; wallet: string; missingChains: number[]; error?: string }
+
+function isKnown(b: BalanceEntry | MissingBalanceEntry): b is BalanceEntry {
+  return !('missing' in b && b.missing)
+}
+
+/** Reads the NDJSON balance stream, calling `onPartial` with everything
+ *  received so far after each line, and resolves with the full response. */
+async function readBalanceStream(
+  r: Response,
+  wallet: string,
+  onPartial: (res: WalletBalancesResponse) => void,
+): Promise<WalletBalancesResponse> {
+  const res: WalletBalancesResponse = { wallet, balances: [] }
+  const reader = r.body!.getReader()
+  const decoder = new TextDecoder()
+  let buffered = ''
+  for (;;) {
+    const { done, value } = await reader.read()
+    buffered += decoder.decode(value, { stream: !done })
+    const lines = buffered.split('\n')
+    buffered = done ? '' : lines.pop()!
+    for (const line of lines) {
+      if (!line.trim()) continue
+      const msg = JSON.parse(line) as BalanceStreamLine
+      if (msg.type === 'balances') {
+        res.balances = [...res.balances, ...msg.balances]
+        onPartial({ ...res })
+      } else {
+        res.wallet = msg.wallet
+      }
+    }
+    if (done) return res
+  }
 }
 
 /** Fetches per-(chain, token) balances for the connected wallet from the
  *  plugin's `/plugin/wc/wallet-balances/` endpoint. The plugin tries Zapper
  *  first and falls back to RPC if Zapper fails — same engine x402 uses.
- *  Returns an empty `balances` list if the wallet isn't connected. */
+ *  Asks for the NDJSON stream so each chain's badges appear as soon as that
+ *  chain resolves; falls back to the plain JSON body if the response isn't
+ *  streamed (e.g. an older plugin). Returns an empty `balances` list if the
+ *  wallet isn't connected. */
 /**
  * @param pollingActive When false, stops the background interval + focus
  *   refetch. The caller passes `false` once the buyer commits to paying
@@ -30,8 +79,10 @@ export interface WalletBalancesResponse {
  *   the first launch. Manual `.refetch()` (the refresh button) still works.
  */
 export function useWalletBalances(config: WCConfig, wallet: string | undefined, pollingActive = true) {
+  const queryClient = useQueryClient()
+  const queryKey = ['wc-wallet-balances', config.orderCode, wallet]
   return useQuery<WalletBalancesResponse>({
-    queryKey: ['wc-wallet-balances', config.orderCode, wallet],
+    queryKey,
     enabled: !!wallet,
     queryFn: async () => {
       const url = new URL(`${config.urlPrefix}/wallet-balances/`, window.location.origin)
@@ -41,11 +92,15 @@ export function useWalletBalances(config: WCConfig, wallet: string | undefined,
       // Buyer auth — see usePaymentOptions for details. WCConfig has both.
       url.searchParams.set('order_code', config.orderCode)
       url.searchParams.set('order_secret', config.orderSecret)
+      url.searchParams.set('format', 'ndjson')
       const r = await fetch(url.toString(), { credentials: 'same-origin' })
       if (!r.ok) {
         throw new Error(`wallet-balances HTTP ${r.status}`)
       }
-      return r.json()
+      if (!r.body || !(r.headers.get('Content-Type') || '').includes('application/x-ndjson')) {
+        return r.json()
+      }
+      return readBalanceStream(r, wallet!, partial => queryClient.setQueryData(queryKey, partial))
     },
     // Balances change when the wallet sends/receives — refetch on focus +
     // every minute, but ONLY while polling is active (buyer is choosing).
@@ -84,12 +139,14 @@ export function formatBalance(raw: string, decimals: number): string {
 }
 
 /** Look up the balance for a given (chain, symbol) from the response.
- *  Returns null if not found. */
+ *  Returns null if not found or if that chain's balance is missing, so
+ *  callers show no badge rather than a false "insufficient". */
 export function findBalance(
   res: WalletBalancesResponse | undefined,
   chainId: number,
   symbol: string,
 ): BalanceEntry | null {
   if (!res) return null
-  return res.balances.find(b => b.chain_id === chainId && b.symbol === symbol) ?? null
+  const entry = res.balances.find(b => b.chain_id === chainId && b.symbol === symbol)
+  return entry && isKnown(entry) ? entry : null
 }
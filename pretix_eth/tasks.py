@@ -0,0 +1,36 @@
+"""Celery tasks for periodic plugin maintenance and WalletConnect settlement
+(non-x402)."""
+from pretix.celery_app import app
+from pretix_eth import sanctions
+
+
+@app.task
+def refresh_sanctions_lists_task():
+    summary = sanctions.refresh_lists()
+    # Incremental: a no-op-sized pass unless new payers arrived or the OFAC
+    # list changed since the last run.
+    rescreen_payers_task.apply_async()
+    return summary
+
+
+@app.task
+def rescreen_payers_task(full=False):
+    from pretix_eth.rescreen import rescreen_payers
+    return rescreen_payers(full=full)
+
+
+@app.task(bind=True, max_retries=None)
+def settle_wc_payment_task(self, quote_id, tx_hash, chain_id, run=None):
+    from pretix_eth import settlement
+    delay = settlement.settle(quote_id, tx_hash, chain_id, run=run)
+    # When run eagerly (no broker) a retry would spin in-process; the next
+    # verify/status request re-enqueues the job instead. A superseded run
+    # returns None and its chain ends here.
+    if delay is not None and not self.request.is_eager:
+        raise self.retry(countdown=delay)
+
+
+@app.task
+def cleanup_settlement_jobs_task():
+    from pretix_eth import settlement
+    return settlement.cleanup_jobs()
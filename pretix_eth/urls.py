@@ -62,6 +62,7 @@ def _wc_routes():
         path('plugin/wc/challenge/',       views.challenge,        name='wc_challenge'),
         path('plugin/wc/create-quote/',    views.create_quote,     name='wc_create_quote'),
         path('plugin/wc/verify/',          views.verify,           name='wc_verify'),
+        path('plugin/wc/verify/status/',   views.verify_status,    name='wc_verify_status'),
         path('plugin/wc/client-info/',     views.client_info,      name='wc_client_info'),
         path('plugin/wc/admin/fiat-blocked-items.js',
              views.admin_fiat_blocked_items_js, name='wc_admin_fiat_blocked_items_js'),
@@ -100,6 +101,9 @@ def _admin_routes():
     return [
         event_path('plugin/admin/orders/',    views_admin.admin_orders,    name='admin_orders',    require_live=False),
         event_path('plugin/admin/stats/',     views_admin.admin_stats,     name='admin_stats',     require_live=False),
+        event_path('plugin/admin/pricing/',   views_admin.admin_pricing,   name='admin_pricing',   require_live=False),
+        event_path('plugin/admin/sanctions/', views_admin.admin_sanctions, name='admin_sanctions', require_live=False),
+        event_path('plugin/admin/balances/',  views_admin.admin_balances,  name='admin_balances',  require_live=False),
         event_path('plugin/admin/refund/',    views_admin.admin_refund,    name='admin_refund',    require_live=False),
         event_path('plugin/admin/verify/',    views_admin.admin_verify,    name='admin_verify',    require_live=False),
         event_path('plugin/admin/wc-refund/', views_admin.admin_wc_refund, name='admin_wc_refund', require_live=False),
@@ -532,3 +532,46 @@ def verify_eth_payer_signature(*, w3, payer: str, message: str, signature: str)
         ' [7702-delegated]' if is_7702 else '',
     )
     return False
+
+
+def revalidate_quote_signer(quote, settings_key):
+    """Re-run the quote-time signer check at settlement. Closes the smart-wallet
+    TOCTOU (V79 ERC-1271 toggle, V75 EIP-7702 revoke/redelegate): a validator
+    that was only transiently authorized at quote time no longer validates here.
+    EOA quotes re-recover cheaply (chain-independent); smart-wallet quotes
+    re-eth_call isValidSignature on the chain that validated at quote time.
+    Returns (ok: bool, reason: str)."""
+    from eth_utils import to_checksum_address
+
+    from pretix_eth import rpc
+    sig = quote.get('signature')
+    msg = quote.get('signed_message')
+    cid = quote.get('sig_chain_id')
+    payer = quote.get('intended_payer')
+    if not (sig and msg and cid and payer):
+        # Legacy quote minted before signer binding existed — refuse to settle
+        # rather than trust an unverifiable one-block snapshot.
+        return False, 'quote has no bound signer (re-quote required)'
+    try:
+        w3 = rpc.get_web3(int(cid), settings_key)
+    except Exception as e:
+        return False, f'signer re-check web3 error: {e}'
+    try:
+        if not verify_eth_payer_signature(w3=w3, payer=payer, message=msg, signature=sig):
+            return False, 'signer no longer validates for this quote'
+    except Exception as e:
+        return False, f'signer re-check errored: {e}'
+    # V75: if a code prefix was snapshotted (smart wallet / EIP-7702), require it
+    # to be unchanged. A revoke or redelegate to a different validator changes
+    # the 0xef0100||<impl> designator, so a quote bound at one delegation cannot
+    # settle after the delegation moved.
+    prefix = quote.get('payer_code_prefix')
+    if prefix:
+        try:
+            code = w3.eth.get_code(to_checksum_address(payer))
+            now_prefix = '0x' + bytes(code[:23]).hex()
+        except Exception as e:
+            return False, f'signer code re-check errored: {e}'
+        if now_prefix != prefix:
+            return False, 'payer code changed since quote (delegation revoked/redelegated)'
+    return True, ''
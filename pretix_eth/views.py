@@ -8,11 +8,12 @@ import secrets
 import time
 from decimal import Decimal
 from typing import Optional
+from urllib.parse import urlencode
 
+from django.conf import settings
 from django.core.cache import cache
-from django.db import IntegrityError, transaction
-from django.http import JsonResponse, HttpRequest, HttpResponse
-from django.utils.timezone import now as tz_now
+from django.db import transaction
+from django.http import JsonResponse, HttpRequest, HttpResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django_scopes import scopes_disabled
@@ -23,15 +24,12 @@ from eth_account.messages import encode_defunct
 from eth_utils import to_checksum_address
 
 from pretix.base.models import Event, Order
-from pretix_eth.chains import (
-    SUPPORTED_CHAINS, ALL_SYMBOLS, CHAIN_METADATA,
-    is_supported,
-)
-from pretix_eth.models import WCPaymentAttempt
+from pretix_eth.chains import CHAIN_METADATA, is_supported
+from pretix_eth import ratelimit, rpc, settlement
+from pretix_eth.models import WCPaymentAttempt, WCQuote
 from pretix_eth.pricing import build_quote, fetch_eth_price_usd
 from pretix_eth.payment import WalletConnectPayment
-from pretix_eth.rpc import get_rpc_url
-from pretix_eth.verification import verify_erc20_transfer, verify_native_eth
+from pretix_eth.wcconfig import check_wc_config, get_wc_config
 from pretix_eth.x402.auth import get_client_ip
 
 log = logging.getLogger(__name__)
@@ -39,11 +37,10 @@ log = logging.getLogger(__name__)
 
 def _rate_limited(error='rate limit exceeded', *, retry_after=10, **extra):
     """429 JsonResponse with a `Retry-After` header (seconds) so the client
-    backs off for a precise window instead of guessing. Buyer-facing rate
-    limits use a short window (the cache buckets reset in <=60s and verify
-    polling wants to resume promptly), so 10s is a sane default; callers can
-    override per-endpoint. `extra` is merged into the JSON body to preserve
-    existing fields (e.g. ip / quote_id) some callers include."""
+    backs off for a precise window instead of guessing. Rate-limited callers
+    pass the limiter's own `RateDecision.retry_after`; 10s is only the
+    default for callers without one. `extra` is merged into the JSON body to
+    preserve existing fields (e.g. ip / quote_id) some callers include."""
     resp = JsonResponse({'error': error, **extra}, status=429)
     resp['Retry-After'] = str(int(retry_after))
     return resp
@@ -70,49 +67,42 @@ WC_VERIFY_IP_RATE_LIMIT_PER_MIN = int(os.environ.get('WC_VERIFY_IP_RATE_LIMIT_PE
 #   - WC_CREATE_QUOTE_IP_RATE_LIMIT_PER_MIN — per-IP+event budget, mirrors
 #     the V52 limiter on /verify/. Default 20/min.
 #   - WC_CREATE_QUOTE_PER_CHALLENGE_BUDGET — per-(order, challenge) failure
-#     budget tracked in `payment.info_data['failed_sig_attempts']`. Once
+#     budget, an atomic counter in the cache next to the challenge. Once
 #     exhausted the challenge must be re-issued. Catches the case where an
 #     attacker rotates IPs against a single legitimate pending order.
 WC_CREATE_QUOTE_IP_RATE_LIMIT_PER_MIN = int(os.environ.get('WC_CREATE_QUOTE_IP_RATE_LIMIT_PER_MIN', '20'))
 WC_CREATE_QUOTE_PER_CHALLENGE_BUDGET = int(os.environ.get('WC_CREATE_QUOTE_PER_CHALLENGE_BUDGET', '5'))
 
 
-def _check_rate_limit(quote_id: str, ip: str) -> bool:
-    """Return False if caller has exceeded WC_VERIFY_RATE_LIMIT_PER_MIN for this quote+IP pair."""
-    key = f'wc_verify_rl:{quote_id}:{ip}'
-    count = cache.get(key, 0)
-    if count >= RATE_LIMIT_PER_MIN:
-        return False
-    cache.set(key, count + 1, timeout=60)
-    return True
+def _check_rate_limit(quote_id: str, ip: str) -> ratelimit.RateDecision:
+    """Falsy if caller has exceeded WC_VERIFY_RATE_LIMIT_PER_MIN for this quote+IP pair."""
+    return ratelimit.hit('wc_verify_rl', f'{quote_id}:{ip}', limit=RATE_LIMIT_PER_MIN)
 
 
-def _check_wc_verify_ip_rate_limit(organizer: str, event: str, ip: str) -> bool:
+def _check_wc_verify_ip_rate_limit(organizer: str, event: str, ip: str) -> ratelimit.RateDecision:
     """V52: primary per-IP-per-event cap, checked BEFORE quote lookup or any
     RPC work. Attackers can rotate valid quote_ids to bypass `_check_rate_limit`
     (which keys on quote_id+ip), but the IP-keyed cap doesn't budge under
     that pattern and bounds RPC spend regardless of how many pending quotes
-    the same IP has minted."""
-    key = f'wc_verify_ip:{organizer}:{event}:{ip}'
-    count = cache.get(key, 0)
-    if count >= WC_VERIFY_IP_RATE_LIMIT_PER_MIN:
-        return False
-    cache.set(key, count + 1, timeout=60)
-    return True
+    the same IP has minted.
+
+    Uses the in-process tier, so the cap is approximate: each worker
+    process can admit up to `WC_RATE_LIMIT_LOCAL_BATCH` (8) requests past
+    it (see `pretix_eth.ratelimit`). Set that to 0 where RPC spend must be
+    capped exactly."""
+    return ratelimit.hit(
+        'wc_verify_ip', f'{organizer}:{event}:{ip}',
+        limit=WC_VERIFY_IP_RATE_LIMIT_PER_MIN, local_batch=ratelimit.LOCAL_BATCH,
+    )
 
 
-def _check_wc_create_quote_ip_rate_limit(organizer: str, event: str, ip: str) -> bool:
+def _check_wc_create_quote_ip_rate_limit(organizer: str, event: str, ip: str) -> ratelimit.RateDecision:
     """V53: per-IP+event rate limit on /plugin/wc/create-quote/, checked
     BEFORE any signature verification (ERC-1271 sig verify hits an on-chain
     `isValidSignature` call — bogus sigs would otherwise drain RPC quota).
     Same shape as the V52 limiter on /verify/, separate bucket so the two
     flows don't starve each other."""
-    key = f'wc_create_quote_ip:{organizer}:{event}:{ip}'
-    count = cache.get(key, 0)
-    if count >= WC_CREATE_QUOTE_IP_RATE_LIMIT_PER_MIN:
-        return False
-    cache.set(key, count + 1, timeout=60)
-    return True
+    return ratelimit.hit('wc_create_quote_ip', f'{organizer}:{event}:{ip}', limit=WC_CREATE_QUOTE_IP_RATE_LIMIT_PER_MIN)
 
 
 def _check_buyer_order_access(request, event):
@@ -159,16 +149,18 @@ def _check_buyer_order_access(request, event):
 WC_BUYER_RATE_LIMIT_PER_MIN = int(os.environ.get('WC_BUYER_RATE_LIMIT_PER_MIN', '120'))
 
 
-def _wc_buyer_rate_limit(client_ip: str, kind: str) -> bool:
+def _wc_buyer_rate_limit(client_ip: str, kind: str) -> ratelimit.RateDecision:
     """Per-IP rate limit for buyer-facing WC endpoints. `kind` keys a
     separate bucket per endpoint so a chatty payment-options call doesn't
-    starve wallet-balances (and vice versa). Returns False when exhausted."""
-    key = f'wc_buyer_rl:{kind}:{client_ip}'
-    count = cache.get(key, 0)
-    if count >= WC_BUYER_RATE_LIMIT_PER_MIN:
-        return False
-    cache.set(key, count + 1, timeout=60)
-    return True
+    starve wallet-balances (and vice versa). Falsy when exhausted.
+
+    These are the chattiest checks, so they use the in-process tier: an IP
+    under half its budget costs no cache round trip at all. Error bound as
+    for the verify IP cap (up to one local batch per worker process)."""
+    return ratelimit.hit(
+        'wc_buyer_rl', f'{kind}:{client_ip}',
+        limit=WC_BUYER_RATE_LIMIT_PER_MIN, local_batch=ratelimit.LOCAL_BATCH,
+    )
 
 
 def _wc_config_or_403(event, *, chain_id=None, symbol=None):
@@ -180,20 +172,14 @@ def _wc_config_or_403(event, *, chain_id=None, symbol=None):
     / per-token disable flags) still saw quotes mint and orders settle for
     those disabled rails.
 
-    Returns `(provider, None)` on success, `(None, JsonResponse)` on
-    rejection so callers can `if err: return err`."""
-    provider = WalletConnectPayment(event)
-    if not provider.settings.get('_enabled', as_type=bool, default=False):
-        return None, JsonResponse({'error': 'walletconnect disabled'}, status=404)
-    if chain_id is not None:
-        v = str(provider.settings.get(f'chain_{chain_id}', default='True')).lower()
-        if v not in ('true', '1', 'yes'):
-            return None, JsonResponse({'error': 'chain disabled'}, status=400)
-    if symbol is not None:
-        v = str(provider.settings.get(f'token_{symbol}', default='True')).lower()
-        if v not in ('true', '1', 'yes'):
-            return None, JsonResponse({'error': 'token disabled'}, status=400)
-    return provider, None
+    Returns `(config, None)` on success — the event's `WCConfig` snapshot,
+    so callers read the rest of the settings from it without another lookup —
+    or `(None, JsonResponse)` on rejection so callers can `if err: return err`.
+    The check itself is `wcconfig.check_wc_config`, shared with settlement."""
+    config, reason, status = check_wc_config(event, chain_id=chain_id, symbol=symbol)
+    if config is None:
+        return None, JsonResponse({'error': reason}, status=status)
+    return config, None
 
 
 def _read_body(request) -> dict:
@@ -206,11 +192,6 @@ def _read_body(request) -> dict:
 _TX_HASH_RE = re.compile(r'^0x[a-fA-F0-9]{64}$')
 
 
-def _get_web3(chain_id: int, settings_key):
-    url = get_rpc_url(chain_id, settings_key=settings_key)
-    return Web3(Web3.HTTPProvider(url, request_kwargs={'timeout': 10}))
-
-
 @scopes_disabled()
 def _get_provider_for_event(request: HttpRequest):
     """Resolve the event from query string (GET) or JSON body (POST),
@@ -237,8 +218,9 @@ def payment_options(request, **kwargs):
     # template, so it can pass them as query params. Plugin validates and
     # gates per-IP at 30/min.
     client_ip = get_client_ip(request)
-    if not _wc_buyer_rate_limit(client_ip, 'payment_options'):
-        return _rate_limited()
+    limited = _wc_buyer_rate_limit(client_ip, 'payment_options')
+    if not limited:
+        return _rate_limited(retry_after=limited.retry_after)
 
     org_slug = (request.GET.get('organizer') or '').strip()
     ev_slug = (request.GET.get('event') or '').strip()
@@ -254,20 +236,14 @@ def payment_options(request, **kwargs):
     if err is not None:
         return err
 
-    provider, err = _wc_config_or_403(event)
+    config, err = _wc_config_or_403(event)
     if err is not None:
         return err
 
-    # Read per-chain and per-token boolean settings (default: all enabled)
-    enabled_chains = [
-        cid for cid in SUPPORTED_CHAINS
-        if str(provider.settings.get(f'chain_{cid}', default='True')).lower() in ('true', '1', 'yes')
-    ]
-    enabled_tokens = [
-        sym for sym in ALL_SYMBOLS
-        if str(provider.settings.get(f'token_{sym}', default='True')).lower() in ('true', '1', 'yes')
-    ]
-    receive_address = provider.settings.get('receive_address')
+    # Per-chain and per-token toggles (default: all enabled)
+    enabled_chains = config.chains
+    enabled_tokens = config.tokens
+    receive_address = config.receive_address
 
     options = []
     for cid in enabled_chains:
@@ -332,12 +308,20 @@ def wallet_balances(request, **kwargs):
     Reuses `fetch_balances_for_wallet` so the Zapper-first / RPC-fallback
     behaviour is identical across both flows. Failures (Zapper down, RPC
     flake) return an empty list — the UI should still render all options
-    and just skip the balance badge."""
+    and just skip the balance badge. A single chain the RPC path couldn't
+    read comes back as entries with `balance: null, missing: true`.
+
+    With `?format=ndjson` (or `Accept: application/x-ndjson`) the response
+    is streamed instead: one `{"type": "balances", "balances": [...]}` line
+    per batch of entries as chains resolve, then a final
+    `{"type": "done", "wallet": ..., "missingChains": [...]}` line (with an
+    `error` field if the lookup blew up part-way)."""
     from pretix_eth.x402.balances import fetch_balances_for_wallet
 
     client_ip = get_client_ip(request)
-    if not _wc_buyer_rate_limit(client_ip, 'wallet_balances'):
-        return _rate_limited()
+    limited = _wc_buyer_rate_limit(client_ip, 'wallet_balances')
+    if not limited:
+        return _rate_limited(retry_after=limited.retry_after)
 
     org_slug = (request.GET.get('organizer') or '').strip()
     ev_slug = (request.GET.get('event') or '').strip()
@@ -353,7 +337,7 @@ def wallet_balances(request, **kwargs):
     if err is not None:
         return err
 
-    provider, err = _wc_config_or_403(event)
+    config, err = _wc_config_or_403(event)
     if err is not None:
         return err
 
@@ -362,16 +346,22 @@ def wallet_balances(request, **kwargs):
         return JsonResponse({'error': 'wallet must be 0x + 40 hex'}, status=400)
     wallet = Web3.to_checksum_address(wallet)
 
-    enabled_chains = [
-        cid for cid in SUPPORTED_CHAINS
-        if str(provider.settings.get(f'chain_{cid}', default='True')).lower() in ('true', '1', 'yes')
-    ]
+    enabled_chains = list(config.chains)
+    alchemy_key = config.alchemy_api_key
+    zapper_key = config.zapper_api_key
+
+    if _wants_ndjson(request):
+        response = StreamingHttpResponse(
+            _stream_wallet_balances(wallet, enabled_chains, alchemy_key, zapper_key),
+            content_type='application/x-ndjson',
+        )
+        response['Cache-Control'] = 'no-store'
+        response['X-Accel-Buffering'] = 'no'  # let nginx pass lines through as they come
+        return response
+
     if not enabled_chains:
         return JsonResponse({'wallet': wallet, 'balances': []})
 
-    alchemy_key = provider.settings.get('alchemy_api_key', default=None) or None
-    zapper_key = provider.settings.get('zapper_api_key', default=None) or None
-
     try:
         raw = fetch_balances_for_wallet(
             wallet=wallet, chain_ids=enabled_chains,
@@ -385,8 +375,128 @@ def wallet_balances(request, **kwargs):
     return JsonResponse({'wallet': wallet, 'balances': raw})
 
 
+def _wants_ndjson(request) -> bool:
+    if (request.GET.get('format') or '').strip().lower() == 'ndjson':
+        return True
+    return 'application/x-ndjson' in request.headers.get('Accept', '')
+
+
+def _stream_wallet_balances(wallet, chain_ids, alchemy_key, zapper_key):
+    """NDJSON body for `wallet_balances`: a line per batch of entries, then
+    a `done` line. Errors end the stream with `done` + `error` rather than
+    a broken body — the headers (200) are long gone by then."""
+    from pretix_eth.x402.balances import iter_balances_for_wallet
+
+    missing = set()
+    error = None
+    if chain_ids:
+        try:
+            for entries in iter_balances_for_wallet(
+                wallet=wallet, chain_ids=chain_ids,
+                alchemy_key=alchemy_key, zapper_api_key=zapper_key,
+            ):
+                missing.update(e['chain_id'] for e in entries if e.get('missing'))
+                yield json.dumps({'type': 'balances', 'balances': entries}) + '\n'
+        except Exception as e:
+            log.warning('wc_wallet_balances: streamed fetch failed for %s: %s', wallet, e)
+            error = 'balance lookup failed'
+    done = {'type': 'done', 'wallet': wallet, 'missingChains': sorted(missing)}
+    if error:
+        done['error'] = error
+    yield json.dumps(done) + '\n'
+
+
 CHALLENGE_TTL = 600  # 10 min
 
+# Challenges live in the shared cache, not on the order's payment: a buyer who
+# reconnects their wallet a few times would otherwise write (and possibly
+# create) an `OrderPayment` row per reconnect. Nothing durable is written
+# until /create-quote/ succeeds. Keyed by order AND nonce, so each challenge
+# gets its own failed-signature budget and an old one stays valid until it
+# expires.
+#
+# Without a real cache configured (Pretix's default keeps nothing) the
+# challenge goes where it used to: onto the order's pending walletconnect
+# payment, created at challenge time, one challenge per payment with its
+# failed-signature counter next to it.
+_CHALLENGE_KEY = 'pretix_eth_wc_challenge:{order}:{nonce}'
+_CHALLENGE_FAILS_KEY = 'pretix_eth_wc_challenge_fails:{order}:{nonce}'
+_CHALLENGE_INFO_KEYS = ('challenge_nonce', 'challenge_message', 'challenge_expires_at', 'failed_sig_attempts')
+
+
+def _challenges_in_cache() -> bool:
+    return getattr(settings, 'REAL_CACHE_USED', False)
+
+
+def _pending_wc_payment(order, *, create=False, lock=False):
+    qs = order.payments.filter(provider='walletconnect', state='created')
+    if lock:
+        qs = qs.select_for_update()
+    payment = qs.first()
+    if payment is None and create:
+        payment = order.payments.create(provider='walletconnect', amount=order.total, state='created')
+    return payment
+
+
+def _store_challenge(order, nonce: str, message: str, expires_at: int):
+    if _challenges_in_cache():
+        cache.set(_CHALLENGE_KEY.format(order=order.pk, nonce=nonce),
+                  {'message': message, 'expires_at': expires_at}, CHALLENGE_TTL)
+        return
+    with transaction.atomic():
+        Order.objects.select_for_update().filter(pk=order.pk).first()
+        payment = _pending_wc_payment(order, create=True)
+        info = payment.info_data or {}
+        info.update(challenge_nonce=nonce, challenge_message=message, challenge_expires_at=expires_at)
+        info.pop('failed_sig_attempts', None)
+        payment.info_data = info
+        payment.save(update_fields=['info'])
+
+
+def _stored_challenge_info(order, nonce: str, *, lock=False):
+    """The pending payment and its info, if it holds the challenge `nonce`."""
+    payment = _pending_wc_payment(order, lock=lock)
+    info = (payment.info_data or {}) if payment is not None else {}
+    if not info.get('challenge_nonce') or info['challenge_nonce'] != nonce:
+        return None, None
+    return payment, info
+
+
+def _load_challenge(order, nonce: str) -> Optional[dict]:
+    if _challenges_in_cache():
+        return cache.get(_CHALLENGE_KEY.format(order=order.pk, nonce=nonce))
+    _, info = _stored_challenge_info(order, nonce)
+    if info is None:
+        return None
+    return {'message': info.get('challenge_message'), 'expires_at': info.get('challenge_expires_at', 0)}
+
+
+def _challenge_failures(order, nonce: str) -> int:
+    if _challenges_in_cache():
+        return int(cache.get(_CHALLENGE_FAILS_KEY.format(order=order.pk, nonce=nonce)) or 0)
+    _, info = _stored_challenge_info(order, nonce)
+    return int((info or {}).get('failed_sig_attempts', 0))
+
+
+def _record_challenge_failure(order, nonce: str) -> int:
+    """Atomically count one failed signature against the challenge."""
+    if not _challenges_in_cache():
+        with transaction.atomic():
+            payment, info = _stored_challenge_info(order, nonce, lock=True)
+            if payment is None:
+                return 0
+            info['failed_sig_attempts'] = int(info.get('failed_sig_attempts', 0)) + 1
+            payment.info_data = info
+            payment.save(update_fields=['info'])
+            return info['failed_sig_attempts']
+    key = _CHALLENGE_FAILS_KEY.format(order=order.pk, nonce=nonce)
+    cache.add(key, 0, CHALLENGE_TTL)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.add(key, 1, CHALLENGE_TTL)
+        return 1
+
 
 @csrf_exempt
 @require_http_methods(['POST'])
@@ -432,27 +542,17 @@ def challenge(request, **kwargs):
             f'Expires: {expires_at}'
         )
 
-        # Find or create the pending walletconnect payment and stash nonce on info_data
-        payment = order.payments.filter(provider='walletconnect', state='created').first()
-        if payment is None:
-            payment = order.payments.create(
-                provider='walletconnect',
-                amount=order.total,
-                state='created',
-            )
-
-        info = payment.info_data or {}
-        info['challenge_nonce'] = nonce
-        info['challenge_expires_at'] = expires_at
-        info['challenge_message'] = message
-        # V53: a fresh challenge clears the per-challenge failed-sig budget
-        # so a buyer who burnt the budget can recover by re-issuing the
-        # challenge. Attackers can also re-challenge, but each /challenge/
-        # call needs a fresh order_code+order_secret (already V48-gated) and
-        # the per-IP /create-quote/ rate limit caps the upstream volume.
-        info.pop('failed_sig_attempts', None)
-        payment.info_data = info
-        payment.save()
+        # V53: a fresh challenge comes with a fresh failed-sig budget (the
+        # counter is keyed by nonce), so a buyer who burnt the budget can
+        # recover by re-issuing the challenge. Attackers can also
+        # re-challenge, but each /challenge/ call needs a fresh
+        # order_code+order_secret (already V48-gated) and the per-IP
+        # /create-quote/ rate limit caps the upstream volume.
+        try:
+            _store_challenge(order, nonce, message, expires_at)
+        except Exception as e:
+            log.warning('wc_challenge: challenge store unavailable for order=%s: %s', order.code, e)
+            return JsonResponse({'error': 'challenge store temporarily unavailable'}, status=503)
 
     return JsonResponse({
         'nonce': nonce,
@@ -465,7 +565,7 @@ def challenge(request, **kwargs):
 @require_http_methods(['POST'])
 def create_quote(request, **kwargs):
     """Recover the payer from a SIWE-lite signature, validate the challenge,
-    build a quote, and persist it to the pending payment's info_data."""
+    build a quote, and persist it (creating the pending payment if needed)."""
     from hmac import compare_digest
     body = _read_body(request)
 
@@ -489,9 +589,10 @@ def create_quote(request, **kwargs):
     # legitimate pending order/challenge is enough ammo to drain RPC quota
     # by submitting many bogus signatures. Cap fires before any sig work.
     client_ip = get_client_ip(request)
-    if not _check_wc_create_quote_ip_rate_limit(body['organizer'], body['event'], client_ip):
+    limited = _check_wc_create_quote_ip_rate_limit(body['organizer'], body['event'], client_ip)
+    if not limited:
         log.warning('wc_create_quote rejected: ip rate limit exceeded ip=%s', client_ip)
-        return _rate_limited()
+        return _rate_limited(retry_after=limited.retry_after)
 
     with scopes_disabled():
         try:
@@ -511,27 +612,27 @@ def create_quote(request, **kwargs):
         if order is None or not compare_digest(order.secret, body['order_secret']):
             return JsonResponse({'error': 'order not found or secret mismatch'}, status=404)
 
-        payment = order.payments.filter(provider='walletconnect', state='created').first()
-        if payment is None:
-            return JsonResponse({'error': 'no pending walletconnect payment; call /challenge/ first'}, status=409)
-
-        info = payment.info_data or {}
-        stored_nonce = info.get('challenge_nonce')
-        message = info.get('challenge_message')
-        expires_at = info.get('challenge_expires_at', 0)
+        if order.status != Order.STATUS_PENDING:
+            return JsonResponse({'error': 'order not pending'}, status=409)
 
-        if not stored_nonce or stored_nonce != body['nonce']:
+        nonce = body['nonce']
+        try:
+            stored = _load_challenge(order, nonce)
+            failed_sigs = _challenge_failures(order, nonce) if stored else 0
+        except Exception as e:
+            log.warning('wc_create_quote: challenge store unavailable for order=%s: %s', order.code, e)
+            return JsonResponse({'error': 'challenge store temporarily unavailable'}, status=503)
+        if not stored:
             return JsonResponse({'error': 'nonce mismatch'}, status=400)
-        if time.time() > expires_at:
+        message = stored['message']
+        if time.time() > stored['expires_at']:
             return JsonResponse({'error': 'challenge expired'}, status=400)
 
         # V53: per-challenge failed-sig budget. Catches the case where an
         # attacker rotates IPs (defeating the per-IP limiter above) against
         # a single legitimate pending order/challenge. Once the budget is
-        # spent the buyer must request a fresh /challenge/ — which resets
-        # `failed_sig_attempts` to 0 implicitly via the new challenge's
-        # info_data overwrite.
-        failed_sigs = int(info.get('failed_sig_attempts', 0))
+        # spent the buyer must request a fresh /challenge/, whose nonce
+        # starts a fresh counter.
         if failed_sigs >= WC_CREATE_QUOTE_PER_CHALLENGE_BUDGET:
             log.warning(
                 'wc_create_quote rejected: per-challenge budget exhausted (%d/%d) order=%s',
@@ -570,14 +671,12 @@ def create_quote(request, **kwargs):
         sig_len_bytes = len(signature_hex[2:]) // 2 if signature_hex.startswith('0x') else len(signature_hex) // 2
 
         def _record_sig_failure():
-            """V53: bump `failed_sig_attempts` on the pending payment so the
-            per-challenge budget catches IP-rotating brute-force. Save is
-            best-effort — failing to record the failure shouldn't itself
-            500 the response."""
+            """V53: count the failure against the challenge so the
+            per-challenge budget catches IP-rotating brute-force. Best-effort
+            — failing to record the failure shouldn't itself 500 the
+            response."""
             try:
-                info['failed_sig_attempts'] = failed_sigs + 1
-                payment.info_data = info
-                payment.save(update_fields=['info'])
+                _record_challenge_failure(order, nonce)
             except Exception as e:
                 log.warning('wc_create_quote: failed to record sig failure: %s', e)
 
@@ -607,8 +706,7 @@ def create_quote(request, **kwargs):
                         f'(got {sig_len_bytes}-byte signature, not a 65-byte ECDSA)'
                     ),
                 }, status=400)
-            provider = WalletConnectPayment(order.event)
-            settings_key = provider.settings.get('alchemy_api_key', default=None)
+            settings_key = get_wc_config(order.event).alchemy_api_key
             from pretix_eth.verification import verify_eth_payer_signature
             # Coinbase/Base Smart Wallet (and other ERC-1271 wallets that use
             # EIP-712 domain separators) bind signatures to the chain the
@@ -660,7 +758,7 @@ def create_quote(request, **kwargs):
             sig_ok = False
             for cid in check_chain_ids:
                 try:
-                    w3_for_sig = _get_web3(cid, settings_key)
+                    w3_for_sig = rpc.get_web3(cid, settings_key)
                     if verify_eth_payer_signature(
                         w3=w3_for_sig, payer=claimed_payer, message=message, signature=signature_hex,
                     ):
@@ -706,11 +804,11 @@ def create_quote(request, **kwargs):
                 return JsonResponse({'error': 'ETH temporarily unavailable'}, status=503)
             eth_price = result.price
 
-        provider = WalletConnectPayment(order.event)
-        receive_address = provider.settings.get('receive_address')
+        config = get_wc_config(order.event)
+        receive_address = config.receive_address
         if not receive_address:
             return JsonResponse({'error': 'receive_address not configured'}, status=500)
-        ttl = int(provider.settings.get('quote_ttl_seconds', default=600))
+        ttl = config.quote_ttl_seconds
 
         quote = build_quote(
             order_code=order.code,
@@ -722,33 +820,35 @@ def create_quote(request, **kwargs):
             sig_chain_id=validated_chain, payer_code_prefix=payer_code_prefix,
         )
 
-        info['quote'] = quote
-        # Append-only quote history. A buyer who re-quotes on the SAME payment
-        # (e.g. switching wallet/token in the widget) would otherwise overwrite
-        # `info['quote']` and lose the earlier attempts — leaving admin recovery
-        # blind to which wallets/amounts were tried. Keep slim entries (no
-        # signature blob, to bound info_data size), deduped by quote_id and
-        # capped. Admin recovery + the manual-verify picker read this history.
-        hist = list(info.get('quotes') or [])
-        if not any(h.get('quote_id') == quote['quote_id'] for h in hist):
-            hist.append({
-                'quote_id': quote['quote_id'],
-                'chain_id': quote['chain_id'],
-                'symbol': quote['symbol'],
-                'token_address': quote.get('token_address'),
-                'intended_payer': quote['intended_payer'],
-                'amount_raw': quote['amount_raw'],
-                'order_total_usd': quote.get('order_total_usd'),
-                'created_at': quote['created_at'],
-                'expires_at': quote['expires_at'],
-            })
-        info['quotes'] = hist[-25:]
+        # The quote itself — and every earlier one on this payment, for admin
+        # recovery when a buyer switched wallet/token — lives in `WCQuote`;
+        # info_data only points at the current one. Keeps the re-quote write a
+        # narrow insert plus a small `info` update rather than re-serializing
+        # a growing history blob. Legacy keys are dropped as payments re-quote.
+        #
+        # With a real cache this is the first durable write of the flow: the
+        # pending payment is found or created here, under the order's row
+        # lock so two concurrent quotes can't each create one. Without one the
+        # payment carries the challenge, which stays valid for re-quotes until
+        # it expires; only its failed-signature counter is reset.
+        with transaction.atomic():
+            Order.objects.select_for_update().filter(pk=order.pk).first()
+            payment = _pending_wc_payment(order, create=True)
+            info = payment.info_data or {}
+            info['quote_id'] = quote['quote_id']
+            dropped = _CHALLENGE_INFO_KEYS if _challenges_in_cache() else ('failed_sig_attempts',)
+            for key in ('quote', 'quotes') + dropped:
+                info.pop(key, None)
+            payment.info_data = info
+            payment.save(update_fields=['info'])
+            WCQuote.from_quote(payment, quote).save()
         # V53: clear the failed-sig counter on success so a buyer who hit
         # one bad sig and corrected it doesn't carry the budget tax into
         # future quote builds on the same challenge.
-        info.pop('failed_sig_attempts', None)
-        payment.info_data = info
-        payment.save()
+        try:
+            cache.delete(_CHALLENGE_FAILS_KEY.format(order=order.pk, nonce=nonce))
+        except Exception:
+            pass
 
     return JsonResponse(quote)
 
@@ -762,57 +862,21 @@ def _verify_bad(reason: str, status: int = 400, **extra):
     return JsonResponse({'error': reason}, status=status)
 
 
-def _revalidate_quote_signer(quote, settings_key):
-    """Re-run the quote-time signer check at settlement. Closes the smart-wallet
-    TOCTOU (V79 ERC-1271 toggle, V75 EIP-7702 revoke/redelegate): a validator
-    that was only transiently authorized at quote time no longer validates here.
-    EOA quotes re-recover cheaply (chain-independent); smart-wallet quotes
-    re-eth_call isValidSignature on the chain that validated at quote time.
-    Returns (ok: bool, reason: str)."""
-    from pretix_eth.verification import verify_eth_payer_signature
-    sig = quote.get('signature')
-    msg = quote.get('signed_message')
-    cid = quote.get('sig_chain_id')
-    payer = quote.get('intended_payer')
-    if not (sig and msg and cid and payer):
-        # Legacy quote minted before signer binding existed — refuse to settle
-        # rather than trust an unverifiable one-block snapshot.
-        return False, 'quote has no bound signer (re-quote required)'
-    try:
-        w3 = _get_web3(int(cid), settings_key)
-    except Exception as e:
-        return False, f'signer re-check web3 error: {e}'
-    try:
-        if not verify_eth_payer_signature(w3=w3, payer=payer, message=msg, signature=sig):
-            return False, 'signer no longer validates for this quote'
-    except Exception as e:
-        return False, f'signer re-check errored: {e}'
-    # V75: if a code prefix was snapshotted (smart wallet / EIP-7702), require it
-    # to be unchanged. A revoke or redelegate to a different validator changes
-    # the 0xef0100||<impl> designator, so a quote bound at one delegation cannot
-    # settle after the delegation moved.
-    prefix = quote.get('payer_code_prefix')
-    if prefix:
-        try:
-            code = w3.eth.get_code(to_checksum_address(payer))
-            now_prefix = '0x' + bytes(code[:23]).hex()
-        except Exception as e:
-            return False, f'signer code re-check errored: {e}'
-        if now_prefix != prefix:
-            return False, 'payer code changed since quote (delegation revoked/redelegated)'
-    return True, ''
-
-
 @csrf_exempt
 @require_http_methods(['POST'])
 def verify(request, **kwargs):
-    """Full verification chain:
+    """Accept a tx hash for settlement:
     1. Input validation
-    2. One-time tx_hash check
-    3. Look up order + quote
-    4. Chain/quote expiry checks
-    5. On-chain verify (web3.py)
-    6. Atomic claim + Pretix payment.confirm()
+    2. The existing settlement job for this (quote, tx), if there is one
+    3. One-time tx_hash check
+    4. Look up order + quote
+    5. Chain/quote expiry + config checks
+    6. Submit the settlement job — on-chain verification, the atomic claim
+       and `payment.confirm()` run on a Celery worker (`pretix_eth.settlement`)
+
+    Answers 202 with a `status_url` while the job is in flight, 200 with
+    `verified: true` once it settled, and the job's error status once it
+    failed, so a client that keeps re-posting still sees the outcome.
     """
     body = _read_body(request)
 
@@ -826,14 +890,17 @@ def verify(request, **kwargs):
     # secondary per-quote cap below catches one buyer hammering a single
     # quote — but the per-IP one is what bounds the cost of attackers who
     # rotate fresh quote_ids to escape the per-quote bucket.
-    if not _check_wc_verify_ip_rate_limit(body['organizer'], body['event'], client_ip):
-        # 5s Retry-After: the tx is already mined, blocks come fast, and we
-        # want the buyer's poll to resume promptly once a slot frees up.
+    limited = _check_wc_verify_ip_rate_limit(body['organizer'], body['event'], client_ip)
+    if not limited:
+        # Retry-After is when the sliding window next admits a request: the
+        # tx is already mined and we want the buyer's poll to resume as soon
+        # as a slot frees up, not after a fixed guess.
         log.warning('wc_verify rejected: rate limit exceeded (ip) ip=%s', client_ip)
-        return _rate_limited('rate limit exceeded (ip)', retry_after=5, ip=client_ip)
-    if not _check_rate_limit(body['quote_id'], client_ip):
+        return _rate_limited('rate limit exceeded (ip)', retry_after=limited.retry_after, ip=client_ip)
+    limited = _check_rate_limit(body['quote_id'], client_ip)
+    if not limited:
         log.warning('wc_verify rejected: rate limit exceeded quote_id=%s ip=%s', body.get('quote_id'), client_ip)
-        return _rate_limited('rate limit exceeded', retry_after=5, quote_id=body.get('quote_id'), ip=client_ip)
+        return _rate_limited('rate limit exceeded', retry_after=limited.retry_after, quote_id=body.get('quote_id'), ip=client_ip)
 
     tx_hash = body['tx_hash']
     if not _TX_HASH_RE.match(tx_hash):
@@ -850,52 +917,43 @@ def verify(request, **kwargs):
     except (TypeError, ValueError):
         return _verify_bad('invalid chain_id', chain_id=body.get('chain_id'))
 
+    # A job already submitted for this pair answers for itself — including
+    # after it settled, when the checks below would now reject the tx as used.
+    # One that failed on an RPC outage goes through the checks again and is
+    # started over by `submit`.
+    status_url = _settlement_status_url(request, body['quote_id'], tx_hash)
+    job = settlement.poll(body['quote_id'], tx_hash)
+    if job is not None and not settlement.retryable(job):
+        return _settlement_response(job, status_url)
+
     # Fail fast on one-time tx_hash check. Now exact-match against the
     # canonicalised lowercase form (see V45 note above).
     if WCPaymentAttempt.objects.filter(tx_hash=tx_hash, state='completed').exists():
         return _verify_bad('tx already used for a completed order', tx_hash=tx_hash)
 
     with scopes_disabled():
-        # Find the order by matching quote_id in any pending walletconnect payment
-        try:
-            order = Order.objects.get(
-                event__slug=body['event'],
-                event__organizer__slug=body['organizer'],
-                payments__provider='walletconnect',
-                payments__state='created',
+        # One indexed lookup on the unique quote_id, scoped to the event and
+        # to a still-pending walletconnect payment — independent of how many
+        # orders are pending on the event.
+        row = (
+            WCQuote.objects
+            .select_related('payment__order__event')
+            .filter(
+                quote_id=body['quote_id'],
+                payment__provider='walletconnect',
+                payment__state='created',
+                payment__order__event__slug=body['event'],
+                payment__order__event__organizer__slug=body['organizer'],
             )
-        except Order.DoesNotExist:
-            return _verify_bad('order not found', status=404,
-                               event=body.get('event'), organizer=body.get('organizer'))
-        except Order.MultipleObjectsReturned:
-            # Multiple pending orders on event — disambiguate by quote_id below
-            order = None
-
-        # Find the payment with matching quote_id
-        if order is None:
-            candidates = Order.objects.filter(
-                event__slug=body['event'],
-                event__organizer__slug=body['organizer'],
-                payments__provider='walletconnect',
-                payments__state='created',
-            ).distinct()
-        else:
-            candidates = [order]
-
-        payment = None
-        for candidate in candidates:
-            for p in candidate.payments.filter(provider='walletconnect', state='created'):
-                if (p.info_data or {}).get('quote', {}).get('quote_id') == body['quote_id']:
-                    order = candidate
-                    payment = p
-                    break
-            if payment is not None:
-                break
-
-        if payment is None:
+            .first()
+        )
+        # Only the payment's current quote settles; one the buyer re-quoted
+        # over (wallet/token switch) is superseded. Payments quoted before the
+        # `quote_id` pointer still carry the full quote under `info['quote']`.
+        if row is None or WCQuote.current_quote_id(row.payment) != row.quote_id:
             return _verify_bad('quote not found', status=404, quote_id=body.get('quote_id'))
-
-        quote = payment.info_data['quote']
+        order = row.payment.order
+        quote = row.data
 
         if chain_id != quote['chain_id']:
             return _verify_bad('chain_id mismatch',
@@ -908,151 +966,167 @@ def verify(request, **kwargs):
         # V46: re-check the WC config at settlement time. An operator can flip
         # the provider/chain/token toggles off between quote creation and
         # verify; without this re-check, in-flight quotes would still settle
-        # against now-disabled rails.
+        # against now-disabled rails. (The settlement task checks again.)
         _, err = _wc_config_or_403(order.event, chain_id=chain_id, symbol=quote.get('symbol'))
         if err is not None:
             return err
 
-        provider = WalletConnectPayment(order.event)
-        settings_key = provider.settings.get('alchemy_api_key', default=None)
-        min_conf = int(provider.settings.get('min_confirmations', default=1))
-
-        # V75/V79: re-establish the signer against the order's OWN stored quote
-        # before settling. A validator that was only transiently authorized at
-        # quote time (ERC-1271 toggle, EIP-7702 delegation) no longer validates.
-        signer_ok, signer_reason = _revalidate_quote_signer(quote, settings_key)
-        if not signer_ok:
-            return _verify_bad(signer_reason, tx_hash=tx_hash)
-
-        w3 = _get_web3(chain_id, settings_key)
-
-        amount_raw = int(quote['amount_raw'])
-        if quote['symbol'] == 'ETH':
-            vr = verify_native_eth(
-                w3=w3, tx_hash=tx_hash,
-                expected_from=quote['intended_payer'],
-                expected_to=quote['receive_address'],
-                expected_amount_wei=amount_raw,
-                min_confirmations=min_conf,
-            )
-        else:
-            vr = verify_erc20_transfer(
-                w3=w3, chain_id=chain_id, tx_hash=tx_hash,
-                expected_from=quote['intended_payer'],
-                expected_to=quote['receive_address'],
-                expected_token=quote['token_address'],
-                expected_amount=amount_raw,
-                min_confirmations=min_conf,
-            )
+    job = settlement.submit(quote_id=quote['quote_id'], tx_hash=tx_hash, chain_id=chain_id, order_code=order.code)
+    return _settlement_response(job, status_url)
 
-        if not vr.verified:
-            log.warning('wc_verify rejected: on-chain verify failed: %s (tx=%s)', vr.error, tx_hash)
-            # Surface confirmation progress for the wc_inject UI's progress bar.
-            return JsonResponse({
-                'verified': False,
-                'error': vr.error,
-                'confirmations': vr.confirmations,
-                'confirmations_required': vr.min_confirmations,
-            }, status=400)
-
-        # V49: bind the on-chain transfer to the quote's freshness window.
-        # Without this, any prior matching transfer (e.g. a refund, a stale
-        # canceled-quote transfer, or an out-of-band send to the merchant)
-        # could be replayed once into a future quote. The plain ERC-20
-        # `Transfer` log carries no order/quote binding, so the only way to
-        # require "this transfer was made FOR this quote" is to constrain the
-        # block timestamp to the quote window.
-        try:
-            receipt_block = w3.eth.get_block(vr.block_number)
-            block_ts = int(receipt_block.timestamp)
-        except Exception as e:
-            return _verify_bad(f'failed to fetch block timestamp: {e}', tx_hash=tx_hash)
-        quote_created = int(quote.get('created_at', 0))
-        quote_expires = int(quote.get('expires_at', 0))
-        if quote_created and block_ts < quote_created:
-            return _verify_bad('tx mined before quote was issued',
-                               block_ts=block_ts, quote_created=quote_created, tx_hash=tx_hash)
-        if quote_expires and block_ts > quote_expires:
-            return _verify_bad('tx mined after quote expired',
-                               block_ts=block_ts, quote_expires=quote_expires, tx_hash=tx_hash)
-
-        # OFAC re-check at settlement: the SDN list may have gained the payer
-        # between quote time and now. The funds are already on-chain at this
-        # point — do NOT confirm, do NOT auto-refund (refunding a sanctioned
-        # address is itself a violation). Leave the payment pending, tag the
-        # order for a human, and escalate.
-        from pretix_eth.sanctions import is_sanctioned
-        if is_sanctioned(quote['intended_payer']):
-            log.error(
-                'wc_verify BLOCKED: OFAC-sanctioned payer %s order=%s tx=%s — order left pending, escalate',
-                quote['intended_payer'], order.code, tx_hash,
-            )
-            try:
-                order.log_action('pretix_eth.ofac_hold', data={
-                    'payer': quote['intended_payer'], 'tx_hash': tx_hash,
-                })
-            except Exception:
-                log.exception('wc_verify: failed to write ofac_hold log action for order %s', order.code)
-            return _verify_bad('payment could not be accepted', status=403, tx_hash=tx_hash)
-
-        # Atomic claim: unique constraint on tx_hash prevents race; the
-        # SELECT FOR UPDATE on Order + re-check of order.status closes the
-        # V51 window (mark_order_expired() flipped the order to expired
-        # while a verify was mid-flight). The dup pre-check above is racey
-        # by itself; the unique-constraint catch in `except IntegrityError`
-        # below is the actual one-time-use guarantee.
+
+def _settlement_status_url(request, quote_id, tx_hash):
+    # Relative to this request's path, so the event-scoped and root
+    # registrations of /verify/ each point at their own /verify/status/.
+    return f'{request.path.rstrip("/")}/status/?' + urlencode({'quote_id': quote_id, 'tx_hash': tx_hash})
+
+
+def _settlement_body(job, status_url):
+    body = {
+        'status': job['state'],
+        'version': job.get('version'),
+        'verified': job['state'] == settlement.SETTLED,
+        'order_code': job.get('order_code'),
+        'confirmations': job.get('confirmations'),
+        'confirmations_required': job.get('confirmations_required'),
+        'status_url': status_url,
+    }
+    if job['state'] == settlement.SETTLED:
+        body['block_number'] = job.get('block_number')
+    elif job.get('error'):
+        body['error'] = job['error']
+    return body
+
+
+def _settlement_response(job, status_url):
+    body = _settlement_body(job, status_url)
+    if job['state'] == settlement.SETTLED:
+        return JsonResponse(body)
+    if job['state'] == settlement.FAILED:
+        return JsonResponse(body, status=job.get('http_status') or 400)
+    return JsonResponse(body, status=202)
+
+
+# Longest a status request may be held open: a long poll (`?wait=`) or one
+# server-sent-event stream, after which EventSource reconnects on its own
+# (with Last-Event-ID). Each held request occupies a sync web worker, so
+# this stays short, and at most `WC_STATUS_HOLDS_PER_IP` are held per client
+# IP; past that the request is answered at once (an SSE stream then sends
+# the current state and closes, and EventSource reconnects after its
+# `retry` delay — i.e. degrades to a rate-limited poll).
+SETTLEMENT_WAIT_MAX = 25
+WC_STATUS_HOLDS_PER_IP = int(os.environ.get('WC_STATUS_HOLDS_PER_IP', '4'))
+_STATUS_HOLDS_KEY = 'pretix_eth_wc_status_holds:{ip}'
+
+
+def _acquire_status_hold(client_ip: str) -> bool:
+    """Take one of the IP's held-request slots; False if none is free (or
+    the cache is unavailable — then nothing is held)."""
+    key = _STATUS_HOLDS_KEY.format(ip=client_ip)
+    try:
+        cache.add(key, 0, SETTLEMENT_WAIT_MAX + 15)
+        if cache.incr(key) <= WC_STATUS_HOLDS_PER_IP:
+            return True
+        cache.decr(key)
+    except Exception as e:
+        log.warning('wc verify_status: hold accounting unavailable: %s', e)
+    return False
+
+
+def _release_status_hold(client_ip: str):
+    try:
+        cache.decr(_STATUS_HOLDS_KEY.format(ip=client_ip))
+    except Exception:
+        pass
+
+
+@require_http_methods(['GET'])
+def verify_status(request, **kwargs):
+    """Status resource for a settlement job submitted by `verify`
+    (pending → confirming → settled/failed). With a Celery broker this is a
+    read of the job record (mostly from its short-lived cached copy), no
+    RPC or other database work. Without one, a request (or a
+    waiting watcher) that finds the job due runs its next settlement check
+    inline — RPC verification and possibly the claim, `payment.confirm()`
+    and the paid email — see `settlement._kick_if_stalled`. 404 if the job
+    is unknown — never submitted, or cleaned up a day after it finished —
+    in which case the client re-posts to verify.
+
+    Instead of re-polling, a client can wait for the next change:
+    - `?wait=<seconds>&since=<version>` holds the request until the job's
+      version differs from `since` (or the wait is up) and answers with it;
+    - `Accept: text/event-stream` (or `?format=sse`) streams every change as
+      an SSE `status` event, ending with the settled/failed one.
+    Both are per-IP rate limited like the other buyer endpoints, and only
+    `WC_STATUS_HOLDS_PER_IP` requests per IP are held open at a time.
+    """
+    client_ip = get_client_ip(request)
+    limited = _wc_buyer_rate_limit(client_ip, 'verify_status')
+    if not limited:
+        return _rate_limited(retry_after=limited.retry_after)
+
+    quote_id = request.GET.get('quote_id') or ''
+    tx_hash = (request.GET.get('tx_hash') or '').lower()
+    if not quote_id or not _TX_HASH_RE.match(tx_hash):
+        return JsonResponse({'error': 'quote_id and tx_hash are required'}, status=400)
+    job = settlement.poll(quote_id, tx_hash)
+    if job is None:
+        return JsonResponse({'error': 'unknown settlement'}, status=404)
+    status_url = f'{request.path}?' + urlencode({'quote_id': quote_id, 'tx_hash': tx_hash})
+    since = _int_or_none(request.headers.get('Last-Event-ID') or request.GET.get('since'))
+
+    if _wants_event_stream(request):
+        response = StreamingHttpResponse(
+            _stream_settlement(quote_id, tx_hash, since, status_url, client_ip, job),
+            content_type='text/event-stream',
+        )
+        response['Cache-Control'] = 'no-store'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    wait = min(_int_or_none(request.GET.get('wait')) or 0, SETTLEMENT_WAIT_MAX)
+    if wait > 0 and _acquire_status_hold(client_ip):
         try:
-            with transaction.atomic():
-                # V51: re-fetch the order under a row lock and re-check it
-                # is still pending + still within its payment deadline.
-                order = Order.objects.select_for_update().get(pk=order.pk)
-                if order.status != Order.STATUS_PENDING:
-                    return _verify_bad('order is not in pending state',
-                                       status=410, order_status=order.status, tx_hash=tx_hash)
-                if order.expires and order.expires < tz_now():
-                    return _verify_bad('order payment deadline has elapsed',
-                                       status=410, order_expires=str(order.expires), tx_hash=tx_hash)
-
-                WCPaymentAttempt.objects.create(
-                    tx_hash=tx_hash, quote_id=quote['quote_id'],
-                    order_code=order.code, payer=quote['intended_payer'],
-                    chain_id=chain_id, state='completed',
-                )
-
-                info = payment.info_data or {}
-                info['tx_hash'] = tx_hash
-                info['chain_id'] = chain_id
-                info['token_symbol'] = quote['symbol']
-                info['token_address'] = quote.get('token_address')
-                info['payer'] = quote['intended_payer']
-                # Store as a plain integer string — the payment_control_render
-                # helper formats it to human-readable decimals using the token
-                # symbol. The old `f"{raw} (raw)"` format leaked into the Pretix
-                # admin UI as literal text.
-                info['amount'] = str(quote['amount_raw'])
-                info['block_number'] = vr.block_number
-                payment.info_data = info
-                payment.save()
-
-                # Render the payment recap for the order-paid email. The paid
-                # email path uses `{payment_info}` = whatever we pass as
-                # `mail_text=` to payment.confirm() — it does NOT call
-                # `order_pending_mail_render` on its own. Without this, the
-                # confirmation email's {payment_info} placeholder renders empty.
-                try:
-                    mail_text = WalletConnectPayment(order.event).order_pending_mail_render(order, payment)
-                except Exception as e:
-                    log.warning('[wc verify] failed to render mail_text for %s: %s', order.code, e)
-                    mail_text = ''
-                payment.confirm(mail_text=mail_text)
-        except IntegrityError:
-            return _verify_bad('tx already used (race)', status=409, tx_hash=tx_hash)
+            for job in settlement.watch(quote_id, tx_hash, since=since, timeout=wait):
+                break
+        finally:
+            _release_status_hold(client_ip)
+    response = JsonResponse(_settlement_body(job, status_url))
+    response['Cache-Control'] = 'no-store'
+    return response
 
-    return JsonResponse({
-        'verified': True,
-        'block_number': vr.block_number,
-        'order_code': order.code,
-    })
+
+def _int_or_none(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _wants_event_stream(request) -> bool:
+    if (request.GET.get('format') or '').strip().lower() == 'sse':
+        return True
+    return 'text/event-stream' in request.headers.get('Accept', '')
+
+
+def _stream_settlement(quote_id, tx_hash, since, status_url, client_ip, current):
+    yield 'retry: 1000\n\n'
+    if not _acquire_status_hold(client_ip):
+        # Over the IP's hold cap: send the current state and let the client
+        # reconnect after `retry`.
+        if current.get('version') != since:
+            yield _sse_status(current, status_url)
+        return
+    try:
+        for job in settlement.watch(quote_id, tx_hash, since=since, timeout=SETTLEMENT_WAIT_MAX):
+            yield _sse_status(job, status_url)
+    finally:
+        _release_status_hold(client_ip)
+
+
+def _sse_status(job, status_url):
+    data = json.dumps(_settlement_body(job, status_url))
+    return f'id: {job.get("version")}\nevent: status\ndata: {data}\n\n'
 
 
 @csrf_exempt
@@ -1228,8 +1302,9 @@ def item_pricing(request, **kwargs):
     pricing becomes needed, extend this view to emit variation rows too.
     """
     client_ip = get_client_ip(request)
-    if not _wc_buyer_rate_limit(client_ip, 'item_pricing'):
-        return _rate_limited()
+    limited = _wc_buyer_rate_limit(client_ip, 'item_pricing')
+    if not limited:
+        return _rate_limited(retry_after=limited.retry_after)
 
     event = getattr(request, 'event', None)
     if event is None:
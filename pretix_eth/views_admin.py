@@ -11,7 +11,7 @@ from django.views.decorators.http import require_http_methods
 from django_scopes import scopes_disabled
 
 from pretix_eth.models import (
-    WCPaymentAttempt, X402CompletedOrder, X402PendingOrder,
+    WCPaymentAttempt, WCQuote, X402CompletedOrder, X402PendingOrder,
 )
 from pretix_eth.x402.auth import require_pretix_admin_token
 from pretix_eth.x402 import ticketstore
@@ -41,25 +41,19 @@ def _truthy(v) -> bool:
 def _all_wc_quotes(order):
     """Every WC quote on the order, newest-first, deduped by ``quote_id``.
 
-    Sources, so no attempt is missed:
-      * each payment's current ``info['quote']``, AND
-      * each payment's append-only ``info['quotes']`` history — a buyer who
-        re-quotes on the same payment (wallet/token switch) overwrites
-        ``info['quote']`` but the history preserves the earlier attempts.
-    Across ALL of the order's WC payments (created + canceled), because retries
-    also spawn fresh payments that supersede the prior one.
+    Read from ``WCQuote``, which keeps a row for every quote ever minted — a
+    buyer who re-quotes on the same payment (wallet/token switch) overwrites
+    the payment's ``info['quote_id']`` pointer but the earlier attempts keep
+    their rows. Across ALL of the order's WC payments (created + canceled),
+    because retries also spawn fresh payments that supersede the prior one.
     """
     seen = set()
     out = []
     for p in order.payments.all():
         if p.provider != 'walletconnect':
             continue
-        info = p.info_data or {}
-        candidates = list(info.get('quotes') or [])
-        cur = info.get('quote')
-        if cur:
-            candidates.append(cur)
-        for q in candidates:
+        for row in p.wc_quotes.all():
+            q = row.data
             qid = q.get('quote_id')
             if not qid or qid in seen:
                 continue
@@ -82,10 +76,10 @@ def _find_wc_quote(order, quote_id: str):
     """The order's WC quote with this exact ``quote_id`` (across all payments +
     history), or ``None`` — lets the admin bind to the specific attempt matching
     the real on-chain payment when a buyer made several (wallet/token/amount)."""
-    for q in _all_wc_quotes(order):
-        if q.get('quote_id') == quote_id:
-            return q
-    return None
+    row = WCQuote.objects.filter(
+        quote_id=quote_id, payment__order=order, payment__provider='walletconnect',
+    ).first()
+    return row.data if row is not None else None
 
 
 def _read_body(request) -> dict:
@@ -258,6 +252,7 @@ def admin_orders(request: HttpRequest, **kwargs):
     # TODO: enforce event-level authorization — verify token.team has access to event.organizer
 
     from django.db.models import Sum, Count
+    from django.db.models.fields.json import KT
     from django.db.utils import ProgrammingError
     from pretix.base.models import Order
     with scopes_disabled():
@@ -565,34 +560,38 @@ def admin_orders(request: HttpRequest, **kwargs):
                     payments__state='created',
                 )
                 .distinct()
-                .prefetch_related('payments')
                 .only('code', 'secret', 'email', 'total', 'datetime', 'status', 'testmode')
                 .order_by('-datetime')[:200]
             )
-            for porder in wc_unpaid_qs:
-                if porder.code in already_completed_codes:
-                    continue
-                # All quotes for this order — current + append-only history,
-                # across every WC payment (created + canceled), newest first — so
-                # the manual-verify modal can show a picker. A buyer who retries
-                # (new payment) or re-quotes in the widget (wallet/token switch,
-                # overwriting the payment's current quote) leaves several quotes
-                # with different payers/amounts; the history preserves them all.
-                # `quote` (singular) stays the newest for pre-fill / backwards compat.
-                quotes_list = [
-                    {
-                        'quoteId': q.get('quote_id'),
-                        'chainId': q.get('chain_id'),
-                        'symbol': q.get('symbol'),
-                        'intendedPayer': q.get('intended_payer'),
-                        'amountRaw': q.get('amount_raw'),
-                        'orderTotalUsd': q.get('order_total_usd'),
-                        'createdAt': q.get('created_at'),
-                        'expiresAt': q.get('expires_at'),
-                    }
-                    for q in _all_wc_quotes(porder)
-                    if q.get('intended_payer')
-                ]
+            unpaid_orders = [o for o in wc_unpaid_qs if o.code not in already_completed_codes]
+            # All quotes for these orders — every quote minted on any of their
+            # WC payments (created + canceled), newest first — in one query on
+            # `WCQuote`, so the manual-verify modal can show a picker. A buyer
+            # who retries (new payment) or re-quotes in the widget (wallet/token
+            # switch) leaves several quotes with different payers/amounts.
+            # `quote` (singular) stays the newest for pre-fill / backwards compat.
+            quotes_by_order: dict = {}
+            quote_rows = (
+                WCQuote.objects
+                .filter(payment__order__in=[o.pk for o in unpaid_orders], payment__provider='walletconnect')
+                .exclude(intended_payer='')
+                .order_by('-created_at', '-pk')
+                .values('payment__order_id', 'quote_id', 'chain_id', 'symbol', 'intended_payer',
+                        'amount_raw', 'created_at', 'expires_at', order_total_usd=KT('data__order_total_usd'))
+            )
+            for q in quote_rows:
+                quotes_by_order.setdefault(q['payment__order_id'], []).append({
+                    'quoteId': q['quote_id'],
+                    'chainId': q['chain_id'],
+                    'symbol': q['symbol'],
+                    'intendedPayer': q['intended_payer'],
+                    'amountRaw': q['amount_raw'],
+                    'orderTotalUsd': q['order_total_usd'],
+                    'createdAt': int(q['created_at'].timestamp()),
+                    'expiresAt': int(q['expires_at'].timestamp()),
+                })
+            for porder in unpaid_orders:
+                quotes_list = quotes_by_order.get(porder.pk, [])
                 quote_info = quotes_list[0] if quotes_list else None
                 wc_unpaid.append({
                     'orderCode': porder.code,
@@ -656,6 +655,67 @@ def admin_stats(request: HttpRequest, **kwargs):
     })
 
 
+@csrf_exempt
+@require_http_methods(['GET'])
+@require_pretix_admin_token('can_view_orders')
+def admin_pricing(request: HttpRequest, **kwargs):
+    """Recent quorum prices per asset (shared by all workers), with the cache
+    TTL they currently imply, plus this worker's per-oracle health (success
+    rate, latency, deviation from quorum, demotion state). For underpayment disputes:
+    compare a quote's `eth_price_usd` / `created_at` against what the oracles
+    agreed on then."""
+    org = request.GET.get('organizer', '')
+    event_slug = request.GET.get('event', '')
+    event = _get_event(org, event_slug)
+    if not event:
+        return JsonResponse({'success': False, 'error': 'event not found'}, status=404)
+
+    from pretix_eth.pricing import get_oracle_health, get_price_history
+    return JsonResponse({
+        'success': True,
+        'history': get_price_history(),
+        'oracles': get_oracle_health(),
+    })
+
+
+@csrf_exempt
+@require_http_methods(['GET'])
+@require_pretix_admin_token('can_view_orders')
+def admin_sanctions(request: HttpRequest, **kwargs):
+    """Freshness, size and refresh counters for the OFAC and ScamSniffer
+    lists as seen by this worker: which version it screens against (and
+    whether that matches the published one), where it came from (snapshot
+    file, memory or the bundled fallback), and the last refresh error."""
+    org = request.GET.get('organizer', '')
+    event_slug = request.GET.get('event', '')
+    event = _get_event(org, event_slug)
+    if not event:
+        return JsonResponse({'success': False, 'error': 'event not found'}, status=404)
+
+    from pretix_eth.sanctions import get_list_metrics
+    return JsonResponse({'success': True, 'lists': get_list_metrics()})
+
+
+@csrf_exempt
+@require_http_methods(['GET'])
+@require_pretix_admin_token('can_view_orders')
+def admin_balances(request: HttpRequest, **kwargs):
+    """Wallet-balance cache counters for this worker: hits, misses, fetches
+    shared by concurrent callers, settlement invalidations and the hit
+    rate. A low hit rate under load means the TTL is too short for how
+    often the picker re-asks. Also reports the Zapper circuit breaker
+    (state, failures by kind, last error, last latency)."""
+    org = request.GET.get('organizer', '')
+    event_slug = request.GET.get('event', '')
+    event = _get_event(org, event_slug)
+    if not event:
+        return JsonResponse({'success': False, 'error': 'event not found'}, status=404)
+
+    from pretix_eth.x402.balances import get_balance_cache_stats
+    from pretix_eth.x402.zapper import get_zapper_health
+    return JsonResponse({'success': True, 'cache': get_balance_cache_stats(), 'zapper': get_zapper_health()})
+
+
 @csrf_exempt
 @require_http_methods(['POST'])
 @require_pretix_admin_token('can_change_orders')
@@ -987,7 +1047,8 @@ def admin_wc_verify(request: HttpRequest, **kwargs):
     from pretix_eth.payment import WalletConnectPayment
     from pretix_eth.pricing import fetch_eth_price_usd, usd_to_token_raw
     from pretix_eth.verification import verify_erc20_transfer, verify_native_eth
-    from pretix_eth.views import _get_web3, _wc_config_or_403
+    from pretix_eth.rpc import get_web3
+    from pretix_eth.views import _wc_config_or_403
 
     body = _read_body(request)
     event = _get_event(body.get('organizer', ''), body.get('event', ''))
@@ -1099,7 +1160,7 @@ def admin_wc_verify(request: HttpRequest, **kwargs):
             }, status=403)
 
         # V46 parity: re-check WC enabled + per-chain + per-token toggles
-        _, err = _wc_config_or_403(event, chain_id=chain_id, symbol=symbol)
+        config, err = _wc_config_or_403(event, chain_id=chain_id, symbol=symbol)
         if err is not None:
             return err
 
@@ -1143,13 +1204,12 @@ def admin_wc_verify(request: HttpRequest, **kwargs):
             log.exception('[wc admin verify] amount computation failed for %s', order.code)
             return JsonResponse({'success': False, 'error': f'amount computation failed: {e}'}, status=500)
 
-        provider = WalletConnectPayment(event)
-        receive_address = provider.settings.get('receive_address')
+        receive_address = config.receive_address
         if not receive_address:
             return JsonResponse({'success': False, 'error': 'receive_address not configured'}, status=500)
-        alchemy_key = provider.settings.get('alchemy_api_key', default=None)
-        min_conf = int(provider.settings.get('min_confirmations', default=1))
-        w3 = _get_web3(chain_id, alchemy_key)
+        alchemy_key = config.alchemy_api_key
+        min_conf = config.min_confirmations
+        w3 = get_web3(chain_id, alchemy_key)
 
         if symbol == 'ETH':
             vr = verify_native_eth(
@@ -1265,7 +1325,7 @@ def admin_wc_verify(request: HttpRequest, **kwargs):
                 payment.save()
 
                 try:
-                    mail_text = provider.order_pending_mail_render(order, payment)
+                    mail_text = WalletConnectPayment(event).order_pending_mail_render(order, payment)
                 except Exception as e:
                     log.warning('[wc admin verify] failed to render mail_text for %s: %s', order.code, e)
                     mail_text = ''
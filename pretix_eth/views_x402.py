@@ -15,11 +15,12 @@ from django.views.decorators.http import require_http_methods
 from django_scopes import scopes_disabled
 from web3 import Web3
 
-from pretix_eth.chains import SUPPORTED_CHAINS, get_token_contract, is_supported
-from pretix_eth.payment import WalletConnectPayment, _read_discount_pct
+from pretix_eth.chains import get_token_contract, is_supported
+from pretix_eth.payment import WalletConnectPayment
 from pretix_eth.pricing import fetch_eth_price_usd, usd_to_token_raw
 from pretix_eth.rpc import get_rpc_url
 from pretix_eth.verification import verify_erc20_transfer, verify_native_eth
+from pretix_eth.wcconfig import get_wc_config
 from pretix_eth.x402 import ticketstore
 from pretix_eth.x402.auth import require_pretix_token, get_client_ip
 from pretix_eth.x402.balances import fetch_balances_for_wallet
@@ -98,9 +99,7 @@ def _x402_enabled_or_404(event):
     operators still need to view, refund, and manually verify existing x402
     orders even on events that have since toggled x402 off.
     """
-    provider = _get_provider(event)
-    enabled = provider.settings.get('x402_enabled', as_type=bool, default=False)
-    if not enabled:
+    if not get_wc_config(event).x402_enabled:
         return JsonResponse(
             {'success': False, 'error': 'x402 flow not enabled for this event'},
             status=404,
@@ -134,10 +133,10 @@ def settings(request: HttpRequest, **kwargs):
             {'success': False, 'error': 'event not found'},
             status=404,
         )
-    provider = _get_provider(event)
+    config = get_wc_config(event)
     resp = JsonResponse({
-        'x402_enabled': provider.settings.get('x402_enabled', as_type=bool, default=False),
-        'fiat_purchase_enabled': provider.settings.get('fiat_purchase_enabled', as_type=bool, default=False),
+        'x402_enabled': config.x402_enabled,
+        'fiat_purchase_enabled': config.fiat_purchase_enabled,
     })
     # Short cache — storefront caches 5–15s so admin toggle flips propagate
     # quickly. `private` because the per-event scope makes this useless to
@@ -180,18 +179,12 @@ def _build_asset_caip(chain_id: int, token_address: str) -> str:
     return f'eip155:{chain_id}/erc20:{token_address}'
 
 
-def _supported_assets_for_event(provider) -> list:
-    """Build the list of supported (chain, token) combos from plugin settings.
-    Mirrors devcon's SUPPORTED_ASSETS_MAINNET shape."""
+def _supported_assets_for_event(config) -> list:
+    """Build the list of supported (chain, token) combos from the event's
+    settings snapshot. Mirrors devcon's SUPPORTED_ASSETS_MAINNET shape."""
     from pretix_eth.chains import TOKEN_CONTRACTS
-    enabled_chains = [
-        cid for cid in SUPPORTED_CHAINS
-        if str(provider.settings.get(f'chain_{cid}', default='True')).lower() in ('true', '1', 'yes')
-    ]
-    enabled_symbols = set()
-    for sym in ('USDC', 'USDT0', 'ETH'):
-        if str(provider.settings.get(f'token_{sym}', default='True')).lower() in ('true', '1', 'yes'):
-            enabled_symbols.add(sym)
+    enabled_chains = config.chains
+    enabled_symbols = set(config.tokens)
 
     assets = []
     for cid in enabled_chains:
@@ -242,7 +235,8 @@ def _typed_data_to_json(td: dict) -> dict:
 def payment_options(request: HttpRequest, **kwargs):
     """Return rich PaymentOption[] matching the devcon frontend contract:
     - asset (CAIP), symbol, name, chain, chainId (CAIP string)
-    - amount (raw token units), balance, sufficient
+    - amount (raw token units), balance, sufficient — both null, with
+      balanceMissing, when the balance couldn't be read
     - signingRequest: EIP-712 typed data for USDC/USDT0 gasless, eth_sendTransaction params for ETH
     - priceUsd (for ETH), expiresAt
     """
@@ -265,10 +259,10 @@ def payment_options(request: HttpRequest, **kwargs):
     if int(pending.expires_at.timestamp()) < int(timezone.now().timestamp()):
         return JsonResponse({'error': 'Payment has expired'}, status=400)
 
-    provider = _get_provider(event)
-    alchemy_key = provider.settings.get('alchemy_api_key', default=None) or None
-    zapper_key = provider.settings.get('zapper_api_key', default=None) or None
-    recipient = provider.settings.get('payment_recipient')
+    config = get_wc_config(event)
+    alchemy_key = config.alchemy_api_key
+    zapper_key = config.zapper_api_key
+    recipient = config.payment_recipient
     if not recipient:
         return JsonResponse({'error': 'merchant recipient not configured'}, status=500)
     expires_at = int(pending.expires_at.timestamp())
@@ -286,7 +280,7 @@ def payment_options(request: HttpRequest, **kwargs):
     import concurrent.futures
 
     enabled_chain_ids = sorted({
-        a['chainId'] for a in _supported_assets_for_event(provider)
+        a['chainId'] for a in _supported_assets_for_event(config)
     })
 
     def _run_price():
@@ -307,10 +301,16 @@ def payment_options(request: HttpRequest, **kwargs):
         balances_future = pool.submit(_run_balances)
         eth_price_usd = price_future.result()
         raw_balances = balances_future.result()
-    # Map for lookup: (chain_id, symbol, token_address_lower) -> balance_raw
+    # Map for lookup: (chain_id, symbol, token_address_lower) -> balance_raw.
+    # Entries the RPC path couldn't read (`missing`) stay out of the map and
+    # are flagged on the option instead of posing as a real zero balance.
     bal_map = {}
+    missing = set()
     for b in raw_balances:
         key_addr = (b.get('token_address') or NATIVE_ETH_PLACEHOLDER).lower()
+        if b.get('missing'):
+            missing.add((b['chain_id'], b['symbol'], key_addr))
+            continue
         bal_map[(b['chain_id'], b['symbol'], key_addr)] = b['balance']
 
     # Compute amounts
@@ -322,7 +322,7 @@ def payment_options(request: HttpRequest, **kwargs):
         eth_amount_wei = int((float(total_usd) / eth_price_usd) * 1e18) + 1
 
     options = []
-    for asset in _supported_assets_for_event(provider):
+    for asset in _supported_assets_for_event(config):
         cid = asset['chainId']
         sym = asset['symbol']
         token_addr = asset['tokenAddress']
@@ -335,11 +335,17 @@ def payment_options(request: HttpRequest, **kwargs):
         else:
             amount = str(usdc_amount_raw)
 
-        balance_raw = bal_map.get((cid, sym, token_addr.lower()), '0')
-        try:
-            sufficient = int(balance_raw) >= int(amount)
-        except (TypeError, ValueError):
-            sufficient = False
+        balance_missing = (cid, sym, token_addr.lower()) in missing
+        if balance_missing:
+            # Unknown, not zero: leave it to the wallet (and the relayer's
+            # own balance check) rather than hide a payable option.
+            balance_raw, sufficient = None, None
+        else:
+            balance_raw = bal_map.get((cid, sym, token_addr.lower()), '0')
+            try:
+                sufficient = int(balance_raw) >= int(amount)
+            except (TypeError, ValueError):
+                sufficient = False
 
         opt = {
             'asset': _build_asset_caip(cid, token_addr),
@@ -353,11 +359,13 @@ def payment_options(request: HttpRequest, **kwargs):
             'sufficient': sufficient,
             'expiresAt': expires_at,
         }
+        if balance_missing:
+            opt['balanceMissing'] = True
         if sym == 'ETH' and eth_price_usd is not None:
             opt['priceUsd'] = eth_price_usd
 
-        # Build signingRequest only for sufficient balances
-        if sufficient:
+        # Build signingRequest unless the balance is known to be short
+        if sufficient is not False:
             if sym in ('USDC', 'USDT0'):
                 # EIP-3009 gasless: sign TransferWithAuthorization
                 from pretix_eth.x402.typed_data import build_transfer_authorization_typed_data
@@ -541,12 +549,15 @@ def purchase(request, **kwargs):
     if (resp := _x402_enabled_or_404(event)) is not None:
         return resp
 
-    provider = _get_provider(event)
+    config = get_wc_config(event)
 
     # Rate limit
     client_ip = get_client_ip(request)
-    if not ticketstore.check_purchase_rate_limit(client_ip=client_ip):
-        return JsonResponse({'success': False, 'error': 'rate limit exceeded'}, status=429)
+    limited = ticketstore.check_purchase_rate_limit(client_ip=client_ip)
+    if not limited:
+        resp = JsonResponse({'success': False, 'error': 'rate limit exceeded'}, status=429)
+        resp['Retry-After'] = str(limited.retry_after)
+        return resp
 
     # Validation
     required = ('email', 'intended_payer', 'tickets')
@@ -824,7 +835,7 @@ def purchase(request, **kwargs):
     # Same normalisation helper used by `calculate_fee` — handles blank /
     # None / empty-string settings (post-fix: form is `required=False`)
     # uniformly as "no discount".
-    discount_pct = _read_discount_pct(provider.settings)
+    discount_pct = config.crypto_discount_pct
     crypto_discount = ((subtotal - voucher_discount) * discount_pct / Decimal('100')).quantize(Decimal('0.01'))
     total = subtotal - voucher_discount - crypto_discount
 
@@ -854,11 +865,7 @@ def purchase(request, **kwargs):
     try:
         eth_price_result = asyncio.run(fetch_eth_price_usd())
         if eth_price_result:
-            enabled_chains = [
-                cid for cid in SUPPORTED_CHAINS
-                if str(provider.settings.get(f'chain_{cid}', default='True')).lower() in ('true', '1', 'yes')
-            ]
-            for cid in enabled_chains:
+            for cid in config.chains:
                 # Only precompute ETH wei for chains where native currency is ETH.
                 # Polygon's native is POL — precomputing an ETH amount there would
                 # later get matched against a native-POL transfer, under-pricing the order.
@@ -921,7 +928,7 @@ def purchase(request, **kwargs):
 
     # Response keys use camelCase to match the existing devcon frontend contract.
     # The frontend reads data.paymentDetails.payment.paymentReference, data.orderSummary, etc.
-    recipient_addr = provider.settings.get('payment_recipient')
+    recipient_addr = config.payment_recipient
     return JsonResponse({
         'success': True,
         'paymentRequired': True,
@@ -996,8 +1003,7 @@ def prepare_authorization(request, **kwargs):
             'success': False, 'error': 'from does not match intendedPayer',
         }, status=403)
 
-    provider = _get_provider(event)
-    recipient = provider.settings.get('payment_recipient')
+    recipient = get_wc_config(event).payment_recipient
     if not recipient:
         return JsonResponse({'success': False, 'error': 'merchant recipient not configured'}, status=500)
 
@@ -1085,8 +1091,8 @@ def execute_transfer(request, **kwargs):
         return JsonResponse({'success': False, 'error': 'authorization.from does not match intendedPayer'}, status=403)
 
     # Fix 5 — validate authorization fields against order terms before sponsoring gas
-    provider = _get_provider(event)
-    recipient = provider.settings.get('payment_recipient')
+    config = get_wc_config(event)
+    recipient = config.payment_recipient
     if recipient and not _addr_eq(auth.get('to', ''), recipient):
         return JsonResponse({'success': False, 'error': 'authorization.to does not match configured recipient'}, status=400)
     expected_amount = usd_to_token_raw(pending.total_usd, body['symbol'], chain_id=chain_id, eth_price=None)
@@ -1106,10 +1112,11 @@ def execute_transfer(request, **kwargs):
     if int(auth.get('validBefore', 0)) < now_ts:
         return JsonResponse({'success': False, 'error': 'authorization already expired'}, status=400)
 
-    relayer_pk = resolve_relayer_pk(provider.settings.get('relayer_private_key', default=None))
+    # Read per call rather than from the snapshot, which lives in the shared cache.
+    relayer_pk = resolve_relayer_pk(_get_provider(event).settings.get('relayer_private_key', default=None))
     if not relayer_pk:
         return JsonResponse({'success': False, 'error': 'relayer not configured'}, status=503)
-    alchemy_key = provider.settings.get('alchemy_api_key', default=None) or None
+    alchemy_key = config.alchemy_api_key
 
     try:
         result: RelayerResult = execute_transfer_with_authorization(
@@ -1190,10 +1197,10 @@ def _x402_verify_and_finalize(
             payment_reference=payment_reference,
         )
 
-    provider = _get_provider(event)
-    alchemy_key = provider.settings.get('alchemy_api_key', default=None) or None
-    min_conf = int(provider.settings.get('min_confirmations', default=1))
-    recipient = provider.settings.get('payment_recipient')
+    config = get_wc_config(event)
+    alchemy_key = config.alchemy_api_key
+    min_conf = config.min_confirmations
+    recipient = config.payment_recipient
 
     w3 = _w3_for_chain(chain_id, alchemy_key)
 
@@ -1439,13 +1446,16 @@ def verify(request, **kwargs):
     # buyer-facing endpoint; admin manual-verify is auth-gated and skips it.
     client_ip = get_client_ip(request)
     with scopes_disabled():
-        if not ticketstore.check_verify_rate_limit(
+        limited = ticketstore.check_verify_rate_limit(
             payment_reference=body['payment_reference'], client_ip=client_ip,
-        ):
-            return _x402_verify_bad(
+        )
+        if not limited:
+            resp = _x402_verify_bad(
                 'rate limit exceeded', status=429,
                 payment_reference=body.get('payment_reference'), client_ip=client_ip,
             )
+            resp['Retry-After'] = str(limited.retry_after)
+            return resp
 
         pending = ticketstore.get_pending_order(event=event, payment_reference=body['payment_reference'])
         if pending is None:
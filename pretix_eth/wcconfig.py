@@ -0,0 +1,187 @@
+"""Per-event snapshot of the WalletConnect provider settings.
+
+Every `/plugin/wc/*` request used to build a `WalletConnectPayment` and walk
+its settings one key at a time — `_enabled`, one `chain_<id>` per supported
+chain, one `token_<sym>` per token, then the receive address, API keys and
+thresholds — each through hierarkey's proxy and sandbox (and a settings
+load on a cold event object). `get_wc_config(event)` resolves them once into
+a frozen `WCConfig` and keeps it in two tiers:
+
+  - in process, for `LOCAL_TTL` seconds — the steady-state cost of a lookup
+    is a dict hit;
+  - in the Django cache, for `CACHE_TTL` seconds, so other workers reuse
+    the snapshot instead of rebuilding it. Each cached snapshot carries the
+    event's generation token as read *before* the build; invalidation
+    replaces the token, so a build that raced a settings change is stored
+    under a stale generation and read back as a miss.
+
+Saving or deleting any `payment_walletconnect_*` setting (event or
+organizer level) drops both tiers for the affected events — see
+`pretix_eth.signals` — both immediately and again once the transaction
+commits. Other processes may serve their local copy for up to `LOCAL_TTL`
+seconds after a change; `CACHE_TTL` bounds staleness if a write bypasses
+the ORM signals altogether (raw SQL, `QuerySet.update`).
+
+    config = get_wc_config(event)
+    if not config.chain_enabled(chain_id):
+        ...
+"""
+import logging
+import os
+import secrets
+import threading
+import time
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Optional, Tuple
+
+from pretix_eth.chains import ALL_SYMBOLS, SUPPORTED_CHAINS
+
+log = logging.getLogger(__name__)
+
+SETTINGS_PREFIX = 'payment_walletconnect_'
+
+LOCAL_TTL = float(os.environ.get('WC_CONFIG_LOCAL_TTL_SECONDS', '5'))
+CACHE_TTL = 300
+
+_KEY = 'pretix_eth_wcconfig:{event_id}'
+# No timeout: an evicted generation reads as None, which no snapshot stored
+# after an invalidation carries.
+_GEN_KEY = 'pretix_eth_wcconfig_gen:{event_id}'
+# Entries are tiny, but one per event ever served; cleared outright past this.
+_LOCAL_MAX = 10000
+
+_local = {}
+_local_lock = threading.Lock()
+
+
+def _truthy(value) -> bool:
+    return str(value).lower() in ('true', '1', 'yes')
+
+
+@dataclass(frozen=True)
+class WCConfig:
+    event_id: int
+    enabled: bool
+    # Enabled chains / tokens, in SUPPORTED_CHAINS / ALL_SYMBOLS order.
+    chains: Tuple[int, ...]
+    tokens: Tuple[str, ...]
+    receive_address: Optional[str]
+    alchemy_api_key: Optional[str]
+    zapper_api_key: Optional[str]
+    min_confirmations: int
+    quote_ttl_seconds: int
+    # The x402 flow reads the same provider namespace. The relayer key is
+    # deliberately not here: a secret has no business in the shared cache.
+    payment_recipient: Optional[str]
+    x402_enabled: bool
+    fiat_purchase_enabled: bool
+    crypto_discount_pct: Decimal
+
+    def chain_enabled(self, chain_id) -> bool:
+        """Chains without a toggle (unsupported ones) aren't disabled here —
+        callers reject those via `is_supported`."""
+        return chain_id in self.chains or chain_id not in SUPPORTED_CHAINS
+
+    def token_enabled(self, symbol) -> bool:
+        return symbol in self.tokens or symbol not in ALL_SYMBOLS
+
+
+def _build(event) -> WCConfig:
+    from pretix_eth.payment import WalletConnectPayment, _read_discount_pct
+
+    settings = WalletConnectPayment(event).settings
+    return WCConfig(
+        event_id=event.pk,
+        enabled=bool(settings.get('_enabled', as_type=bool, default=False)),
+        chains=tuple(
+            cid for cid in SUPPORTED_CHAINS
+            if _truthy(settings.get(f'chain_{cid}', default='True'))
+        ),
+        tokens=tuple(
+            sym for sym in ALL_SYMBOLS
+            if _truthy(settings.get(f'token_{sym}', default='True'))
+        ),
+        receive_address=settings.get('receive_address') or None,
+        alchemy_api_key=settings.get('alchemy_api_key', default=None) or None,
+        zapper_api_key=settings.get('zapper_api_key', default=None) or None,
+        min_confirmations=int(settings.get('min_confirmations', default=1)),
+        quote_ttl_seconds=int(settings.get('quote_ttl_seconds', default=600)),
+        payment_recipient=settings.get('payment_recipient') or None,
+        x402_enabled=bool(settings.get('x402_enabled', as_type=bool, default=False)),
+        fiat_purchase_enabled=bool(settings.get('fiat_purchase_enabled', as_type=bool, default=False)),
+        crypto_discount_pct=_read_discount_pct(settings),
+    )
+
+
+def _cache():
+    from django.core.cache import cache
+    return cache
+
+
+def get_wc_config(event) -> WCConfig:
+    """The WalletConnect settings snapshot for `event`, from process memory,
+    the Django cache, or (on a miss in both) the event's settings."""
+    now = time.monotonic()
+    with _local_lock:
+        entry = _local.get(event.pk)
+    if entry is not None and entry[1] > now:
+        return entry[0]
+
+    key, gen_key = _KEY.format(event_id=event.pk), _GEN_KEY.format(event_id=event.pk)
+    config = None
+    try:
+        found = _cache().get_many([key, gen_key])
+    except Exception as e:
+        log.warning('wc config: cache unavailable, reading settings: %s', e)
+        found = None
+    if found is not None:
+        generation, stored = found.get(gen_key), found.get(key)
+        if isinstance(stored, tuple) and len(stored) == 2 and stored[0] == generation \
+                and isinstance(stored[1], WCConfig):
+            config = stored[1]
+    if config is None:
+        config = _build(event)
+        if found is not None:
+            try:
+                _cache().set(key, (generation, config), CACHE_TTL)
+            except Exception:
+                pass
+
+    with _local_lock:
+        if len(_local) >= _LOCAL_MAX:
+            _local.clear()
+        _local[event.pk] = (config, now + LOCAL_TTL)
+    return config
+
+
+def check_wc_config(event, *, chain_id=None, symbol=None) -> Tuple[Optional[WCConfig], Optional[str], Optional[int]]:
+    """Is WalletConnect enabled for `event` (and, if given, `chain_id` /
+    `symbol`)? Returns `(config, None, None)` if so, else `(None, reason,
+    http_status)`."""
+    config = get_wc_config(event)
+    if not config.enabled:
+        return None, 'walletconnect disabled', 404
+    if chain_id is not None and not config.chain_enabled(chain_id):
+        return None, 'chain disabled', 400
+    if symbol is not None and not config.token_enabled(symbol):
+        return None, 'token disabled', 400
+    return config, None, None
+
+
+def invalidate(event_id) -> None:
+    """Drop the snapshot for `event_id` from this process and the cache, and
+    start a new generation so a build already under way isn't served."""
+    with _local_lock:
+        _local.pop(event_id, None)
+    try:
+        _cache().set(_GEN_KEY.format(event_id=event_id), secrets.token_hex(8), None)
+        _cache().delete(_KEY.format(event_id=event_id))
+    except Exception as e:
+        log.warning('wc config: could not drop cached snapshot for event %s: %s', event_id, e)
+
+
+def clear_local() -> None:
+    """Forget every in-process snapshot (the shared cache is left alone)."""
+    with _local_lock:
+        _local.clear()
@@ -1,5 +1,6 @@
 # pretix_eth/x402/abi.py
-"""ERC-20 and EIP-3009 ABI fragments used by the relayer."""
+"""ERC-20, EIP-3009 and Multicall3 ABI fragments used by the relayer and
+the RPC balance reads."""
 
 ERC20_ABI = [
     {
@@ -72,3 +73,44 @@ USDC_ABI = [
     TRANSFER_WITH_AUTHORIZATION_BYTES_ABI,
     AUTHORIZATION_STATE_ABI,
 ]
+
+# Multicall3 — deployed at the same address on every chain in SUPPORTED_CHAINS
+# (deterministic deployment). `aggregate3` with allowFailure=True lets one
+# reverting token call come back as (False, b'') instead of failing the batch.
+MULTICALL3_ADDRESS = '0xcA11bde05977b3631167028862bE2a173976CA11'
+
+MULTICALL3_ABI = [
+    {
+        'name': 'aggregate3',
+        'type': 'function',
+        'stateMutability': 'payable',
+        'inputs': [{
+            'name': 'calls',
+            'type': 'tuple[]',
+            'components': [
+                {'name': 'target', 'type': 'address'},
+                {'name': 'allowFailure', 'type': 'bool'},
+                {'name': 'callData', 'type': 'bytes'},
+            ],
+        }],
+        'outputs': [{
+            'name': 'returnData',
+            'type': 'tuple[]',
+            'components': [
+                {'name': 'success', 'type': 'bool'},
+                {'name': 'returnData', 'type': 'bytes'},
+            ],
+        }],
+    },
+    {
+        'name': 'getEthBalance',
+        'type': 'function',
+        'stateMutability': 'view',
+        'inputs': [{'name': 'addr', 'type': 'address'}],
+        'outputs': [{'name': 'balance', 'type': 'uint256'}],
+    },
+]
+
+# 4-byte selectors for the calls batched through aggregate3.
+BALANCE_OF_SELECTOR = bytes.fromhex('70a08231')       # balanceOf(address)
+GET_ETH_BALANCE_SELECTOR = bytes.fromhex('4d2301cc')  # getEthBalance(address)
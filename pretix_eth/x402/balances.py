@@ -3,45 +3,471 @@ Port of devcon src/services/x402.ts payment-options logic.
 
 Two paths:
   - Zapper GraphQL (fast, ~200ms — single HTTP call across all chains)
-  - RPC eth_calls (slow, ~2s — N chains × 2 calls each)
+  - RPC eth_calls — one Multicall3 `aggregate3` per chain bundling the
+    native balance and every token `balanceOf` (per-call reads only if the
+    aggregate call itself fails on a chain). Chains are queried concurrently
+    on a shared bounded pool, so the path costs about the slowest single
+    chain, capped by a per-chain deadline.
 
 `fetch_balances_for_wallet` tries Zapper first when an API key is configured
-and falls back to RPC on any Zapper failure (HTTP error, schema mismatch,
-timeout). The RPC path remains the source of truth — Zapper is an opt-in
-optimization, not a hard dependency.
+and hedges with RPC: if Zapper hasn't answered within
+`ZAPPER_HEDGE_DELAY_SECONDS` (or fails sooner), the RPC path starts too and
+the first complete result wins — a slow Zapper costs max(hedge delay, RPC
+time) instead of its full timeout plus the RPC time. The RPC path remains
+the source of truth — Zapper is an opt-in optimization, not a hard
+dependency.
+
+Results are cached per (wallet, chain set) in the shared Django cache for
+`BALANCE_CACHE_TTL_SECONDS`, and concurrent misses for the same key within a
+process share one fetch — the picker re-asks on connect, reconnect and chain
+switch, so Zapper quota and RPC load follow distinct wallets, not page
+loads. A settled payment bumps the payer's generation counter
+(`invalidate_wallet_balances`, wired to the settlement models' post_save),
+which orphans every cached entry for that wallet at once.
+
+A chain the RPC path could not read (error, or no answer within
+`RPC_CHAIN_DEADLINE_SECONDS`) is not dropped or reported as zero: each of
+its (chain, token) entries comes back with `balance: None, missing: True`,
+so callers can tell "empty wallet" from "unknown".
+
+`iter_balances_for_wallet` is the progressive variant for streaming
+responses: same sources, cache and entry shape, but each chain is handed
+over as soon as it resolves instead of after the slowest one.
 """
+import concurrent.futures
 import logging
-from typing import List, Optional
+import os
+import threading
+from typing import Iterator, List, Optional, Tuple
+from eth_abi import decode, encode
 from web3 import Web3
 
 from pretix_eth.chains import SUPPORTED_CHAINS, TOKEN_CONTRACTS
 from pretix_eth.rpc import get_rpc_url
-from pretix_eth.x402.abi import ERC20_ABI
+from pretix_eth.x402.abi import (
+    BALANCE_OF_SELECTOR,
+    ERC20_ABI,
+    GET_ETH_BALANCE_SELECTOR,
+    MULTICALL3_ABI,
+    MULTICALL3_ADDRESS,
+)
 from pretix_eth.x402.zapper import fetch_balances_via_zapper
 
 log = logging.getLogger(__name__)
 
+# Wall-clock budget for one chain's balance read. Also used as the HTTP
+# timeout, so a straggler gives its pool thread back soon after the caller
+# has stopped waiting for it.
+RPC_CHAIN_DEADLINE_SECONDS = float(os.environ.get('WC_BALANCE_RPC_DEADLINE_SECONDS', '4'))
+# Shared by every request in the process: bounds concurrent RPC reads (a
+# checkout burst must not open chains × requests sockets at once).
+RPC_POOL_WORKERS = int(os.environ.get('WC_BALANCE_RPC_WORKERS', '16'))
+
+_rpc_pool = concurrent.futures.ThreadPoolExecutor(
+    max_workers=RPC_POOL_WORKERS, thread_name_prefix='pretix-eth-balances',
+)
+
+# How long Zapper gets to answer alone before the RPC path is started
+# alongside it. Zapper typically answers in ~200ms.
+ZAPPER_HEDGE_DELAY_SECONDS = float(os.environ.get('WC_BALANCE_HEDGE_DELAY_SECONDS', '0.75'))
+# Runs the two legs of a hedged fetch. Separate from `_rpc_pool`: the RPC leg
+# itself waits on `_rpc_pool`, so running it there could starve itself.
+_hedge_pool = concurrent.futures.ThreadPoolExecutor(
+    max_workers=RPC_POOL_WORKERS, thread_name_prefix='pretix-eth-balances-hedge',
+)
+
+BALANCE_CACHE_TTL_SECONDS = int(os.environ.get('WC_BALANCE_CACHE_TTL_SECONDS', '20'))
+_BALANCE_KEY = 'pretix_eth_balances:{wallet}:{generation}:{chains}'
+_GENERATION_KEY = 'pretix_eth_balances_gen:{wallet}'
+# Outlives any entry by far; if it does expire the counter restarts at 0,
+# whose entries are long gone by then.
+_GENERATION_TTL_SECONDS = 24 * 3600
+# How long a coalesced caller waits on the in-flight fetch before giving up
+# and fetching itself (Zapper timeout + RPC deadline, with slack).
+_FLIGHT_WAIT_SECONDS = 20
+
+
+class _Flight:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+_inflight = {}
+_inflight_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0, 'coalesced': 0, 'invalidations': 0}
+_stats_lock = threading.Lock()
+
+
+def _count(stat: str) -> None:
+    with _stats_lock:
+        _stats[stat] += 1
+
+
+def _cache():
+    from django.core.cache import cache
+    return cache
+
 
 def _get_w3(chain_id: int, alchemy_key: Optional[str]):
     url = get_rpc_url(chain_id, settings_key=alchemy_key)
-    return Web3(Web3.HTTPProvider(url, request_kwargs={'timeout': 10}))
+    return Web3(Web3.HTTPProvider(url, request_kwargs={'timeout': RPC_CHAIN_DEADLINE_SECONDS}))
 
 
 def fetch_balances_for_wallet(
     *, wallet: str, chain_ids: List[int], alchemy_key: Optional[str],
     zapper_api_key: Optional[str] = None,
 ) -> List[dict]:
-    """Fast path via Zapper, with RPC as a fallback on any failure."""
+    """Balances for `wallet` on `chain_ids`: cached, single-flight per
+    (wallet, chain set) within the process, else Zapper with RPC fallback.
+    Results with `missing` chains are returned but not cached."""
+    key, cached = _cached_balances(wallet, chain_ids)
+    if cached is not None:
+        _count('hits')
+        return cached
+
+    with _inflight_lock:
+        flight = _inflight.get(key)
+        leader = flight is None
+        if leader:
+            flight = _inflight[key] = _Flight()
+    if not leader:
+        if flight.done.wait(_FLIGHT_WAIT_SECONDS):
+            _count('coalesced')
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        leader, flight = True, _Flight()  # leader stuck: fetch on our own
+
+    _count('misses')
+    try:
+        result = _fetch_balances_uncached(
+            wallet=wallet, chain_ids=chain_ids, alchemy_key=alchemy_key,
+            zapper_api_key=zapper_api_key,
+        )
+        flight.result = result
+    except Exception as e:
+        flight.error = e
+        raise
+    finally:
+        with _inflight_lock:
+            if _inflight.get(key) is flight:
+                del _inflight[key]
+        flight.done.set()
+    _store_balances(key, result)
+    return result
+
+
+def iter_balances_for_wallet(
+    *, wallet: str, chain_ids: List[int], alchemy_key: Optional[str],
+    zapper_api_key: Optional[str] = None,
+) -> Iterator[List[dict]]:
+    """Progressive variant of `fetch_balances_for_wallet`: yields lists of
+    entries (same shape) as they become known instead of one list at the end.
+
+    A cache hit or a Zapper answer within the hedge delay is yielded in one
+    go. Otherwise each RPC chain is yielded the moment it resolves; chains
+    that fail or miss the deadline are held back until a still-running
+    Zapper call has had its chance to fill them, then yielded (from Zapper,
+    or as `missing` entries). Shares the cache with the buffered variant but
+    not its single-flight — a streaming caller wants its own chain order."""
+    key, cached = _cached_balances(wallet, chain_ids)
+    if cached is not None:
+        _count('hits')
+        yield cached
+        return
+    _count('misses')
+
+    zapper = None
     if zapper_api_key:
-        zapper_entries = fetch_balances_via_zapper(
-            wallet=wallet, chain_ids=chain_ids, api_key=zapper_api_key,
+        zapper = _hedge_pool.submit(
+            fetch_balances_via_zapper, wallet=wallet, chain_ids=chain_ids, api_key=zapper_api_key,
         )
+        try:
+            zapper_entries = zapper.result(timeout=ZAPPER_HEDGE_DELAY_SECONDS)
+        except concurrent.futures.TimeoutError:
+            pass
+        except Exception as e:
+            log.warning('[balances] Zapper raised (%s), streaming RPC for wallet=%s', e, wallet)
+            zapper = None
+        else:
+            if zapper_entries is not None:
+                _store_balances(key, zapper_entries)
+                yield zapper_entries
+                return
+            zapper = None
+
+    collected, missing = [], []
+    for cid, entries in _iter_rpc_chains(wallet=wallet, chain_ids=chain_ids, alchemy_key=alchemy_key):
+        if any(e.get('missing') for e in entries):
+            missing.append(cid)
+            continue
+        collected.extend(entries)
+        yield entries
+
+    if missing and zapper is not None:
+        try:
+            zapper_entries = zapper.result()
+        except Exception:
+            zapper_entries = None
+        if zapper_entries is not None:
+            filled = [e for e in zapper_entries if e['chain_id'] in missing]
+            collected.extend(filled)
+            missing = []
+            if filled:
+                yield filled
+    elif zapper is not None:
+        zapper.cancel()
+    for cid in missing:
+        entries = _missing_entries(cid)
+        collected.extend(entries)
+        yield entries
+    _store_balances(key, collected)
+
+
+def _cached_balances(wallet: str, chain_ids: List[int]):
+    """(cache key, cached entries or None) for `wallet` on `chain_ids`."""
+    wallet_key = wallet.lower()
+    chains = ','.join(str(c) for c in sorted(set(chain_ids)))
+    try:
+        generation = _cache().get(_GENERATION_KEY.format(wallet=wallet_key)) or 0
+    except Exception:
+        generation = 0
+    key = _BALANCE_KEY.format(wallet=wallet_key, generation=generation, chains=chains)
+    try:
+        return key, _cache().get(key)
+    except Exception:
+        return key, None
+
+
+def _store_balances(key: str, entries: List[dict]) -> None:
+    if any(e.get('missing') for e in entries):
+        return
+    try:
+        _cache().set(key, entries, BALANCE_CACHE_TTL_SECONDS)
+    except Exception:
+        pass
+
+
+def invalidate_wallet_balances(wallet: str) -> None:
+    """Drop every cached balance set for `wallet` (all chain sets) by moving
+    it to a new generation. Called when a payment from the wallet settles."""
+    if not wallet:
+        return
+    key = _GENERATION_KEY.format(wallet=wallet.lower())
+    try:
+        try:
+            _cache().incr(key)
+        except ValueError:
+            if not _cache().add(key, 1, _GENERATION_TTL_SECONDS):
+                _cache().incr(key)
+    except Exception as e:
+        log.warning('[balances] could not invalidate cached balances for %s: %s', wallet, e)
+        return
+    _count('invalidations')
+
+
+def get_balance_cache_stats() -> dict:
+    """Hit/miss/coalesce counters for this process since start."""
+    with _stats_lock:
+        stats = dict(_stats)
+    with _inflight_lock:
+        stats['inFlight'] = len(_inflight)
+    lookups = stats['hits'] + stats['misses'] + stats['coalesced']
+    stats['hitRate'] = round((stats['hits'] + stats['coalesced']) / lookups, 4) if lookups else None
+    stats['ttlSeconds'] = BALANCE_CACHE_TTL_SECONDS
+    return stats
+
+
+def _fetch_balances_uncached(
+    *, wallet: str, chain_ids: List[int], alchemy_key: Optional[str],
+    zapper_api_key: Optional[str] = None,
+) -> List[dict]:
+    """Zapper, hedged with RPC. Without a Zapper key: RPC only."""
+    def rpc():
+        return _fetch_balances_via_rpc(
+            wallet=wallet, chain_ids=chain_ids, alchemy_key=alchemy_key,
+        )
+
+    if not zapper_api_key:
+        return rpc()
+
+    zapper = _hedge_pool.submit(
+        fetch_balances_via_zapper, wallet=wallet, chain_ids=chain_ids, api_key=zapper_api_key,
+    )
+    try:
+        zapper_entries = zapper.result(timeout=ZAPPER_HEDGE_DELAY_SECONDS)
+    except concurrent.futures.TimeoutError:
+        pass
+    except Exception as e:
+        log.warning('[balances] Zapper raised (%s), falling back to RPC for wallet=%s', e, wallet)
+        return rpc()
+    else:
         if zapper_entries is not None:
             return zapper_entries
         log.warning('[balances] Zapper failed, falling back to RPC for wallet=%s', wallet)
-    return _fetch_balances_via_rpc(
-        wallet=wallet, chain_ids=chain_ids, alchemy_key=alchemy_key,
-    )
+        return rpc()
+
+    # Zapper is slow: race it against RPC. Zapper's answer is complete by
+    # construction (it backfills zeros); an RPC answer only wins outright if
+    # no chain came back missing — otherwise give Zapper the rest of its
+    # timeout and keep the RPC answer as the fallback.
+    log.info('[balances] Zapper slower than %.2fs, hedging with RPC for wallet=%s',
+             ZAPPER_HEDGE_DELAY_SECONDS, wallet)
+    rpc_leg = _hedge_pool.submit(rpc)
+    pending = {zapper, rpc_leg}
+    rpc_entries, rpc_error = None, None
+    while pending:
+        done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+        for future in done:
+            if future is zapper:
+                try:
+                    zapper_entries = future.result()
+                except Exception:
+                    zapper_entries = None
+                if zapper_entries is not None:
+                    rpc_leg.cancel()
+                    return zapper_entries
+                continue
+            try:
+                rpc_entries = future.result()
+            except Exception as e:
+                rpc_error = e
+                continue
+            if not any(e.get('missing') for e in rpc_entries):
+                zapper.cancel()
+                return rpc_entries
+    if rpc_entries is not None:
+        return rpc_entries
+    raise rpc_error
+
+
+def _chain_tokens(chain_id: int) -> List[tuple]:
+    return [(symbol, info) for (c_id, symbol), info in TOKEN_CONTRACTS.items() if c_id == chain_id]
+
+
+def _entries(chain_id: int, eth_bal: int, token_bals: List[tuple]) -> List[dict]:
+    entries = [{
+        'chain_id': chain_id, 'symbol': 'ETH',
+        'balance': str(eth_bal), 'decimals': 18, 'token_address': None,
+    }]
+    for (symbol, info), tok_bal in token_bals:
+        entries.append({
+            'chain_id': chain_id, 'symbol': symbol,
+            'balance': str(tok_bal), 'decimals': info['decimals'],
+            'token_address': info['address'],
+        })
+    return entries
+
+
+def _missing_entries(chain_id: int) -> List[dict]:
+    entries = [{
+        'chain_id': chain_id, 'symbol': 'ETH',
+        'balance': None, 'decimals': 18, 'token_address': None, 'missing': True,
+    }]
+    for symbol, info in _chain_tokens(chain_id):
+        entries.append({
+            'chain_id': chain_id, 'symbol': symbol,
+            'balance': None, 'decimals': info['decimals'],
+            'token_address': info['address'], 'missing': True,
+        })
+    return entries
+
+
+def _decode_uint(success: bool, data: bytes) -> Optional[int]:
+    if not success or len(data) < 32:
+        return None
+    return decode(['uint256'], data)[0]
+
+
+def _chain_balances_multicall(w3, chain_id: int, checksum: str) -> List[dict]:
+    """Native + token balances for one chain in a single `aggregate3` call.
+    A failing token call reads as 0 (same as the per-call path); a failing
+    native-balance call, or the batch itself failing, raises so the caller
+    can fall back to per-call reads."""
+    tokens = _chain_tokens(chain_id)
+    arg = encode(['address'], [checksum])
+    calls = [(MULTICALL3_ADDRESS, True, GET_ETH_BALANCE_SELECTOR + arg)]
+    calls += [
+        (Web3.to_checksum_address(info['address']), True, BALANCE_OF_SELECTOR + arg)
+        for _, info in tokens
+    ]
+    multicall = w3.eth.contract(address=MULTICALL3_ADDRESS, abi=MULTICALL3_ABI)
+    results = multicall.functions.aggregate3(calls).call()
+    if len(results) != len(calls):
+        raise ValueError(f'aggregate3 returned {len(results)} results for {len(calls)} calls')
+    eth_bal = _decode_uint(*results[0])
+    if eth_bal is None:
+        raise ValueError('getEthBalance failed inside aggregate3')
+    token_bals = [
+        (token, _decode_uint(*result) or 0)
+        for token, result in zip(tokens, results[1:])
+    ]
+    return _entries(chain_id, eth_bal, token_bals)
+
+
+def _chain_balances_per_call(w3, chain_id: int, checksum: str) -> List[dict]:
+    """One `get_balance` plus one `balanceOf` per token — the pre-Multicall3
+    path, kept for RPCs that reject the aggregate call."""
+    eth_bal = w3.eth.get_balance(checksum)
+    token_bals = []
+    for symbol, info in _chain_tokens(chain_id):
+        contract = w3.eth.contract(
+            address=Web3.to_checksum_address(info['address']),
+            abi=ERC20_ABI,
+        )
+        try:
+            tok_bal = contract.functions.balanceOf(checksum).call()
+        except Exception:
+            tok_bal = 0
+        token_bals.append(((symbol, info), tok_bal))
+    return _entries(chain_id, eth_bal, token_bals)
+
+
+def _chain_balances(chain_id: int, checksum: str, alchemy_key: Optional[str]) -> List[dict]:
+    w3 = _get_w3(chain_id, alchemy_key)
+    try:
+        return _chain_balances_multicall(w3, chain_id, checksum)
+    except Exception as e:
+        log.warning('[balances] aggregate3 failed on chain %s (%s), using per-call reads', chain_id, e)
+        return _chain_balances_per_call(w3, chain_id, checksum)
+
+
+def _iter_rpc_chains(
+    *, wallet: str, chain_ids: List[int], alchemy_key: Optional[str],
+) -> Iterator[Tuple[int, List[dict]]]:
+    """Yield (chain_id, entries) for each chain in completion order, one
+    Multicall3 round trip per chain, all running concurrently. A chain that
+    fails or misses the deadline yields `missing` entries instead."""
+    checksum = Web3.to_checksum_address(wallet)
+    chains = [cid for cid in chain_ids if cid in SUPPORTED_CHAINS]
+    futures = {
+        _rpc_pool.submit(_chain_balances, cid, checksum, alchemy_key): cid
+        for cid in chains
+    }
+    pending = set(chains)
+    try:
+        for future in concurrent.futures.as_completed(futures, timeout=RPC_CHAIN_DEADLINE_SECONDS):
+            cid = futures[future]
+            pending.discard(cid)
+            try:
+                entries = future.result()
+            except Exception as e:
+                log.warning('[balances] chain %s failed for wallet=%s: %s', cid, wallet, e)
+                entries = _missing_entries(cid)
+            yield cid, entries
+    except concurrent.futures.TimeoutError:
+        pass
+    for future, cid in futures.items():
+        if cid not in pending:
+            continue
+        future.cancel()
+        log.warning('[balances] chain %s missed the %.1fs deadline for wallet=%s',
+                    cid, RPC_CHAIN_DEADLINE_SECONDS, wallet)
+        yield cid, _missing_entries(cid)
 
 
 def _fetch_balances_via_rpc(
@@ -49,37 +475,10 @@ def _fetch_balances_via_rpc(
 ) -> List[dict]:
     """Return a list of balance entries, one per (chain, token) combo.
     Entry shape: {chain_id, symbol, balance, decimals, token_address}.
-    Silently skips chains that fail to fetch."""
+    Chains run concurrently (`_iter_rpc_chains`); a chain that fails or
+    misses the deadline contributes `missing` entries instead."""
+    by_chain = dict(_iter_rpc_chains(wallet=wallet, chain_ids=chain_ids, alchemy_key=alchemy_key))
     entries = []
-    checksum = Web3.to_checksum_address(wallet)
     for cid in chain_ids:
-        if cid not in SUPPORTED_CHAINS:
-            continue
-        try:
-            w3 = _get_w3(cid, alchemy_key)
-            # Native ETH
-            eth_bal = w3.eth.get_balance(checksum)
-            entries.append({
-                'chain_id': cid, 'symbol': 'ETH',
-                'balance': str(eth_bal), 'decimals': 18, 'token_address': None,
-            })
-            # Each configured token on this chain
-            for (c_id, symbol), info in TOKEN_CONTRACTS.items():
-                if c_id != cid:
-                    continue
-                contract = w3.eth.contract(
-                    address=Web3.to_checksum_address(info['address']),
-                    abi=ERC20_ABI,
-                )
-                try:
-                    tok_bal = contract.functions.balanceOf(checksum).call()
-                except Exception:
-                    tok_bal = 0
-                entries.append({
-                    'chain_id': cid, 'symbol': symbol,
-                    'balance': str(tok_bal), 'decimals': info['decimals'],
-                    'token_address': info['address'],
-                })
-        except Exception:
-            continue
+        entries.extend(by_chain.get(cid, ()))
     return entries
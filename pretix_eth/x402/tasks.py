@@ -8,8 +8,3 @@ def cleanup_expired_pending_task():
     deleted = ticketstore.cleanup_expired_pending()
     return {'deleted': deleted}
 
-
-@app.task
-def cleanup_verify_attempts_task():
-    deleted = ticketstore.cleanup_verify_attempts()
-    return {'deleted': deleted}
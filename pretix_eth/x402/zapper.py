@@ -9,11 +9,22 @@ caller can swap implementations without changes.
 
 Returns None on any failure (missing API key, HTTP error, schema mismatch,
 timeout) — caller is expected to fall back to the RPC path.
+
+Requests go through one pooled keep-alive `httpx.Client` per process, so a
+warm worker skips the TCP + TLS handshake. A circuit breaker stops calling
+Zapper after `BREAKER_FAILURE_THRESHOLD` consecutive failures (transport,
+HTTP or schema/GraphQL errors) and returns None straight away for
+`BREAKER_COOLDOWN_SECONDS`; then a single probe request decides whether to
+close it again. Counters are in `get_zapper_health()`.
 """
 import json
 import logging
+import os
+import threading
+import time
 from typing import List, Optional
-from urllib import request as urlrequest, error as urlerror
+
+import httpx
 
 from pretix_eth.chains import SUPPORTED_CHAINS, TOKEN_CONTRACTS
 
@@ -21,6 +32,113 @@ log = logging.getLogger(__name__)
 
 ZAPPER_GRAPHQL = 'https://public.zapper.xyz/graphql'
 
+BREAKER_FAILURE_THRESHOLD = int(os.environ.get('WC_ZAPPER_BREAKER_THRESHOLD', '3'))
+BREAKER_COOLDOWN_SECONDS = float(os.environ.get('WC_ZAPPER_BREAKER_COOLDOWN_SECONDS', '60'))
+
+_HEADERS = {
+    'Content-Type': 'application/json',
+    # Cloudflare in front of public.zapper.xyz blocks the default
+    # `Python-urllib/x.y` UA with HTTP 403 "error code: 1010" (banned
+    # browser signature). Send a generic UA so the request isn't
+    # treated as a bot. The actual UA string just needs to look real;
+    # Cloudflare doesn't validate it semantically.
+    'User-Agent': 'pretix-eth-plugin/1.0 (+https://pretix.eu)',
+    'Accept': 'application/json',
+}
+
+_client_instance = None
+_client_lock = threading.Lock()
+
+
+def _client() -> httpx.Client:
+    """The process-wide keep-alive client (thread-safe; created lazily)."""
+    global _client_instance
+    if _client_instance is None:
+        with _client_lock:
+            if _client_instance is None:
+                _client_instance = httpx.Client(
+                    headers=_HEADERS,
+                    limits=httpx.Limits(max_connections=32, max_keepalive_connections=8, keepalive_expiry=60),
+                )
+    return _client_instance
+
+
+class _CircuitBreaker:
+    """closed → (N consecutive failures) → open → (cooldown) → half-open,
+    where exactly one caller probes; its outcome closes or re-opens."""
+
+    def __init__(self, threshold: int = BREAKER_FAILURE_THRESHOLD, cooldown: float = BREAKER_COOLDOWN_SECONDS):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self.state = 'closed'
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.counts = {'requests': 0, 'successes': 0, 'failures': 0, 'skipped': 0, 'opened': 0}
+        self.failure_kinds = {}
+        self.last_error = None
+        self.last_latency_ms = None
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == 'open' and time.monotonic() - self.opened_at >= self.cooldown:
+                self.state = 'half-open'
+                self.counts['requests'] += 1
+                return True
+            if self.state == 'closed':
+                self.counts['requests'] += 1
+                return True
+            self.counts['skipped'] += 1
+            return False
+
+    def success(self, latency: float) -> None:
+        with self._lock:
+            if self.state != 'closed':
+                log.info('[zapper] circuit closed after successful probe')
+            self.state = 'closed'
+            self.consecutive_failures = 0
+            self.counts['successes'] += 1
+            self.last_latency_ms = round(latency * 1000, 1)
+
+    def failure(self, kind: str, error: str, latency: Optional[float] = None) -> None:
+        with self._lock:
+            self.consecutive_failures += 1
+            self.counts['failures'] += 1
+            self.failure_kinds[kind] = self.failure_kinds.get(kind, 0) + 1
+            self.last_error = f'{kind}: {error}'[:300]
+            if latency is not None:
+                self.last_latency_ms = round(latency * 1000, 1)
+            if self.state == 'half-open' or self.consecutive_failures >= self.threshold:
+                if self.state != 'open':
+                    log.warning('[zapper] circuit open for %.0fs after %d consecutive failure(s) (last: %s)',
+                                self.cooldown, self.consecutive_failures, self.last_error)
+                    self.counts['opened'] += 1
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            reopen_in = None
+            if self.state == 'open':
+                reopen_in = max(0.0, round(self.cooldown - (time.monotonic() - self.opened_at), 1))
+            return {
+                'state': self.state,
+                'consecutiveFailures': self.consecutive_failures,
+                'reopenInSeconds': reopen_in,
+                **self.counts,
+                'failureKinds': dict(self.failure_kinds),
+                'lastError': self.last_error,
+                'lastLatencyMs': self.last_latency_ms,
+            }
+
+
+_breaker = _CircuitBreaker()
+
+
+def get_zapper_health() -> dict:
+    """Breaker state and request counters for this process."""
+    return _breaker.as_dict()
+
 # Zapper's public.zapper.xyz/graphql shape (late 2025+). If the schema
 # changes again, the HTTP 400 body (logged on failure) will tell us what's
 # wrong; bump this query then.
@@ -84,56 +202,65 @@ def fetch_balances_via_zapper(
     if not networks:
         return None
 
+    if not _breaker.allow():
+        return None
+    # Every path past `allow()` must report to the breaker — a half-open
+    # probe that raised without doing so would leave it half-open, i.e.
+    # Zapper skipped for the life of the process.
+    try:
+        return _fetch_portfolio(wallet, chain_ids, networks, api_key, timeout_s)
+    except Exception as e:
+        log.exception('[zapper] unexpected error handling the response')
+        _breaker.failure('unexpected', str(e) or type(e).__name__)
+        return None
+
+
+def _fetch_portfolio(wallet, chain_ids, networks, api_key, timeout_s) -> Optional[List[dict]]:
     payload = json.dumps({
         'query': _QUERY,
         'variables': {'addresses': [wallet], 'networks': networks},
     }).encode('utf-8')
 
-    req = urlrequest.Request(
-        ZAPPER_GRAPHQL,
-        data=payload,
-        headers={
-            'Content-Type': 'application/json',
-            'x-zapper-api-key': api_key,
-            # Cloudflare in front of public.zapper.xyz blocks the default
-            # `Python-urllib/x.y` UA with HTTP 403 "error code: 1010" (banned
-            # browser signature). Send a generic UA so the request isn't
-            # treated as a bot. The actual UA string just needs to look real;
-            # Cloudflare doesn't validate it semantically.
-            'User-Agent': 'pretix-eth-plugin/1.0 (+https://pretix.eu)',
-            'Accept': 'application/json',
-        },
-        method='POST',
-    )
-
+    t0 = time.monotonic()
     try:
-        with urlrequest.urlopen(req, timeout=timeout_s) as resp:
-            raw = resp.read()
-    except urlerror.HTTPError as e:
-        # Zapper returns GraphQL errors as 400 with a useful body — surface it.
-        body = ''
-        try:
-            body = e.read().decode('utf-8', 'replace')[:500]
-        except Exception:
-            pass
-        log.warning('[zapper] HTTP %s body=%s', e.code, body)
-        return None
-    except (urlerror.URLError, TimeoutError, OSError) as e:
+        resp = _client().post(
+            ZAPPER_GRAPHQL, content=payload,
+            headers={'x-zapper-api-key': api_key}, timeout=timeout_s,
+        )
+    except httpx.HTTPError as e:
         log.warning('[zapper] request failed: %s', e)
+        _breaker.failure('transport', str(e) or type(e).__name__)
+        return None
+    latency = time.monotonic() - t0
+
+    if resp.status_code >= 400:
+        # Zapper returns GraphQL errors as 400 with a useful body — surface it.
+        body = resp.text[:500]
+        log.warning('[zapper] HTTP %s body=%s', resp.status_code, body)
+        _breaker.failure('http', f'HTTP {resp.status_code}', latency)
         return None
 
     try:
-        body = json.loads(raw)
+        body = json.loads(resp.content)
     except ValueError:
         log.warning('[zapper] non-JSON response')
+        _breaker.failure('schema', 'non-JSON response', latency)
         return None
 
-    if body.get('errors'):
-        log.warning('[zapper] GraphQL errors: %s', body['errors'])
+    if not isinstance(body, dict) or body.get('errors'):
+        log.warning('[zapper] GraphQL errors: %s', body.get('errors') if isinstance(body, dict) else body)
+        _breaker.failure('graphql', 'GraphQL errors', latency)
         return None
 
-    balances = (body.get('data') or {}).get('portfolio') or {}
-    token_balances = balances.get('tokenBalances') or []
+    # A missing portfolio is a schema change, not an empty wallet — without
+    # this check the zero backfill below would report every balance as 0.
+    portfolio = (body.get('data') or {}).get('portfolio')
+    token_balances = portfolio.get('tokenBalances') if isinstance(portfolio, dict) else None
+    if not isinstance(token_balances, list):
+        log.warning('[zapper] unexpected response shape: %s', str(body)[:300])
+        _breaker.failure('schema', 'missing portfolio.tokenBalances', latency)
+        return None
+    _breaker.success(latency)
 
     token_lut = _build_token_lookup(set(chain_ids))
 
@@ -0,0 +1,167 @@
+"""Pricing benchmarks against the offline oracle stand-in.
+
+Drives `fetch_eth_price_usd` / `fetch_pol_price_usd` through four scenarios
+and reports p50/p99 latency plus outbound oracle requests per call:
+
+  cold     — empty cache before every call (every call fans out)
+  warm     — cache primed once, then served from it
+  herd     — empty cache, N threads ask at once (the checkout-burst case;
+             each thread runs its own event loop like the views do)
+  slow     — cold cache with one oracle slow (1.5s) and one past the 2s
+             timeout; measures what a sick exchange costs the quote
+
+Run from the repo root (no network access needed):
+
+    python tests/bench/bench_pricing.py [--iterations 50] [--herd 32] [--json]
+
+Uses a local-memory Django cache unless DJANGO_SETTINGS_MODULE is set.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from django.conf import settings  # noqa: E402
+
+if not settings.configured and 'DJANGO_SETTINGS_MODULE' not in os.environ:
+    settings.configure(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+
+from django.core.cache import cache  # noqa: E402
+from oracle_standin import OracleStandin  # noqa: E402
+
+from pretix_eth import pricing  # noqa: E402
+
+FETCHERS = {
+    'ETH': pricing.fetch_eth_price_usd,
+    'POL': pricing.fetch_pol_price_usd,
+}
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[idx]
+
+
+def _reset_state():
+    cache.clear()
+    pricing._oracle_health.clear()
+
+
+def _timed_call(asset):
+    t0 = time.perf_counter()
+    result = asyncio.run(FETCHERS[asset]())
+    return time.perf_counter() - t0, result
+
+
+def _cold(standin, asset, iterations, **_):
+    latencies, failures = [], 0
+    for _ in range(iterations):
+        cache.clear()
+        elapsed, result = _timed_call(asset)
+        latencies.append(elapsed)
+        failures += result is None
+    return latencies, failures, iterations
+
+
+def _warm(standin, asset, iterations, **_):
+    _timed_call(asset)
+    standin.reset_counts()
+    latencies, failures = [], 0
+    for _ in range(iterations):
+        elapsed, result = _timed_call(asset)
+        latencies.append(elapsed)
+        failures += result is None
+    return latencies, failures, iterations
+
+
+def _herd(standin, asset, iterations, herd, **_):
+    latencies, failures = [], 0
+    lock = threading.Lock()
+    rounds = max(1, iterations // 10)
+    for _ in range(rounds):
+        cache.clear()
+        barrier = threading.Barrier(herd)
+
+        def _caller():
+            nonlocal failures
+            barrier.wait()
+            elapsed, result = _timed_call(asset)
+            with lock:
+                latencies.append(elapsed)
+                failures += result is None
+
+        threads = [threading.Thread(target=_caller) for _ in range(herd)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    return latencies, failures, rounds * herd
+
+
+def _slow(standin, asset, iterations, **_):
+    standin.script('coinbase', latency=1.5)
+    standin.script('binance', latency=2.5)
+    return _cold(standin, asset, max(1, iterations // 5))
+
+
+SCENARIOS = {
+    'cold': _cold,
+    'warm': _warm,
+    'herd': _herd,
+    'slow': _slow,
+}
+
+
+def run(iterations=50, herd=32, scenarios=tuple(SCENARIOS), assets=tuple(FETCHERS)):
+    rows = []
+    with OracleStandin() as standin, standin.patched_registry():
+        for name in scenarios:
+            for asset in assets:
+                _reset_state()
+                standin.reset()
+                latencies, failures, calls = SCENARIOS[name](standin, asset, iterations, herd=herd)
+                rows.append({
+                    'scenario': name,
+                    'asset': asset,
+                    'calls': calls,
+                    'failures': failures,
+                    'p50_ms': round(_percentile(latencies, 50) * 1000, 2),
+                    'p99_ms': round(_percentile(latencies, 99) * 1000, 2),
+                    'requests': standin.request_count(),
+                    'requests_per_call': round(standin.request_count() / calls, 2),
+                })
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--herd', type=int, default=32)
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS))
+    parser.add_argument('--asset', action='append', choices=sorted(FETCHERS))
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args(argv)
+    rows = run(
+        iterations=args.iterations, herd=args.herd,
+        scenarios=args.scenario or tuple(SCENARIOS), assets=args.asset or tuple(FETCHERS),
+    )
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return
+    cols = ('scenario', 'asset', 'calls', 'failures', 'p50_ms', 'p99_ms', 'requests', 'requests_per_call')
+    widths = [max(len(c), *(len(str(row[c])) for row in rows)) for c in cols]
+    print('  '.join(c.ljust(w) for c, w in zip(cols, widths)))
+    for row in rows:
+        print('  '.join(str(row[c]).ljust(w) for c, w in zip(cols, widths)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,215 @@
+"""Offline stand-in for the price oracles in `pretix_eth.pricing.PRICE_ORACLES`.
+
+Serves the Coinbase, Binance.US, Kraken, Bitstamp and CoinGecko ticker
+response shapes from a local threaded HTTP server, so quote latency and
+quorum behaviour can be measured (and tested) without touching the live
+exchanges. Every exchange is scriptable: base prices per asset, added
+latency, an HTTP error status, or a divergence from the base price. Requests
+are counted per exchange.
+
+    with OracleStandin(prices={'ETH': 2000.0}) as standin, standin.patched_registry():
+        standin.script('binance', status=451)
+        standin.script('kraken', latency=0.4, divergence_pct=7.0)
+        asyncio.run(pricing.fetch_eth_price_usd())
+        standin.request_count()
+
+`patched_registry()` points the pricing registry at the stand-in by rewriting
+each oracle's scheme + host to `http://127.0.0.1:<port>/<oracle name>`;
+paths and query strings are kept, so the URL templates and parsers under
+test are the real ones.
+"""
+import json
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass, replace
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import parse_qs, urlsplit
+
+EXCHANGES = ('coinbase', 'binance', 'kraken', 'bitstamp', 'coingecko')
+
+# CoinGecko ids → our asset symbols.
+_COINGECKO_IDS = {'ethereum': 'ETH', 'polygon-ecosystem-token': 'POL'}
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # Herd scenarios open dozens of connections at once; the default backlog
+    # of 5 turns that into SYN retransmits (1s stalls) that aren't ours.
+    request_queue_size = 256
+
+    def handle_error(self, request, client_address):
+        # Clients giving up on a scripted-slow response (timeout) close the
+        # socket under us — expected, not worth a traceback.
+        pass
+
+
+@dataclass
+class ExchangeScript:
+    latency: float = 0.0
+    status: int = 200
+    divergence_pct: float = 0.0
+
+
+class OracleStandin:
+    def __init__(self, prices: Optional[dict] = None):
+        self.prices = dict(prices or {'ETH': 2000.0, 'POL': 0.80})
+        self.scripts = {name: ExchangeScript() for name in EXCHANGES}
+        self._counts = Counter()
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    # -- lifecycle ---------------------------------------------------------
+
+    def start(self) -> str:
+        standin = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                standin._handle(self)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = _Server(('127.0.0.1', 0), _Handler)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self.base_url
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return 'http://%s:%d' % (host, port)
+
+    # -- scripting ---------------------------------------------------------
+
+    def script(self, exchange: str, *, latency: Optional[float] = None,
+               status: Optional[int] = None, divergence_pct: Optional[float] = None) -> None:
+        s = self.scripts[exchange]
+        if latency is not None:
+            s.latency = latency
+        if status is not None:
+            s.status = status
+        if divergence_pct is not None:
+            s.divergence_pct = divergence_pct
+
+    def reset(self) -> None:
+        self.scripts = {name: ExchangeScript() for name in EXCHANGES}
+        self.reset_counts()
+
+    def reset_counts(self) -> None:
+        with self._lock:
+            self._counts.clear()
+
+    def request_count(self, exchange: Optional[str] = None) -> int:
+        with self._lock:
+            if exchange is None:
+                return sum(self._counts.values())
+            return self._counts[exchange]
+
+    @contextmanager
+    def patched_registry(self):
+        from pretix_eth import pricing
+        original = pricing.PRICE_ORACLES
+        patched = []
+        for oracle in original:
+            parts = urlsplit(oracle.url)
+            url = '%s/%s%s' % (self.base_url, oracle.name, parts.path)
+            if parts.query:
+                url += '?' + parts.query
+            patched.append(replace(oracle, url=url))
+        pricing.PRICE_ORACLES = tuple(patched)
+        try:
+            yield
+        finally:
+            pricing.PRICE_ORACLES = original
+
+    # -- serving -----------------------------------------------------------
+
+    def _price(self, exchange: str, asset: str) -> Optional[float]:
+        base = self.prices.get(asset)
+        if base is None:
+            return None
+        return base * (1 + self.scripts[exchange].divergence_pct / 100)
+
+    def _handle(self, req: BaseHTTPRequestHandler) -> None:
+        parts = urlsplit(req.path)
+        exchange, _, path = parts.path.lstrip('/').partition('/')
+        query = {k: v[0] for k, v in parse_qs(parts.query).items()}
+        with self._lock:
+            self._counts[exchange] += 1
+        script = self.scripts.get(exchange)
+        if script is None:
+            return self._send(req, 404, {'error': 'unknown exchange'})
+        if script.latency:
+            time.sleep(script.latency)
+        if script.status != 200:
+            return self._send(req, script.status, {'error': 'scripted failure'})
+        body = getattr(self, '_body_' + exchange)('/' + path, query)
+        if body is None:
+            return self._send(req, 400, {'error': 'unknown symbol'})
+        self._send(req, 200, body)
+
+    @staticmethod
+    def _send(req: BaseHTTPRequestHandler, status: int, body) -> None:
+        data = json.dumps(body).encode()
+        req.send_response(status)
+        req.send_header('Content-Type', 'application/json')
+        req.send_header('Content-Length', str(len(data)))
+        req.end_headers()
+        try:
+            req.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def _body_coinbase(self, path: str, query: dict):
+        # /v2/prices/ETH-USD/spot
+        pair = path.split('/')[3]
+        asset, _, currency = pair.partition('-')
+        p = self._price('coinbase', asset)
+        if p is None:
+            return None
+        return {'data': {'base': asset, 'currency': currency, 'amount': '%.8f' % p}}
+
+    def _body_binance(self, path: str, query: dict):
+        # /api/v3/ticker/price?symbol=ETHUSDT
+        sym = query.get('symbol', '')
+        p = self._price('binance', sym[:-len('USDT')])
+        return None if p is None else {'symbol': sym, 'price': '%.8f' % p}
+
+    def _body_kraken(self, path: str, query: dict):
+        # /0/public/Ticker?pair=ETHUSD → result keyed by Kraken's own pair name
+        pair = query.get('pair', '')
+        asset = pair[:-len('USD')]
+        p = self._price('kraken', asset)
+        if p is None:
+            return {'error': ['EQuery:Unknown asset pair'], 'result': {}}
+        return {'error': [], 'result': {'X%sZUSD' % asset: {'c': ['%.5f' % p, '0.01000000']}}}
+
+    def _body_bitstamp(self, path: str, query: dict):
+        # /api/v2/ticker/ethusd/
+        pair = path.rstrip('/').split('/')[-1]
+        p = self._price('bitstamp', pair[:-len('usd')].upper())
+        return None if p is None else {'last': '%.2f' % p}
+
+    def _body_coingecko(self, path: str, query: dict):
+        # /api/v3/simple/price?ids=polygon-ecosystem-token&vs_currencies=usd
+        cg_id = query.get('ids', '')
+        p = self._price('coingecko', _COINGECKO_IDS.get(cg_id, ''))
+        return {} if p is None else {cg_id: {'usd': p}}
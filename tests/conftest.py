@@ -203,4 +203,36 @@ def _sanctions_offline(monkeypatch):
         raise OSError('sanctions network access disabled in tests')
 
     monkeypatch.setattr(sanctions, '_fetch_ofac_union', _no_network)
-    monkeypatch.setattr(sanctions, '_memo', {'ofac': None, 'ofac_at': 0.0, 'scam': frozenset(), 'scam_at': float('inf')})
+    monkeypatch.setattr(sanctions, '_snapshot_dir', lambda: None)
+    monkeypatch.setattr(sanctions, '_memo', {'ofac': None, 'ofac_at': 0.0, 'scam': sanctions.AddressIndex(), 'scam_at': float('inf')})
+
+
+@pytest.fixture(autouse=True)
+def _wc_config_fresh(monkeypatch):
+    """Event primary keys repeat across tests (sequences are reset), so one
+    test's in-process WalletConnect config snapshot must not be served to
+    the next test's event."""
+    from pretix_eth import wcconfig
+
+    monkeypatch.setattr(wcconfig, '_local', {})
+
+
+@pytest.fixture
+def locmem_cache(settings, monkeypatch):
+    """A real (process-local) cache for tests that keep something in it —
+    the rate limiters, the price history, the WalletConnect challenges. The
+    test settings use DummyCache, which never remembers anything (and
+    `REAL_CACHE_USED` off, which the challenges check)."""
+    from django.core.cache import cache
+    from pretix_eth import ratelimit
+
+    settings.CACHES = {'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'pretix-eth-tests',
+    }}
+    settings.REAL_CACHE_USED = True
+    cache.clear()
+    monkeypatch.setattr(ratelimit, '_memo', {})
+    monkeypatch.setattr(ratelimit, '_local', {})
+    yield cache
+    cache.clear()
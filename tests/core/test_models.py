@@ -23,3 +23,32 @@ def test_can_create_and_read():
         payer='0x' + 'b' * 40, chain_id=8453, state='claiming',
     )
     assert WCPaymentAttempt.objects.filter(tx_hash='0x' + 'c' * 64).exists()
+
+
+@pytest.mark.django_db
+def test_wcquote_backfill_from_payment_info(get_order_and_payment):
+    from importlib import import_module
+    from django.apps import apps
+    from django_scopes import scopes_disabled
+    from pretix_eth.models import WCQuote
+
+    quote = {
+        'quote_id': 'q_current', 'chain_id': 8453, 'symbol': 'USDC', 'amount_raw': '5',
+        'intended_payer': '0x' + '1' * 40, 'created_at': 1700000100, 'expires_at': 1700000700,
+        'signature': '0xsig',
+    }
+    older = {
+        'quote_id': 'q_older', 'chain_id': 10, 'symbol': 'ETH', 'amount_raw': '7',
+        'intended_payer': '0x' + '2' * 40, 'created_at': 1700000000, 'expires_at': 1700000600,
+    }
+    slim = {k: v for k, v in quote.items() if k != 'signature'}
+    _, payment = get_order_and_payment(info_data={'quote': quote, 'quotes': [older, slim]})
+    get_order_and_payment(payment_kwargs={'provider': 'banktransfer'}, info_data={'quote': dict(quote, quote_id='q_bank')})
+
+    with scopes_disabled():
+        import_module('pretix_eth.migrations.0018_backfill_wcquotes').backfill(apps, None)
+    rows = {r.quote_id: r for r in WCQuote.objects.all()}
+    assert set(rows) == {'q_current', 'q_older'}
+    assert rows['q_current'].data['signature'] == '0xsig'  # the full current quote wins over its slim copy
+    assert rows['q_older'].payment_id == payment.pk and rows['q_older'].chain_id == 10
+    assert rows['q_current'].expires_at.timestamp() == 1700000700
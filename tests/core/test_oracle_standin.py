@@ -0,0 +1,38 @@
+"""The offline oracle stand-in (tests/bench) must keep speaking the exact
+response shapes the pricing registry parses — otherwise the benchmarks
+measure a fiction. Drives the real URL templates + parsers through it."""
+import pytest
+from django.core.cache import cache
+
+from bench.oracle_standin import OracleStandin
+from pretix_eth import pricing
+
+
+@pytest.fixture
+def standin():
+    cache.delete(pricing.ETH_PRICE_CACHE_KEY)
+    cache.delete(pricing.POL_PRICE_CACHE_KEY)
+    pricing._oracle_health.clear()
+    with OracleStandin(prices={'ETH': 2000.0, 'POL': 0.80}) as s, s.patched_registry():
+        yield s
+    pricing._oracle_health.clear()
+
+
+async def test_every_oracle_parses_standin_responses(standin):
+    results = await pricing.refresh_prices(['ETH', 'POL'])
+    assert results['ETH'].price == pytest.approx(2000.0)
+    assert sorted(results['ETH'].source.split('+')) == ['binance', 'bitstamp', 'coinbase', 'kraken']
+    assert results['POL'].price == pytest.approx(0.80)
+    assert sorted(results['POL'].source.split('+')) == ['binance', 'coinbase', 'coingecko']
+    # one request per (oracle, asset): coinbase ×2, binance ×2, kraken,
+    # bitstamp, coingecko
+    assert standin.request_count() == 7
+    assert standin.request_count('binance') == 2
+
+
+async def test_scripted_errors_and_divergence(standin):
+    standin.script('binance', status=451)
+    standin.script('kraken', divergence_pct=8.0)
+    result = await pricing.fetch_eth_price_usd()
+    assert sorted(result.source.split('+')) == ['bitstamp', 'coinbase']
+    assert result.price == pytest.approx(2000.0)
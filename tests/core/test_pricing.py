@@ -1,7 +1,9 @@
+import time
 from unittest import mock
 import pytest
 import httpx
 from django.core.cache import cache
+from pretix_eth import pricing
 from pretix_eth.pricing import fetch_eth_price_usd
 
 
@@ -11,6 +13,7 @@ def _clear_price_cache():
     tests so each one exercises the full fetch path with its own mock."""
     cache.delete('pretix_eth:price:eth')
     cache.delete('pretix_eth:price:pol')
+    pricing._oracle_health.clear()
     yield
     cache.delete('pretix_eth:price:eth')
     cache.delete('pretix_eth:price:pol')
@@ -34,12 +37,16 @@ def _bitstamp_ok(price: str):
     return _FakeResponse({'last': price})
 
 
+def _binance_ok(price: str, symbol: str = 'ETHUSDT'):
+    return _FakeResponse({'symbol': symbol, 'price': price})
+
+
 async def test_all_oracles_agree_returns_average():
     async def fake_get(self, url, **kw):
         if 'coinbase' in url:
             return _FakeResponse({'data': {'amount': '2000.00'}})
         if 'binance' in url:
-            return _FakeResponse({'price': '2010.00'})
+            return _binance_ok('2010.00')
         if 'kraken' in url:
             return _kraken_ok('2005.00')
         return _bitstamp_ok('2003.00')  # bitstamp
@@ -57,7 +64,7 @@ async def test_divergence_over_5pct_returns_none():
         if 'coinbase' in url:
             return _FakeResponse({'data': {'amount': '2000.00'}})
         if 'binance' in url:
-            return _FakeResponse({'price': '2200.00'})  # ~10% diff
+            return _binance_ok('2200.00')  # ~10% diff
         if 'kraken' in url:
             return _kraken_ok('2400.00')  # also wide
         return _bitstamp_ok('2600.00')  # also wide
@@ -134,7 +141,7 @@ async def test_successful_price_is_cached_and_failures_are_not():
         if 'coinbase' in url:
             return _FakeResponse({'data': {'amount': '2000.00'}})
         if 'binance' in url:
-            return _FakeResponse({'price': '2010.00'})
+            return _binance_ok('2010.00')
         if 'kraken' in url:
             return _kraken_ok('2005.00')
         return _bitstamp_ok('2003.00')
@@ -175,7 +182,7 @@ async def test_outlier_dropped_when_others_agree():
         if 'coinbase' in url:
             return _FakeResponse({'data': {'amount': '2000.00'}})
         if 'binance' in url:
-            return _FakeResponse({'price': '2010.00'})
+            return _binance_ok('2010.00')
         if 'kraken' in url:
             return _kraken_ok('2005.00')
         return _bitstamp_ok('1500.00')  # outlier
@@ -260,7 +267,7 @@ async def test_fetch_pol_price_three_oracles():
         if 'coinbase' in url:
             return _FakeResponse({'data': {'amount': '0.80'}})
         if 'binance' in url:
-            return _FakeResponse({'price': '0.81'})
+            return _binance_ok('0.81', 'POLUSDT')
         return _FakeResponse({'polygon-ecosystem-token': {'usd': 0.805}})
     with mock.patch('httpx.AsyncClient.get', fake_get):
         from pretix_eth.pricing import fetch_pol_price_usd
@@ -284,3 +291,172 @@ async def test_fetch_pol_price_binance_geo_blocked():
         result = await fetch_pol_price_usd()
     assert result is not None
     assert result.price == pytest.approx(0.805)
+
+
+def _seed_history(asset, prices, *, start=1_000_000.0, step=30.0):
+    for i, p in enumerate(prices):
+        pricing._record_price(asset, pricing.EthPriceResult(price=p, source='test'), now=start + i * step)
+    return start + (len(prices) - 1) * step
+
+
+def test_adaptive_ttl_falls_back_without_history(locmem_cache):
+    assert pricing._adaptive_ttl('ETH') == pricing.PRICE_CACHE_TTL_SECONDS
+    now = _seed_history('ETH', [2000.0, 2000.0])
+    assert pricing._adaptive_ttl('ETH', now=now) == pricing.PRICE_CACHE_TTL_SECONDS
+
+
+def test_adaptive_ttl_stretches_when_flat_and_shrinks_when_moving(locmem_cache):
+    now = _seed_history('ETH', [2000.0, 2000.0, 2000.2, 2000.0, 2000.1])
+    assert pricing._adaptive_ttl('ETH', now=now) == pricing.PRICE_CACHE_TTL_MAX_SECONDS
+
+    # ~1% per 30s sample — a fast market. Clamped at the floor.
+    now = _seed_history('POL', [0.80, 0.808, 0.80, 0.792, 0.80])
+    assert pricing._adaptive_ttl('POL', now=now) == pricing.PRICE_CACHE_TTL_MIN_SECONDS
+
+
+def test_adaptive_ttl_ignores_samples_outside_window(locmem_cache):
+    now = _seed_history('ETH', [1500.0, 2500.0, 1500.0, 2500.0], step=3600.0)
+    assert pricing._adaptive_ttl('ETH', now=now) == pricing.PRICE_CACHE_TTL_SECONDS
+
+
+async def test_quorum_result_recorded_and_cached_with_adaptive_ttl():
+    store = {}
+
+    class FakeCache:
+        def get(self, k):
+            return store.get(k, (None,))[0]
+
+        def set(self, k, v, ttl):
+            store[k] = (v, ttl)
+
+    async def fake_get(self, url, **kw):
+        if 'coinbase' in url:
+            return _FakeResponse({'data': {'amount': '2000.00'}})
+        if 'binance' in url:
+            return _binance_ok('2000.00')
+        if 'kraken' in url:
+            return _kraken_ok('2000.00')
+        return _bitstamp_ok('2000.00')
+
+    with mock.patch('pretix_eth.pricing.cache', FakeCache()), \
+            mock.patch('httpx.AsyncClient.get', fake_get):
+        _seed_history('ETH', [2000.0, 2000.0, 2000.0], start=time.time() - 120)
+        result = await fetch_eth_price_usd()
+        history = pricing.get_price_history()['ETH']
+    assert result is not None
+    assert store['pretix_eth:price:eth'][1] == pricing.PRICE_CACHE_TTL_MAX_SECONDS
+    # The samples live in the shared cache, not in this process.
+    assert len(store[pricing.PRICE_HISTORY_CACHE_KEY.format(asset='ETH')][0]) == 4
+    assert len(history['samples']) == 4
+    assert history['samples'][-1]['source'] == result.source
+
+
+def _eth_fake_get(calls, *, binance_down=True):
+    async def fake_get(self, url, **kw):
+        calls.append(url)
+        if 'coinbase' in url:
+            return _FakeResponse({'data': {'amount': '2000.00'}})
+        if 'binance' in url:
+            if binance_down:
+                raise httpx.HTTPStatusError(
+                    'binance geo-block', request=mock.MagicMock(), response=_FakeResponse({}, 451),
+                )
+            return _binance_ok('2001.00')
+        if 'kraken' in url:
+            return _kraken_ok('2002.00')
+        return _bitstamp_ok('2003.00')
+    return fake_get
+
+
+async def test_chronically_failing_oracle_is_demoted_then_only_probed():
+    calls = []
+    with mock.patch('httpx.AsyncClient.get', _eth_fake_get(calls)):
+        for _ in range(pricing.ORACLE_DEMOTE_MIN_SAMPLES):
+            assert await fetch_eth_price_usd() is not None
+        health = pricing.get_oracle_health()['ETH']
+        assert health['binance']['demoted'] is True
+        assert health['coinbase']['demoted'] is False
+        assert health['coinbase']['successRate'] == 1.0
+
+        calls.clear()
+        assert await fetch_eth_price_usd() is not None
+    assert not any('binance' in u for u in calls)
+    assert len(calls) == 3
+
+
+async def test_demoted_oracle_promoted_after_good_probes():
+    calls = []
+    with mock.patch('httpx.AsyncClient.get', _eth_fake_get(calls)):
+        for _ in range(pricing.ORACLE_DEMOTE_MIN_SAMPLES):
+            await fetch_eth_price_usd()
+    assert pricing._oracle_health[('ETH', 'binance')].demoted_at is not None
+
+    with mock.patch('httpx.AsyncClient.get', _eth_fake_get(calls, binance_down=False)):
+        for _ in range(pricing.ORACLE_PROMOTE_AFTER_PROBES):
+            pricing._oracle_health[('ETH', 'binance')].last_probe_at = 0.0  # probe due
+            result = await fetch_eth_price_usd()
+            assert 'binance' in result.source
+    assert pricing.get_oracle_health()['ETH']['binance']['demoted'] is False
+
+
+async def test_deviating_oracle_counts_against_health():
+    async def fake_get(self, url, **kw):
+        if 'coinbase' in url:
+            return _FakeResponse({'data': {'amount': '2000.00'}})
+        if 'binance' in url:
+            return _binance_ok('2010.00')
+        if 'kraken' in url:
+            return _kraken_ok('2005.00')
+        return _bitstamp_ok('1500.00')  # persistently off
+    with mock.patch('httpx.AsyncClient.get', fake_get):
+        for _ in range(pricing.ORACLE_DEMOTE_MIN_SAMPLES):
+            await fetch_eth_price_usd()
+    bitstamp = pricing.get_oracle_health()['ETH']['bitstamp']
+    assert bitstamp['demoted'] is True
+    assert bitstamp['meanDeviationPct'] > pricing.MAX_DIVERGENCE_PCT
+
+
+async def test_demotion_never_starves_the_quorum():
+    """With only two oracles left healthy, demoting one of them would make
+    the quorum impossible — every oracle is queried instead."""
+    for name in ('binance', 'kraken', 'bitstamp'):
+        pricing._health('ETH', name).demoted_at = time.time()
+        pricing._health('ETH', name).last_probe_at = time.time()
+    calls = []
+    with mock.patch('httpx.AsyncClient.get', _eth_fake_get(calls)):
+        result = await fetch_eth_price_usd()
+    assert result is not None
+    assert len(calls) == 4
+
+
+async def test_eth_and_pol_refresh_one_request_per_asset():
+    """One refresh for both assets: every oracle is asked per asset, so one
+    symbol an exchange rejects only fails that asset there."""
+    calls = []
+
+    async def fake_get(self, url, **kw):
+        calls.append(url)
+        if 'coinbase' in url:
+            return _FakeResponse({'data': {'amount': '0.80' if 'POL-USD' in url else '2000.00'}})
+        if 'binance' in url:
+            if 'POLUSDT' in url:
+                raise httpx.HTTPStatusError(
+                    'invalid symbol', request=mock.MagicMock(), response=_FakeResponse({}, 400),
+                )
+            return _binance_ok('2010.00')
+        if 'kraken' in url:
+            return _kraken_ok('2005.00')
+        if 'bitstamp' in url:
+            return _bitstamp_ok('2003.00')
+        return _FakeResponse({'polygon-ecosystem-token': {'usd': 0.805}})
+
+    with mock.patch('httpx.AsyncClient.get', fake_get):
+        results = await pricing.fetch_prices_usd(['ETH', 'POL'])
+    assert results['ETH'].price == pytest.approx((2000 + 2010 + 2005 + 2003) / 4)
+    assert 'binance' in results['ETH'].source
+    assert results['POL'].price == pytest.approx((0.80 + 0.805) / 2)
+    assert 'binance' not in results['POL'].source
+    hosts = [u.split('/')[2] for u in calls]
+    assert hosts.count('api.binance.us') == 2
+    assert hosts.count('api.coinbase.com') == 2
+    assert len(calls) == 7
@@ -0,0 +1,179 @@
+import threading
+
+import pytest
+from django.core.cache.backends.locmem import LocMemCache
+
+from pretix_eth import ratelimit
+
+
+@pytest.fixture
+def limiter_cache(monkeypatch):
+    cache = LocMemCache('test-ratelimit', {})
+    cache.clear()
+    monkeypatch.setattr(ratelimit, '_cache', lambda: cache)
+    monkeypatch.setattr(ratelimit, '_memo', {})
+    monkeypatch.setattr(ratelimit, '_local', {})
+    return cache
+
+
+def _at(monkeypatch, t):
+    monkeypatch.setattr(ratelimit.time, 'time', lambda: t)
+
+
+def test_limit_admits_up_to_limit_then_rejects(limiter_cache, monkeypatch):
+    _at(monkeypatch, 6000.0)
+    decisions = [ratelimit.hit('t', 'k', limit=3) for _ in range(4)]
+    assert [bool(d) for d in decisions] == [True, True, True, False]
+    assert [d.remaining for d in decisions[:3]] == [2, 1, 0]
+    # Window full: roll over (60s), then until 3 × (1 - t/60) + 1 <= 3 (t = 20s).
+    assert decisions[3].retry_after == 80
+    # Separate keys and scopes don't share budget.
+    assert ratelimit.hit('t', 'other', limit=3)
+    assert ratelimit.hit('u', 'k', limit=3)
+
+
+def test_rejected_requests_do_not_consume_budget(limiter_cache, monkeypatch):
+    _at(monkeypatch, 6000.0)
+    for _ in range(2):
+        assert ratelimit.hit('t', 'k', limit=2)
+    for _ in range(5):
+        assert not ratelimit.hit('t', 'k', limit=2)
+    # Next window at 30s: previous weighted 2 × 0.5 = 1, so one slot is free.
+    _at(monkeypatch, 6090.0)
+    assert ratelimit.hit('t', 'k', limit=2)
+    d = ratelimit.hit('t', 'k', limit=2)
+    assert not d
+    # Admitting one more needs 2 × (1 - t/60) + 1 + 1 <= 2 → t = 60: 30s from now.
+    assert d.retry_after == 30
+
+
+def test_sliding_window_smooths_boundary_burst(limiter_cache, monkeypatch):
+    _at(monkeypatch, 6059.0)
+    for _ in range(10):
+        assert ratelimit.hit('t', 'k', limit=10)
+    # A fixed window would hand out another 10 a second later.
+    _at(monkeypatch, 6061.0)
+    assert sum(bool(ratelimit.hit('t', 'k', limit=10)) for _ in range(10)) == 0
+    _at(monkeypatch, 6090.0)
+    assert sum(bool(ratelimit.hit('t', 'k', limit=10)) for _ in range(10)) == 5
+
+
+def test_previous_window_read_once_per_process(limiter_cache, monkeypatch):
+    _at(monkeypatch, 6000.0)
+    ratelimit.hit('t', 'k', limit=100)
+    _at(monkeypatch, 6070.0)
+    reads = []
+    get = limiter_cache.get
+    monkeypatch.setattr(limiter_cache, 'get', lambda k, default=None, **kw: reads.append(k) or get(k, default))
+    for _ in range(5):
+        ratelimit.hit('t', 'k', limit=100)
+    assert len(reads) == 1
+
+
+def test_concurrent_hits_never_overshoot(limiter_cache, monkeypatch):
+    _at(monkeypatch, 6000.0)
+    results = []
+    barrier = threading.Barrier(16)
+
+    def worker():
+        barrier.wait()
+        for _ in range(5):
+            results.append(bool(ratelimit.hit('t', 'k', limit=20)))
+
+    threads = [threading.Thread(target=worker) for _ in range(16)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert results.count(True) == 20
+
+
+def test_cache_outage_fails_open(monkeypatch):
+    class _Broken:
+        def incr(self, *a, **kw):
+            raise ConnectionError('cache down')
+    monkeypatch.setattr(ratelimit, '_cache', lambda: _Broken())
+    assert ratelimit.hit('t', 'k', limit=1)
+
+
+def _count_incrs(monkeypatch, cache):
+    calls = []
+    incr = cache.incr
+    monkeypatch.setattr(cache, 'incr', lambda k, delta=1, **kw: calls.append(delta) or incr(k, delta))
+    return calls
+
+
+def test_local_tier_batches_shared_increments(limiter_cache, monkeypatch):
+    _at(monkeypatch, 6000.0)
+    incrs = _count_incrs(monkeypatch, limiter_cache)
+    for _ in range(40):
+        assert ratelimit.hit('t', 'k', limit=100, local_batch=8)
+    # Below half the budget: one shared sync per 8 local hits, not one per hit.
+    assert len(incrs) <= 6
+    ratelimit.hit('t', 'k', limit=100)  # plain check sees everything synced so far
+    assert limiter_cache.get(ratelimit._KEY.format(scope='t', key='k', window=60, index=100)) >= 33
+
+    # Past the fraction every hit goes to the shared counter and the limit is exact.
+    admitted = sum(bool(ratelimit.hit('t', 'k', limit=100, local_batch=8)) for _ in range(100))
+    assert admitted == 100 - 41
+
+
+def test_local_tier_syncs_after_interval_and_flushes_on_rollover(limiter_cache, monkeypatch):
+    _at(monkeypatch, 6000.0)
+    incrs = _count_incrs(monkeypatch, limiter_cache)
+    for _ in range(3):
+        ratelimit.hit('t', 'k', limit=100, local_batch=8)
+    assert incrs == [1]
+    _at(monkeypatch, 6000.0 + 60 * ratelimit.LOCAL_SYNC_SHARE + 0.1)
+    ratelimit.hit('t', 'k', limit=100, local_batch=8)
+    assert incrs == [1, 3]  # two held-back hits + this one
+    ratelimit.hit('t', 'k', limit=100, local_batch=8)
+    # Window rolls over with one hit still local: it lands in the old window.
+    _at(monkeypatch, 6061.0)
+    ratelimit.hit('t', 'k', limit=100, local_batch=8)
+    assert limiter_cache.get(ratelimit._KEY.format(scope='t', key='k', window=60, index=100)) == 5
+
+
+def _run_processes(monkeypatch, schedule, *, limit, local_batch):
+    """Replay `schedule` (a sequence of process numbers) against one shared
+    cache, each process with its own in-process state. Returns the number
+    of admitted requests."""
+    states = {}
+    admitted = 0
+    for proc in schedule:
+        memo, local = states.setdefault(proc, ({}, {}))
+        monkeypatch.setattr(ratelimit, '_memo', memo)
+        monkeypatch.setattr(ratelimit, '_local', local)
+        admitted += bool(ratelimit.hit('t', 'k', limit=limit, local_batch=local_batch))
+    return admitted
+
+
+def test_local_tier_overshoot_is_bounded_by_one_batch_per_process(limiter_cache, monkeypatch):
+    import random
+
+    _at(monkeypatch, 6000.0)  # frozen clock: local views never go stale by time
+    procs, limit, batch = 4, 120, 8
+    # Worst case: every other process syncs early, one process fills the key
+    # through the shared counter, then the others spend their local batches.
+    schedule = [1, 2, 3] + [0] * 400 + [p for p in (1, 2, 3) for _ in range(50)]
+    admitted = _run_processes(monkeypatch, schedule, limit=limit, local_batch=batch)
+    assert limit < admitted <= limit + procs * batch
+
+    rng = random.Random(7)
+    for _ in range(20):
+        limiter_cache.clear()
+        schedule = [rng.randrange(procs) for _ in range(600)]
+        admitted = _run_processes(monkeypatch, schedule, limit=limit, local_batch=batch)
+        assert limit <= admitted <= limit + procs * batch
+
+
+@pytest.mark.parametrize('interval, max_incrs', [(2.0, 10), (0.5, 8), (0.1, 8)])
+def test_local_tier_spares_the_cache_at_buyer_polling_rates(limiter_cache, monkeypatch, interval, max_incrs):
+    # One buyer IP polling a 120/min key: 60 checks, one every `interval`
+    # seconds. The local tier should cover roughly a batch per shared sync
+    # at any of these rates, not fall back to the cache on slow polling.
+    incrs = _count_incrs(monkeypatch, limiter_cache)
+    for i in range(60):
+        _at(monkeypatch, 6000.0 + i * interval)
+        assert ratelimit.hit('t', 'ip', limit=120, local_batch=8)
+    assert len(incrs) <= max_incrs
@@ -0,0 +1,235 @@
+"""Bulk re-screening of past payers (pretix_eth/rescreen.py)."""
+from decimal import Decimal
+
+import pytest
+from django.utils import timezone
+from django_scopes import scopes_disabled
+
+from pretix_eth import rescreen, sanctions
+from pretix_eth.models import ScreenedPayer, WCPaymentAttempt, X402CompletedOrder
+
+X402_PAYER = '0x' + 'a1' * 20
+WC_PAYER = '0x' + 'b2' * 20
+INFO_PAYER = '0x' + 'c3' * 20
+CLEAN = '0x' + 'd4' * 20
+
+
+@pytest.fixture(autouse=True)
+def _state(monkeypatch):
+    store = {}
+
+    class FakeCache:
+        def get(self, k, default=None):
+            return store.get(k, default)
+
+        def set(self, k, v, timeout=None):
+            store[k] = v
+
+        def add(self, k, v, timeout=None):
+            return store.setdefault(k, v) is v
+
+        def delete(self, k):
+            store.pop(k, None)
+
+    monkeypatch.setattr(rescreen, '_cache', lambda: FakeCache())
+    listed = {'index': sanctions.AddressIndex.from_addresses([CLEAN[:-2] + 'ee'])}
+    monkeypatch.setattr(sanctions, 'get_ofac_addresses', lambda: listed['index'])
+    return listed
+
+
+def _list(state, *addresses):
+    state['index'] = sanctions.AddressIndex.from_addresses(addresses)
+
+
+@pytest.fixture
+def paid(event):
+    from pretix.base.models import Order
+
+    def _order(code):
+        sc = event.organizer.sales_channels.get(identifier='web')
+        return Order.objects.create(
+            event=event, email='buyer@example.com', status=Order.STATUS_PAID, total=Decimal('10.00'),
+            code=code, datetime=timezone.now(), expires=timezone.now(), sales_channel=sc, locale='en',
+        )
+
+    with scopes_disabled():
+        x402_order = _order('RSX402')
+        X402CompletedOrder.objects.create(
+            event=event, payment_reference='ref-1', tx_hash='0x' + '1' * 64, pretix_order_code=x402_order.code,
+            payer=X402_PAYER.upper().replace('0X', '0x'), chain_id=8453, total_usd=Decimal('10'), token_symbol='USDC',
+        )
+        wc_order = _order('RSWC01')
+        WCPaymentAttempt.objects.create(
+            tx_hash='0x' + '2' * 64, quote_id='q1', order_code=wc_order.code,
+            payer=WC_PAYER, chain_id=8453, state='completed',
+        )
+        wc_payment = wc_order.payments.create(provider='walletconnect', amount=wc_order.total, state='confirmed')
+        wc_payment.info_data = {'tx_hash': '0x' + '2' * 64}
+        wc_payment.save()
+        info_order = _order('RSINFO')
+        payment = info_order.payments.create(provider='walletconnect', amount=info_order.total, state='confirmed')
+        payment.info_data = {'payer': INFO_PAYER, 'tx_hash': '0x' + '3' * 64}
+        payment.save()
+    return {'x402': x402_order, 'wc': wc_order, 'info': info_order}
+
+
+def _hit_logs(order):
+    with scopes_disabled():
+        return list(order.all_logentries().filter(action_type=rescreen.HIT_ACTION))
+
+
+@pytest.mark.django_db
+def test_first_run_ingests_every_source_and_screens_in_full(paid, _state):
+    _list(_state, X402_PAYER, INFO_PAYER)
+    summary = rescreen.rescreen_payers()
+    assert summary['mode'] == 'full'
+    assert summary['newPayers'] == 3
+    assert {h['payer'] for h in summary['hits']} == {X402_PAYER, INFO_PAYER}
+    assert set(ScreenedPayer.objects.values_list('address', flat=True)) == {X402_PAYER, WC_PAYER, INFO_PAYER}
+    assert len(_hit_logs(paid['x402'])) == 1
+    assert len(_hit_logs(paid['info'])) == 1
+    assert _hit_logs(paid['wc']) == []
+
+    # Nothing changed → incremental, no new payers, no repeat log entries.
+    summary = rescreen.rescreen_payers()
+    assert summary['mode'] == 'incremental'
+    assert summary['newPayers'] == 0 and summary['listAdded'] == 0 and summary['hits'] == []
+    assert len(_hit_logs(paid['x402'])) == 1
+
+
+@pytest.mark.django_db
+def test_incremental_run_only_checks_the_list_delta(paid, _state, monkeypatch):
+    rescreen.rescreen_payers()
+    _list(_state, CLEAN[:-2] + 'ee', WC_PAYER)
+
+    # The delta lookup must not scan every known payer.
+    scanned = []
+    real_values_list = type(ScreenedPayer.objects.all()).values_list
+
+    def spy(qs, *fields, **kw):
+        if not qs.query.where:
+            scanned.append(fields)
+        return real_values_list(qs, *fields, **kw)
+
+    monkeypatch.setattr(type(ScreenedPayer.objects.all()), 'values_list', spy)
+    summary = rescreen.rescreen_payers()
+    assert summary['mode'] == 'incremental'
+    # Only the payer read again this run is screened in full: the x402
+    # watermark is inclusive, so its newest row comes round once more.
+    assert summary['listAdded'] == 1 and summary['screened'] == 1
+    assert summary['hits'] == [{'payer': WC_PAYER, 'orders': [paid['wc'].code]}]
+    assert scanned == []
+    assert len(_hit_logs(paid['wc'])) == 1
+
+
+@pytest.mark.django_db
+def test_new_payers_are_screened_against_the_full_list(paid, _state, event):
+    rescreen.rescreen_payers()
+    late = '0x' + 'e5' * 20
+    _list(_state, CLEAN[:-2] + 'ee', late)
+    # `late` pays for the first time after the list update that added it:
+    # new payers are intersected with the whole list, not just the delta.
+    with scopes_disabled():
+        X402CompletedOrder.objects.create(
+            event=event, payment_reference='ref-2', tx_hash='0x' + '4' * 64, pretix_order_code='NOORDR',
+            payer=late, chain_id=8453, total_usd=Decimal('10'), token_symbol='USDC',
+        )
+    summary = rescreen.rescreen_payers()
+    assert summary['newPayers'] == 1
+    assert [h['payer'] for h in summary['hits']] == [late]
+    assert ScreenedPayer.objects.get(address=late).flagged_version == _state['index'].version
+
+
+@pytest.mark.django_db
+def test_rescreen_skips_while_locked_and_task_runs(paid, _state):
+    rescreen._cache().add(rescreen._LOCK_KEY, 1)
+    assert rescreen.rescreen_payers() == {'skipped': True}
+    rescreen._cache().delete(rescreen._LOCK_KEY)
+
+    from pretix_eth.tasks import rescreen_payers_task
+    assert rescreen_payers_task(full=True)['mode'] == 'full'
+
+
+@pytest.mark.django_db
+def test_wc_hits_stay_on_the_order_that_was_paid(paid, _state, event):
+    from pretix.base.models import Event, Order, Organizer
+
+    # Same order code under another organizer: not this payer's order.
+    with scopes_disabled():
+        organizer = Organizer.objects.create(name='Other', slug='other')
+        other = Event.objects.create(
+            name='Other', slug='other', organizer=organizer,
+            date_from=event.date_from, plugins='pretix_eth',
+        )
+        sc = organizer.sales_channels.get(identifier='web')
+        namesake = Order.objects.create(
+            event=other, email='x@example.com', status=Order.STATUS_PAID, total=Decimal('10.00'),
+            code=paid['wc'].code, datetime=timezone.now(), expires=timezone.now(), sales_channel=sc, locale='en',
+        )
+    _list(_state, WC_PAYER)
+    summary = rescreen.rescreen_payers()
+    assert summary['hits'] == [{'payer': WC_PAYER, 'orders': [paid['wc'].code]}]
+    assert len(_hit_logs(paid['wc'])) == 1
+    assert _hit_logs(namesake) == []
+
+
+@pytest.mark.django_db
+def test_incremental_run_picks_up_settlements_via_attempts(paid, _state):
+    rescreen.rescreen_payers()
+    late = '0x' + 'f6' * 20
+    _list(_state, CLEAN[:-2] + 'ee', late)
+    # A payment created before the last run settles now: its payer lands in
+    # the payment info and in a new attempt row, which the next run ingests.
+    with scopes_disabled():
+        order = paid['info']
+        payment = order.payments.create(provider='walletconnect', amount=order.total, state='created')
+    rescreen.rescreen_payers()
+    with scopes_disabled():
+        payment.info_data = {'payer': late, 'tx_hash': '0x' + '5' * 64}
+        payment.save()
+        WCPaymentAttempt.objects.create(
+            tx_hash='0x' + '5' * 64, quote_id='q2', order_code=order.code,
+            payer=late, chain_id=8453, state='completed',
+        )
+    summary = rescreen.rescreen_payers()
+    assert summary['mode'] == 'incremental' and summary['newPayers'] == 1
+    assert summary['hits'] == [{'payer': late, 'orders': [order.code]}]
+
+
+@pytest.mark.django_db
+def test_flagged_payers_later_orders_are_recorded(paid, _state, event):
+    _list(_state, X402_PAYER)
+    assert [h['payer'] for h in rescreen.rescreen_payers()['hits']] == [X402_PAYER]
+
+    # The flagged payer buys again: no list change, not a new payer, yet the
+    # new order gets its own entry — and the old one no second entry.
+    from pretix.base.models import Order
+    with scopes_disabled():
+        again = Order.objects.create(
+            event=event, email='buyer@example.com', status=Order.STATUS_PAID, total=Decimal('10.00'),
+            code='RSAGN1', datetime=timezone.now(), expires=timezone.now(),
+            sales_channel=event.organizer.sales_channels.get(identifier='web'), locale='en',
+        )
+        X402CompletedOrder.objects.create(
+            event=event, payment_reference='ref-3', tx_hash='0x' + '6' * 64, pretix_order_code=again.code,
+            payer=X402_PAYER, chain_id=8453, total_usd=Decimal('10'), token_symbol='USDC',
+        )
+    summary = rescreen.rescreen_payers()
+    assert summary['mode'] == 'incremental' and summary['newPayers'] == 0
+    assert summary['hits'] == [{'payer': X402_PAYER, 'orders': [again.code]}]
+    assert len(_hit_logs(again)) == 1
+    assert len(_hit_logs(paid['x402'])) == 1
+
+
+@pytest.mark.django_db
+def test_overlong_run_leaves_the_next_runs_lock_alone(paid, _state, monkeypatch):
+    real = rescreen._rescreen
+
+    def slow(cache, *, full):
+        # Our lock expired mid-run and another run took it.
+        cache.set(rescreen._LOCK_KEY, 'other-run')
+        return real(cache, full=full)
+
+    monkeypatch.setattr(rescreen, '_rescreen', slow)
+    rescreen.rescreen_payers()
+    assert rescreen._cache().get(rescreen._LOCK_KEY) == 'other-run'
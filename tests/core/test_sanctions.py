@@ -16,12 +16,19 @@ from pretix_eth import sanctions
 SANCTIONED = '0x0330070fd38ec3bb94f58fa55d40368271e9e54a'
 CLEAN = '0x403a3a81aba974deb4faf20514ae34faf9268e28'
 
+# conftest's `_sanctions_offline` stubs the network fetch for every test;
+# keep a handle on the real one for the tests that fake `requests` instead.
+_real_fetch_ofac_union = sanctions._fetch_ofac_union
+
 
 @pytest.fixture(autouse=True)
-def _isolate(monkeypatch):
-    """Reset the module memo and make the Django cache a no-op so tests
-    exercise the fetch/fallback logic deterministically."""
+def _isolate(monkeypatch, tmp_path):
+    """Reset the module memo, give each test its own snapshot directory and
+    make the Django cache a no-op so tests exercise the fetch/fallback logic
+    deterministically."""
     monkeypatch.setattr(sanctions, '_memo', {'ofac': None, 'ofac_at': 0.0, 'scam': None, 'scam_at': 0.0})
+    monkeypatch.setattr(sanctions, '_snapshots', {})
+    monkeypatch.setattr(sanctions, '_snapshot_dir', lambda: str(tmp_path))
 
     class BrokenCache:
         def get(self, *a, **k):
@@ -53,9 +60,11 @@ def test_is_sanctioned_normalizes_case_and_whitespace(monkeypatch):
 def test_fresh_fetch_wins_over_fallback(monkeypatch):
     extra = '0x' + 'ab' * 20
     monkeypatch.setattr(sanctions, '_fetch_ofac_union', lambda: frozenset([extra]))
+    sanctions.refresh_ofac()
     assert sanctions.is_sanctioned(extra) is True
-    # memoized within the freshness window: second call must not refetch
+    # The request path only reads — it must never fetch.
     monkeypatch.setattr(sanctions, '_fetch_ofac_union', lambda: (_ for _ in ()).throw(AssertionError('refetched')))
+    sanctions._memo['ofac_at'] = 0.0
     assert sanctions.is_sanctioned(extra) is True
 
 
@@ -67,3 +76,333 @@ def test_scam_list_fails_open(monkeypatch):
 
     monkeypatch.setattr(requests, 'get', boom)
     assert sanctions.is_scam_flagged(SANCTIONED) is False
+
+
+def test_address_index_is_sorted_compact_and_versioned():
+    addrs = ['0x' + 'ff' * 20, SANCTIONED.upper().replace('0X', '0x'), '0x' + '00' * 20, SANCTIONED, 'not-an-address']
+    index = sanctions.AddressIndex.from_addresses(addrs)
+    assert len(index) == 3
+    assert len(index.to_bytes()) == 3 * 20
+    assert list(index) == ['0x' + '00' * 20, SANCTIONED, '0x' + 'ff' * 20]
+    assert SANCTIONED in index and ('0x' + 'ff' * 20) in index
+    assert CLEAN not in index
+    assert '0x1234' not in index and 'zz' * 21 not in index
+    # content-addressed: same set → same version, regardless of input order/case
+    assert sanctions.AddressIndex.from_addresses(reversed(addrs)).version == index.version
+    assert sanctions.AddressIndex(index.to_bytes()).version == index.version
+
+
+def test_workers_reload_index_only_when_published_version_changes(monkeypatch):
+    store = {}
+    gets = []
+
+    class FakeCache:
+        def get(self, k, default=None):
+            gets.append(k)
+            return store.get(k, default)
+
+        def set(self, k, v, timeout=None):
+            store[k] = v
+
+    monkeypatch.setattr(sanctions, '_cache', lambda: FakeCache())
+    first = sanctions.AddressIndex.from_addresses([SANCTIONED])
+    store[sanctions._OFAC_INDEX_KEY] = first.to_bytes()
+    store[sanctions._OFAC_VERSION_KEY] = first.version
+    monkeypatch.setattr(sanctions, '_fetch_ofac_union', lambda: (_ for _ in ()).throw(AssertionError('fetched')))
+
+    assert sanctions.is_sanctioned(SANCTIONED) is True
+    assert sanctions._OFAC_INDEX_KEY in gets
+
+    # Version unchanged → only the version key is read once the memo is due.
+    gets.clear()
+    sanctions._memo['ofac_at'] = 0.0
+    assert sanctions.is_sanctioned(SANCTIONED) is True
+    assert gets == [sanctions._OFAC_VERSION_KEY]
+
+    # Another worker publishes a new version → blob re-read.
+    second = sanctions.AddressIndex.from_addresses([SANCTIONED, CLEAN])
+    store[sanctions._OFAC_INDEX_KEY] = second.to_bytes()
+    store[sanctions._OFAC_VERSION_KEY] = second.version
+    sanctions._memo['ofac_at'] = 0.0
+    assert sanctions.is_sanctioned(CLEAN) is True
+
+
+class _Resp:
+    def __init__(self, status, text='', headers=None):
+        self.status_code = status
+        self.text = text
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise OSError('HTTP %d' % self.status_code)
+
+
+def test_ofac_tickers_fetched_concurrently_with_conditional_get(monkeypatch):
+    import threading
+    import requests
+
+    store = {}
+
+    class FakeCache:
+        def get(self, k, default=None):
+            return store.get(k, default)
+
+        def set(self, k, v, timeout=None):
+            store[k] = v
+
+    monkeypatch.setattr(sanctions, '_cache', lambda: FakeCache())
+    in_flight = {'now': 0, 'max': 0}
+    lock = threading.Lock()
+    seen_headers = []
+
+    def fake_get(url, headers=None, timeout=None):
+        import time
+        with lock:
+            in_flight['now'] += 1
+            in_flight['max'] = max(in_flight['max'], in_flight['now'])
+            seen_headers.append(dict(headers or {}))
+        time.sleep(0.05)
+        with lock:
+            in_flight['now'] -= 1
+        ticker = url.rsplit('_', 1)[1].split('.')[0]
+        if (headers or {}).get('If-None-Match') == '"v1-%s"' % ticker:
+            return _Resp(304)
+        body = SANCTIONED + '\n' if ticker == 'ETH' else '0x' + ticker.lower().ljust(40, '0')[:40] + '\n'
+        return _Resp(200, body, {'ETag': '"v1-%s"' % ticker, 'Last-Modified': 'Mon, 12 Aug 2026 00:00:00 GMT'})
+
+    monkeypatch.setattr(requests, 'get', fake_get)
+    first = _real_fetch_ofac_union()
+    assert SANCTIONED in first
+    assert len(first) == len(sanctions._OFAC_EVM_TICKERS)
+    assert in_flight['max'] > 1
+    assert not any(seen_headers)
+
+    # Second refresh: every ticker answers 304 → same union, validators sent.
+    seen_headers.clear()
+    assert _real_fetch_ofac_union() == first
+    assert all(h.get('If-None-Match') and h.get('If-Modified-Since') for h in seen_headers)
+
+
+def test_ofac_refresh_fails_when_any_ticker_fails(monkeypatch):
+    import requests
+
+    def fake_get(url, headers=None, timeout=None):
+        if 'USDT' in url:
+            return _Resp(503)
+        return _Resp(200, SANCTIONED + '\n')
+
+    monkeypatch.setattr(requests, 'get', fake_get)
+    with pytest.raises(OSError, match='503'):
+        _real_fetch_ofac_union()
+
+
+def test_request_path_never_downloads(monkeypatch):
+    import requests
+
+    def boom(*a, **k):
+        raise AssertionError('request path fetched a list')
+
+    monkeypatch.setattr(requests, 'get', boom)
+    monkeypatch.setattr(sanctions, '_fetch_ofac_union', boom)
+    assert sanctions.is_sanctioned(SANCTIONED) is True  # bundled snapshot
+    assert sanctions.is_scam_flagged(SANCTIONED) is False  # fails open
+
+
+def test_refresh_lists_skips_fresh_lists_and_reports_failures(monkeypatch):
+    store = {}
+
+    class FakeCache:
+        def get(self, k, default=None):
+            return store.get(k, default)
+
+        def set(self, k, v, timeout=None):
+            store[k] = v
+
+    monkeypatch.setattr(sanctions, '_cache', lambda: FakeCache())
+    monkeypatch.setattr(sanctions, '_fetch_ofac_union', lambda: frozenset([SANCTIONED]))
+
+    def scam_down():
+        raise OSError('github down')
+
+    monkeypatch.setattr(sanctions, '_fetch_scam_list', scam_down)
+    summary = sanctions.refresh_lists()
+    assert summary['ofac']['refreshed'] is True
+    assert summary['ofac']['addresses'] == 1
+    assert 'github down' in summary['scam']['error']
+    assert store[sanctions._OFAC_VERSION_KEY] == summary['ofac']['version']
+
+    monkeypatch.setattr(sanctions, '_fetch_scam_list', lambda: [CLEAN])
+    summary = sanctions.refresh_lists()
+    assert summary['ofac'] == {'refreshed': False, 'version': store[sanctions._OFAC_VERSION_KEY]}
+    assert summary['scam']['refreshed'] is True
+    assert sanctions.is_scam_flagged(CLEAN) is True
+
+    assert sanctions.refresh_lists(force=True)['ofac']['refreshed'] is True
+
+
+def test_refresh_command_and_task(monkeypatch):
+    from django.core.management import call_command
+    from django.core.management.base import CommandError
+    from io import StringIO
+
+    monkeypatch.setattr(sanctions, '_fetch_ofac_union', lambda: frozenset([SANCTIONED]))
+    monkeypatch.setattr(sanctions, '_fetch_scam_list', lambda: [CLEAN])
+    out = StringIO()
+    call_command('refresh_sanctions_lists', '--force', stdout=out)
+    assert 'ofac: published version' in out.getvalue()
+    assert 'scam: published version' in out.getvalue()
+
+    from pretix_eth import tasks
+    chained = []
+    monkeypatch.setattr(tasks.rescreen_payers_task, 'apply_async', lambda *a, **k: chained.append(1))
+    assert tasks.refresh_sanctions_lists_task()['ofac']['refreshed'] is True
+    assert chained == [1]  # the payer re-screen follows every refresh
+
+    monkeypatch.setattr(sanctions, '_fetch_scam_list', lambda: (_ for _ in ()).throw(OSError('down')))
+    with pytest.raises(CommandError, match='scam'):
+        call_command('refresh_sanctions_lists', '--force', stdout=StringIO(), stderr=StringIO())
+
+
+def test_snapshot_file_is_mapped_and_shared_across_workers(monkeypatch, tmp_path):
+    import mmap
+
+    store = {}
+
+    class FakeCache:
+        def get(self, k, default=None):
+            return store.get(k, default)
+
+        def set(self, k, v, timeout=None):
+            store[k] = v
+
+    monkeypatch.setattr(sanctions, '_cache', lambda: FakeCache())
+    extra = '0x' + 'ab' * 20
+    monkeypatch.setattr(sanctions, '_fetch_ofac_union', lambda: frozenset([extra, SANCTIONED]))
+    published = sanctions.refresh_ofac()
+    assert isinstance(published._buf, mmap.mmap)
+    raw = (tmp_path / 'ofac.idx').read_bytes()
+    assert raw[:8] == b'PXETHSN1' and len(raw) == 32 + 2 * 20
+
+    # A fresh worker (empty memo, no blob in the cache) screens from the file
+    # without downloading anything.
+    del store[sanctions._OFAC_INDEX_KEY]
+    monkeypatch.setattr(sanctions, '_memo', {'ofac': None, 'ofac_at': 0.0, 'scam': None, 'scam_at': 0.0})
+    monkeypatch.setattr(sanctions, '_snapshots', {})
+    monkeypatch.setattr(sanctions, '_fetch_ofac_union', lambda: (_ for _ in ()).throw(AssertionError('fetched')))
+    assert sanctions.is_sanctioned(extra) is True
+    assert sanctions.is_sanctioned(CLEAN) is False
+    assert sanctions.get_ofac_addresses().version == published.version
+
+    # Another host publishes a new version: this worker pulls the blob once,
+    # writes it to the file (atomic replace → new inode) and remaps.
+    newer = sanctions.AddressIndex.from_addresses([extra, SANCTIONED, CLEAN])
+    store[sanctions._OFAC_INDEX_KEY] = newer.to_bytes()
+    store[sanctions._OFAC_VERSION_KEY] = newer.version
+    sanctions._memo['ofac_at'] = 0.0
+    assert sanctions.is_sanctioned(CLEAN) is True
+    remapped = sanctions.get_ofac_addresses()
+    assert isinstance(remapped._buf, mmap.mmap) and remapped.version == newer.version
+    assert (tmp_path / 'ofac.idx').read_bytes()[32:] == newer.to_bytes()
+    assert not [p for p in tmp_path.iterdir() if p.suffix == '.tmp']
+    # The previous mapping stays valid for any lookup still holding it.
+    assert CLEAN not in published and extra in published
+
+
+def test_corrupt_snapshot_is_ignored(monkeypatch, tmp_path):
+    (tmp_path / 'ofac.idx').write_bytes(b'PXETHSN1' + b'0' * 16 + b'\x05' + b'\x00' * 7)
+    assert sanctions.is_sanctioned(SANCTIONED) is True
+    assert sanctions.get_ofac_addresses() is sanctions._OFAC_FALLBACK_INDEX
+    with pytest.raises(ValueError):
+        sanctions.AddressIndex.from_snapshot(b'garbage')
+
+
+def test_scam_refresh_is_single_flight_with_last_good_copy(monkeypatch):
+    import threading
+    import time
+
+    calls = []
+    release = threading.Event()
+
+    def slow_fetch():
+        calls.append(1)
+        release.wait(2)
+        return [SANCTIONED]
+
+    monkeypatch.setattr(sanctions, '_fetch_scam_list', slow_fetch)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(sanctions.refresh_scam_list())) for _ in range(8)]
+    threads[0].start()
+    while not calls:
+        time.sleep(0.001)
+    for t in threads[1:]:
+        t.start()
+    for t in threads[1:]:
+        t.join()
+    release.set()
+    threads[0].join()
+    # One download; the callers that arrived mid-refresh got the current
+    # (empty, fail-open) copy instead of starting their own.
+    assert len(calls) == 1
+    assert sum(len(r) for r in results) == 1
+    assert sanctions.is_scam_flagged(SANCTIONED) is True
+
+
+def test_refresh_skipped_while_another_process_holds_the_lock(monkeypatch):
+    store = {sanctions._REFRESH_LOCK_KEY.format(name='scam'): 4242}
+
+    class FakeCache:
+        def get(self, k, default=None):
+            return store.get(k, default)
+
+        def set(self, k, v, timeout=None):
+            store[k] = v
+
+        def add(self, k, v, timeout=None):
+            return store.setdefault(k, v) is v
+
+        def delete(self, k):
+            store.pop(k, None)
+
+    monkeypatch.setattr(sanctions, '_cache', lambda: FakeCache())
+    monkeypatch.setattr(sanctions, '_fetch_scam_list', lambda: (_ for _ in ()).throw(AssertionError('fetched')))
+    skips = sanctions._SCAM.refresh_skips
+    assert len(sanctions.refresh_scam_list()) == 0
+    assert sanctions._SCAM.refresh_skips == skips + 1
+
+    # Lock released → the refresh runs, and releases the lock afterwards.
+    del store[sanctions._REFRESH_LOCK_KEY.format(name='scam')]
+    monkeypatch.setattr(sanctions, '_fetch_scam_list', lambda: [SANCTIONED])
+    assert len(sanctions.refresh_scam_list()) == 1
+    assert sanctions._REFRESH_LOCK_KEY.format(name='scam') not in store
+
+    # A download that outlives the lock leaves alone the lock another
+    # refresher has taken since.
+    key = sanctions._REFRESH_LOCK_KEY.format(name='scam')
+
+    def slow_fetch():
+        store[key] = '4242:later-refresher'  # ours expired; someone else's
+        return [SANCTIONED]
+
+    monkeypatch.setattr(sanctions, '_fetch_scam_list', slow_fetch)
+    assert len(sanctions.refresh_scam_list()) == 1
+    assert store[key] == '4242:later-refresher'
+
+
+def test_list_metrics_track_size_freshness_and_failures(monkeypatch):
+    failures = sanctions._OFAC.refresh_failures
+    assert sanctions.refresh_lists(force=True)['ofac']['refreshed'] is False
+    metrics = sanctions.get_list_metrics()
+    assert metrics['ofac']['refreshFailures'] == failures + 1
+    assert 'network access disabled' in metrics['ofac']['lastError']
+
+    assert sanctions.is_sanctioned(SANCTIONED)
+    metrics = sanctions.get_list_metrics()['ofac']
+    assert metrics['source'] == 'bundled' and metrics['fresh'] is False
+    assert metrics['addresses'] == len(sanctions._OFAC_FALLBACK)
+
+    monkeypatch.setattr(sanctions, '_fetch_ofac_union', lambda: frozenset([SANCTIONED, CLEAN]))
+    sanctions.refresh_ofac()
+    metrics = sanctions.get_list_metrics()['ofac']
+    assert metrics['source'] == 'snapshot' and metrics['fresh'] is True
+    assert metrics['addresses'] == 2 and metrics['lastRefreshSeconds'] is not None
@@ -19,7 +19,7 @@ nothing to buy while the shop is offline.
 from pretix_eth.urls import event_patterns
 
 ADMIN_ROUTE_NAMES = {
-    'admin_orders', 'admin_stats', 'admin_refund',
+    'admin_orders', 'admin_stats', 'admin_pricing', 'admin_sanctions', 'admin_balances', 'admin_refund',
     'admin_verify', 'admin_wc_refund', 'admin_wc_verify',
 }
 
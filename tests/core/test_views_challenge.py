@@ -46,7 +46,7 @@ def test_challenge_missing_fields(client):
 
 
 @pytest.mark.django_db
-def test_challenge_returns_nonce_and_message(client, event, pending_order):
+def test_challenge_returns_nonce_and_message(client, event, pending_order, locmem_cache):
     resp = client.post(
         '/plugin/wc/challenge/',
         data=json.dumps({
@@ -66,12 +66,12 @@ def test_challenge_returns_nonce_and_message(client, event, pending_order):
     assert 'expires_at' in body
     assert body['expires_at'] > 0
 
-    # Verify the nonce was persisted to the payment's info_data
+    # The challenge lives in the cache; no payment row is written until a quote.
+    from pretix_eth.views import _load_challenge
+    stored = _load_challenge(pending_order, body['nonce'])
+    assert stored == {'message': body['message'], 'expires_at': body['expires_at']}
     with scopes_disabled():
-        pending_order.refresh_from_db()
-        payment = pending_order.payments.filter(provider='walletconnect').first()
-        assert payment is not None
-        assert payment.info_data.get('challenge_nonce') == body['nonce']
+        assert not pending_order.payments.exists()
 
 
 @pytest.mark.django_db
@@ -105,3 +105,39 @@ def test_challenge_order_not_found(client, event):
         content_type='application/json',
     )
     assert resp.status_code == 404
+
+
+@pytest.mark.django_db
+def test_challenge_without_a_real_cache_is_kept_on_the_payment(client, event, pending_order):
+    from eth_account import Account
+    from eth_account.messages import encode_defunct
+
+    event.settings.set('payment_walletconnect_receive_address', '0x' + '2' * 40)
+    event.settings.set('payment_walletconnect_wc_project_id', 'p1')
+    auth = {
+        'order_code': pending_order.code, 'order_secret': pending_order.secret,
+        'organizer': event.organizer.slug, 'event': event.slug,
+    }
+    body = client.post('/plugin/wc/challenge/', data=json.dumps(auth), content_type='application/json').json()
+    with scopes_disabled():
+        info = pending_order.payments.get(provider='walletconnect').info_data
+    assert (info['challenge_nonce'], info['challenge_message']) == (body['nonce'], body['message'])
+
+    def quote(signature):
+        return client.post('/plugin/wc/create-quote/', data=json.dumps(dict(
+            auth, chain_id=8453, symbol='USDC', nonce=body['nonce'], signature=signature,
+        )), content_type='application/json')
+
+    assert quote('0x' + '00' * 65).status_code == 400
+    with scopes_disabled():
+        assert pending_order.payments.get(provider='walletconnect').info_data['failed_sig_attempts'] == 1
+
+    signature = Account.create().sign_message(encode_defunct(text=body['message'])).signature.hex()
+    resp = quote(signature)
+    assert resp.status_code == 200, resp.content
+    with scopes_disabled():
+        info = pending_order.payments.get(provider='walletconnect').info_data
+    assert info['quote_id'] == resp.json()['quote_id']
+    assert 'failed_sig_attempts' not in info
+    # The challenge stays valid for a re-quote (wallet or token switch).
+    assert quote(signature).status_code == 200
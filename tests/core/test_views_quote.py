@@ -7,9 +7,18 @@ from eth_account.messages import encode_defunct
 from django_scopes import scopes_disabled
 
 
+NONCE = 'testnonce123'
+
+
+def _challenge_message(order):
+    from pretix_eth.views import _load_challenge
+    return _load_challenge(order, NONCE)['message']
+
+
 @pytest.fixture
-def pending_order_with_challenge(event, django_db_reset_sequences):
+def pending_order_with_challenge(event, django_db_reset_sequences, locmem_cache):
     """Order with a challenge already issued (reproduces what /challenge does)."""
+    from pretix_eth.views import _store_challenge
     from pretix.base.models import Order
     from decimal import Decimal
     from django.utils import timezone
@@ -27,18 +36,9 @@ def pending_order_with_challenge(event, django_db_reset_sequences):
             sales_channel=sc,
             locale='en',
         )
-        payment = order.payments.create(
-            provider='walletconnect', amount=order.total, state='created',
-        )
-        nonce = 'testnonce123'
-        expires_at = int(time.time()) + 600
-        message = f'Pretix ticket payment\nOrder: {order.code}\nNonce: {nonce}\nExpires: {expires_at}'
-        payment.info_data = {
-            'challenge_nonce': nonce,
-            'challenge_message': message,
-            'challenge_expires_at': expires_at,
-        }
-        payment.save()
+    expires_at = int(time.time()) + 600
+    message = f'Pretix ticket payment\nOrder: {order.code}\nNonce: {NONCE}\nExpires: {expires_at}'
+    _store_challenge(order, NONCE, message, expires_at)
     return order
 
 
@@ -55,11 +55,8 @@ def test_create_quote_recovers_payer_from_signature(
     client, event_configured, pending_order_with_challenge,
 ):
     order = pending_order_with_challenge
-    with scopes_disabled():
-        payment = order.payments.first()
-        info = payment.info_data
-    nonce = info['challenge_nonce']
-    message = info['challenge_message']
+    nonce = NONCE
+    message = _challenge_message(order)
 
     acct = Account.create()
     signed = acct.sign_message(encode_defunct(text=message))
@@ -82,6 +79,17 @@ def test_create_quote_recovers_payer_from_signature(
     assert body['symbol'] == 'USDC'
     # $50 USDC at 6 decimals = 50_000_000 raw
     assert body['amount_raw'] == '50000000'
+    # Indexed quote row for verify / admin lookups.
+    from pretix_eth.models import WCQuote
+    row = WCQuote.objects.get(quote_id=body['quote_id'])
+    # The pending payment is only created now, by the quote.
+    with scopes_disabled():
+        payment = order.payments.get(provider='walletconnect', state='created')
+    assert row.payment_id == payment.pk
+    assert row.data == body and row.amount_raw == '50000000'
+    # info_data keeps only a pointer to it, not the quote or its history.
+    assert payment.info_data['quote_id'] == body['quote_id']
+    assert 'quote' not in payment.info_data and 'quotes' not in payment.info_data
 
 
 @pytest.mark.django_db
@@ -89,9 +97,7 @@ def test_create_quote_rejects_wrong_nonce(
     client, event_configured, pending_order_with_challenge,
 ):
     order = pending_order_with_challenge
-    with scopes_disabled():
-        payment = order.payments.first()
-        message = payment.info_data['challenge_message']
+    message = _challenge_message(order)
 
     acct = Account.create()
     signed = acct.sign_message(encode_defunct(text=message))
@@ -112,10 +118,8 @@ def test_create_quote_rejects_unsupported_combo(
     client, event_configured, pending_order_with_challenge,
 ):
     order = pending_order_with_challenge
-    with scopes_disabled():
-        payment = order.payments.first()
-        nonce = payment.info_data['challenge_nonce']
-        message = payment.info_data['challenge_message']
+    nonce = NONCE
+    message = _challenge_message(order)
 
     acct = Account.create()
     signed = acct.sign_message(encode_defunct(text=message))
@@ -137,10 +141,8 @@ def test_create_quote_eth_uses_oracle_price(
     client, event_configured, pending_order_with_challenge,
 ):
     order = pending_order_with_challenge
-    with scopes_disabled():
-        payment = order.payments.first()
-        nonce = payment.info_data['challenge_nonce']
-        message = payment.info_data['challenge_message']
+    nonce = NONCE
+    message = _challenge_message(order)
 
     acct = Account.create()
     signed = acct.sign_message(encode_defunct(text=message))
@@ -172,10 +174,8 @@ def test_create_quote_eth_disabled_when_oracle_fails(
     client, event_configured, pending_order_with_challenge,
 ):
     order = pending_order_with_challenge
-    with scopes_disabled():
-        payment = order.payments.first()
-        nonce = payment.info_data['challenge_nonce']
-        message = payment.info_data['challenge_message']
+    nonce = NONCE
+    message = _challenge_message(order)
 
     acct = Account.create()
     signed = acct.sign_message(encode_defunct(text=message))
@@ -193,3 +193,39 @@ def test_create_quote_eth_disabled_when_oracle_fails(
             'nonce': nonce, 'signature': signed.signature.hex(),
         }), content_type='application/json')
     assert resp.status_code == 503
+
+
+@pytest.mark.django_db
+def test_create_quote_failed_sig_budget_is_per_challenge(
+    client, event_configured, pending_order_with_challenge, monkeypatch,
+):
+    from pretix_eth import views
+    monkeypatch.setattr(views, 'WC_CREATE_QUOTE_PER_CHALLENGE_BUDGET', 2)
+    order = pending_order_with_challenge
+    payload = {
+        'order_code': order.code,
+        'order_secret': order.secret,
+        'organizer': event_configured.organizer.slug,
+        'event': event_configured.slug,
+        'chain_id': 8453, 'symbol': 'USDC',
+        'nonce': NONCE, 'signature': '0x' + '00' * 65,
+    }
+
+    def post(**overrides):
+        return client.post('/plugin/wc/create-quote/', data=json.dumps(dict(payload, **overrides)),
+                           content_type='application/json')
+
+    assert post().status_code == 400
+    assert post().status_code == 400
+    assert post().status_code == 429
+    # Nothing durable was written for the failed attempts.
+    with scopes_disabled():
+        assert not order.payments.exists()
+
+    # A fresh challenge starts a fresh budget.
+    expires_at = int(time.time()) + 600
+    message = f'Pretix ticket payment\nOrder: {order.code}\nNonce: other\nExpires: {expires_at}'
+    views._store_challenge(order, 'other', message, expires_at)
+    signed = Account.create().sign_message(encode_defunct(text=message))
+    resp = post(nonce='other', signature=signed.signature.hex())
+    assert resp.status_code == 200, resp.content
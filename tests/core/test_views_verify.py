@@ -4,7 +4,7 @@ from unittest import mock
 import pytest
 from django_scopes import scopes_disabled
 
-from pretix_eth.models import WCPaymentAttempt
+from pretix_eth.models import WCPaymentAttempt, WCQuote
 
 
 @pytest.fixture
@@ -35,28 +35,28 @@ def quoted_order(event, django_db_reset_sequences):
             provider='walletconnect', amount=order.total, state='created',
         )
         now = int(time.time())
-        payment.info_data = {
-            'quote': {
-                'quote_id': 'q_test_12345',
-                'order_code': order.code,
-                'chain_id': 8453,
-                'symbol': 'USDC',
-                'token_address': '0x833589fCD6eDb6E08f4c7C32D4f71b54bdA02913',
-                'amount_raw': '50000000',
-                'receive_address': '0x' + '2' * 40,
-                'intended_payer': '0x' + '1' * 40,
-                'eth_price_usd': None,
-                'created_at': now,
-                'expires_at': now + 600,
-                'order_total_usd': '50.00',
-                # Signer binding (post-create-quote); settlement re-validates it.
-                'signature': '0x' + '11' * 65,
-                'signed_message': 'Devcon ticket payment',
-                'sig_chain_id': 8453,
-                'payer_code_prefix': None,
-            }
+        quote = {
+            'quote_id': 'q_test_12345',
+            'order_code': order.code,
+            'chain_id': 8453,
+            'symbol': 'USDC',
+            'token_address': '0x833589fCD6eDb6E08f4c7C32D4f71b54bdA02913',
+            'amount_raw': '50000000',
+            'receive_address': '0x' + '2' * 40,
+            'intended_payer': '0x' + '1' * 40,
+            'eth_price_usd': None,
+            'created_at': now,
+            'expires_at': now + 600,
+            'order_total_usd': '50.00',
+            # Signer binding (post-create-quote); settlement re-validates it.
+            'signature': '0x' + '11' * 65,
+            'signed_message': 'Devcon ticket payment',
+            'sig_chain_id': 8453,
+            'payer_code_prefix': None,
         }
+        payment.info_data = {'quote_id': quote['quote_id']}
         payment.save()
+        WCQuote.from_quote(payment, quote).save()
     return order
 
 
@@ -136,8 +136,8 @@ def test_verify_happy_path(client, event_configured, quoted_order):
         token='0x833589fCD6eDb6E08f4c7C32D4f71b54bdA02913',
         amount=50_000_000,
     )
-    with mock.patch('pretix_eth.views._get_web3', return_value=fake), \
-         mock.patch('pretix_eth.views._revalidate_quote_signer', return_value=(True, '')):
+    with mock.patch('pretix_eth.rpc.get_web3', return_value=fake), \
+         mock.patch('pretix_eth.settlement.revalidate_quote_signer', return_value=(True, '')):
         resp = client.post('/plugin/wc/verify/', data=json.dumps({
             'quote_id': 'q_test_12345',
             'tx_hash': '0x' + 'c' * 64,
@@ -146,9 +146,16 @@ def test_verify_happy_path(client, event_configured, quoted_order):
             'event': event_configured.slug,
         }), content_type='application/json')
 
+    # Settled by the (eagerly run) settlement task before verify answered.
     assert resp.status_code == 200, resp.content
     body = resp.json()
     assert body['verified'] is True
+    assert body['status'] == 'settled'
+    assert body['status_url'].startswith('/plugin/wc/verify/status/?')
+
+    status = client.get(body['status_url'])
+    assert status.status_code == 200
+    assert status.json()['status'] == 'settled' and status.json()['block_number'] == 100
 
     # WCPaymentAttempt row created
     assert WCPaymentAttempt.objects.filter(
@@ -163,6 +170,53 @@ def test_verify_happy_path(client, event_configured, quoted_order):
         assert payment.info_data.get('chain_id') == 8453
 
 
+@pytest.mark.django_db
+def test_verify_quote_lookup_is_indexed(client, event_configured, quoted_order, django_assert_max_num_queries):
+    from decimal import Decimal
+    from pretix.base.models import Order
+    from django.utils import timezone
+
+    with scopes_disabled():
+        sc = event_configured.organizer.sales_channels.get(identifier='web')
+        for i in range(30):
+            o = Order.objects.create(
+                event=event_configured, email='x@example.com', status=Order.STATUS_PENDING,
+                total=Decimal('5.00'), code=f'PEND{i:02d}', datetime=timezone.now(),
+                sales_channel=sc, locale='en',
+            )
+            o.payments.create(provider='walletconnect', amount=o.total, state='created',
+                              info='{"quote": {"quote_id": "other%d"}}' % i)
+
+    payload = {
+        'tx_hash': '0x' + 'd' * 64, 'chain_id': 8453,
+        'organizer': event_configured.organizer.slug, 'event': event_configured.slug,
+    }
+    # Unknown quote: a fixed handful of queries, the settlement job lookup
+    # included, no matter how many orders are pending.
+    with django_assert_max_num_queries(4):
+        resp = client.post('/plugin/wc/verify/', data=json.dumps(dict(payload, quote_id='nope')),
+                           content_type='application/json')
+    assert resp.status_code == 404
+
+    # A quote the buyer re-quoted over no longer settles.
+    with scopes_disabled():
+        payment = quoted_order.payments.first()
+        payment.info_data = {'quote_id': 'q_newer'}
+        payment.save()
+    resp = client.post('/plugin/wc/verify/', data=json.dumps(dict(payload, quote_id='q_test_12345')),
+                       content_type='application/json')
+    assert resp.status_code == 404
+    assert resp.json()['error'] == 'quote not found'
+
+    # Same for payments still carrying the pre-pointer `info['quote']` blob.
+    with scopes_disabled():
+        payment.info_data = {'quote': {'quote_id': 'q_newer'}}
+        payment.save()
+    resp = client.post('/plugin/wc/verify/', data=json.dumps(dict(payload, quote_id='q_test_12345')),
+                       content_type='application/json')
+    assert resp.status_code == 404
+
+
 @pytest.mark.django_db
 def test_verify_on_chain_failure(client, event_configured, quoted_order):
     # Recipient mismatch
@@ -172,8 +226,8 @@ def test_verify_on_chain_failure(client, event_configured, quoted_order):
         token='0x833589fCD6eDb6E08f4c7C32D4f71b54bdA02913',
         amount=50_000_000,
     )
-    with mock.patch('pretix_eth.views._get_web3', return_value=fake), \
-         mock.patch('pretix_eth.views._revalidate_quote_signer', return_value=(True, '')):
+    with mock.patch('pretix_eth.rpc.get_web3', return_value=fake), \
+         mock.patch('pretix_eth.settlement.revalidate_quote_signer', return_value=(True, '')):
         resp = client.post('/plugin/wc/verify/', data=json.dumps({
             'quote_id': 'q_test_12345',
             'tx_hash': '0x' + 'd' * 64,
@@ -184,11 +238,218 @@ def test_verify_on_chain_failure(client, event_configured, quoted_order):
     assert resp.status_code == 400
     body = resp.json()
     assert body['verified'] is False
+    assert body['status'] == 'failed'
+    assert body['error'] == 'no matching transfer found in tx'
 
     # No WCPaymentAttempt row
     assert not WCPaymentAttempt.objects.filter(tx_hash='0x' + 'd' * 64).exists()
 
 
+
+@pytest.mark.django_db
+def test_verify_returns_202_while_confirming(client, event_configured, quoted_order):
+    from pretix_eth import settlement
+    event_configured.settings.set('payment_walletconnect_min_confirmations', 3)
+    payload = json.dumps({
+        'quote_id': 'q_test_12345', 'tx_hash': '0x' + 'c' * 64, 'chain_id': 8453,
+        'organizer': event_configured.organizer.slug, 'event': event_configured.slug,
+    })
+    args = dict(from_addr='0x' + '1' * 40, to_addr='0x' + '2' * 40,
+                token='0x833589fCD6eDb6E08f4c7C32D4f71b54bdA02913', amount=50_000_000)
+    with mock.patch('pretix_eth.rpc.get_web3', return_value=_make_fake_w3(head=101, **args)), \
+         mock.patch('pretix_eth.settlement.revalidate_quote_signer', return_value=(True, '')):
+        resp = client.post('/plugin/wc/verify/', data=payload, content_type='application/json')
+        assert resp.status_code == 202, resp.content
+        body = resp.json()
+        assert body['status'] == 'confirming'
+        assert (body['confirmations'], body['confirmations_required']) == (1, 3)
+
+        # Re-posting the same pair reports the job instead of starting another.
+        again = client.post('/plugin/wc/verify/', data=payload, content_type='application/json')
+        assert again.status_code == 202 and again.json()['status_url'] == body['status_url']
+        assert client.get(body['status_url']).json()['status'] == 'confirming'
+
+    # Without a broker the task can't re-schedule itself; the status poll that
+    # finds the job due runs it again.
+    job = settlement.get_state('q_test_12345', '0x' + 'c' * 64)
+    job['next_check_at'] = 0
+    settlement._store(job)
+    with mock.patch('pretix_eth.rpc.get_web3', return_value=_make_fake_w3(head=104, **args)), \
+         mock.patch('pretix_eth.settlement.revalidate_quote_signer', return_value=(True, '')):
+        status = client.get(body['status_url'])
+    assert status.json()['status'] == 'settled'
+    assert WCPaymentAttempt.objects.filter(tx_hash='0x' + 'c' * 64, state='completed').exists()
+
+
+@pytest.mark.django_db
+def test_stall_kick_supersedes_the_previous_run(client, event_configured, quoted_order, monkeypatch):
+    from pretix_eth import settlement
+    event_configured.settings.set('payment_walletconnect_min_confirmations', 3)
+    payload = json.dumps({
+        'quote_id': 'q_test_12345', 'tx_hash': '0x' + 'c' * 64, 'chain_id': 8453,
+        'organizer': event_configured.organizer.slug, 'event': event_configured.slug,
+    })
+    args = dict(from_addr='0x' + '1' * 40, to_addr='0x' + '2' * 40,
+                token='0x833589fCD6eDb6E08f4c7C32D4f71b54bdA02913', amount=50_000_000)
+    with mock.patch('pretix_eth.rpc.get_web3', return_value=_make_fake_w3(head=101, **args)), \
+         mock.patch('pretix_eth.settlement.revalidate_quote_signer', return_value=(True, '')):
+        client.post('/plugin/wc/verify/', data=payload, content_type='application/json')
+    job = settlement.get_state('q_test_12345', '0x' + 'c' * 64)
+    first_run = job['run']
+
+    # A kick (the queue lagged) hands the job to a new run, without running it.
+    monkeypatch.setattr(settlement, '_enqueue', lambda state: None)
+    job['next_check_at'] = 0
+    settlement._store(job)
+    settlement.poll(job['quote_id'], job['tx_hash'])
+    kicked = settlement.get_state(job['quote_id'], job['tx_hash'])
+    assert kicked['run'] != first_run
+
+    # The old chain's next retry stops without touching the chain or the job.
+    with mock.patch('pretix_eth.rpc.get_web3') as w3:
+        assert settlement.settle(job['quote_id'], job['tx_hash'], 8453, run=first_run) is None
+    w3.assert_not_called()
+    assert settlement.get_state(job['quote_id'], job['tx_hash']) == kicked
+
+    # The current run keeps its token while saving progress.
+    with mock.patch('pretix_eth.rpc.get_web3', return_value=_make_fake_w3(head=102, **args)), \
+         mock.patch('pretix_eth.settlement.revalidate_quote_signer', return_value=(True, '')):
+        assert settlement.settle(job['quote_id'], job['tx_hash'], 8453, run=kicked['run'])
+    assert settlement.get_state(job['quote_id'], job['tx_hash'])['run'] == kicked['run']
+
+
+@pytest.mark.django_db
+def test_signer_recheck_outage_waits_and_a_failed_job_is_retried(client, event_configured, quoted_order):
+    from pretix_eth import settlement
+    payload = json.dumps({
+        'quote_id': 'q_test_12345', 'tx_hash': '0x' + 'c' * 64, 'chain_id': 8453,
+        'organizer': event_configured.organizer.slug, 'event': event_configured.slug,
+    })
+    args = dict(from_addr='0x' + '1' * 40, to_addr='0x' + '2' * 40,
+                token='0x833589fCD6eDb6E08f4c7C32D4f71b54bdA02913', amount=50_000_000)
+    with mock.patch('pretix_eth.rpc.get_web3', return_value=_make_fake_w3(**args)), \
+         mock.patch('pretix_eth.settlement.revalidate_quote_signer',
+                    return_value=(False, 'signer re-check web3 error: timeout')):
+        resp = client.post('/plugin/wc/verify/', data=payload, content_type='application/json')
+    assert resp.status_code == 202, resp.content
+    assert resp.json()['status'] == 'confirming'
+
+    # The outage outlasted the deadline: re-posting verify starts the job over.
+    job = settlement.get_state('q_test_12345', '0x' + 'c' * 64)
+    settlement._store(dict(job, state=settlement.FAILED, http_status=400,
+                           error='transaction not confirmed in time (signer re-check web3 error: timeout)'))
+    with mock.patch('pretix_eth.rpc.get_web3', return_value=_make_fake_w3(**args)), \
+         mock.patch('pretix_eth.settlement.revalidate_quote_signer', return_value=(True, '')):
+        resp = client.post('/plugin/wc/verify/', data=payload, content_type='application/json')
+    assert resp.status_code == 200, resp.content
+    assert resp.json()['status'] == 'settled'
+    assert resp.json()['version'] > job['version']
+
+    # A tx that never confirmed is the buyer's failure and stays failed.
+    stuck = dict(settlement._new_state('q_test_12345', '0x' + 'e' * 64, 8453), state=settlement.FAILED,
+                 http_status=400, error='transaction not confirmed in time (tx not mined yet)')
+    settlement._store(stuck)
+    resp = client.post('/plugin/wc/verify/', data=json.dumps(dict(json.loads(payload), tx_hash='0x' + 'e' * 64)),
+                       content_type='application/json')
+    assert resp.status_code == 400 and resp.json()['status'] == 'failed'
+
+
+@pytest.mark.django_db
+def test_verify_status_waits_and_streams(client, event_configured, quoted_order, locmem_cache, monkeypatch):
+    from pretix_eth import settlement
+    monkeypatch.setattr(settlement, 'WATCH_INTERVAL', 0.01)
+    event_configured.settings.set('payment_walletconnect_min_confirmations', 3)
+    payload = json.dumps({
+        'quote_id': 'q_test_12345', 'tx_hash': '0x' + 'c' * 64, 'chain_id': 8453,
+        'organizer': event_configured.organizer.slug, 'event': event_configured.slug,
+    })
+    args = dict(from_addr='0x' + '1' * 40, to_addr='0x' + '2' * 40,
+                token='0x833589fCD6eDb6E08f4c7C32D4f71b54bdA02913', amount=50_000_000)
+    with mock.patch('pretix_eth.rpc.get_web3', return_value=_make_fake_w3(head=101, **args)), \
+         mock.patch('pretix_eth.settlement.revalidate_quote_signer', return_value=(True, '')):
+        body = client.post('/plugin/wc/verify/', data=payload, content_type='application/json').json()
+        url = body['status_url']
+
+        # Long poll: an unseen version answers at once, the current one waits it out.
+        started = time.monotonic()
+        assert client.get(url + '&wait=5&since=0').json()['version'] == body['version']
+        assert time.monotonic() - started < 1
+        held = client.get(f"{url}&wait=1&since={body['version']}")
+        assert time.monotonic() - started >= 1
+        assert held.json()['status'] == 'confirming'
+
+    # SSE: the current state, then each change as the settlement writes it,
+    # closing after the final one.
+    job = settlement.get_state('q_test_12345', '0x' + 'c' * 64)
+    job['next_check_at'] = 0
+    settlement._store(job)
+    with mock.patch('pretix_eth.rpc.get_web3', return_value=_make_fake_w3(head=104, **args)), \
+         mock.patch('pretix_eth.settlement.revalidate_quote_signer', return_value=(True, '')):
+        resp = client.get(url, HTTP_ACCEPT='text/event-stream')
+        assert resp['Content-Type'] == 'text/event-stream'
+        stream = b''.join(resp.streaming_content).decode()
+    events = [json.loads(line[len('data: '):]) for line in stream.splitlines() if line.startswith('data: ')]
+    assert [e['status'] for e in events] == ['settled']
+    assert events[-1]['verified'] is True
+
+@pytest.mark.django_db
+def test_verify_status_holds_are_capped_and_rate_limited(client, event_configured, quoted_order, locmem_cache, monkeypatch):
+    import pretix_eth.views as views_mod
+    from pretix_eth import settlement
+    monkeypatch.setattr(settlement, 'WATCH_INTERVAL', 0.01)
+    event_configured.settings.set('payment_walletconnect_min_confirmations', 3)
+    payload = json.dumps({
+        'quote_id': 'q_test_12345', 'tx_hash': '0x' + 'c' * 64, 'chain_id': 8453,
+        'organizer': event_configured.organizer.slug, 'event': event_configured.slug,
+    })
+    args = dict(from_addr='0x' + '1' * 40, to_addr='0x' + '2' * 40,
+                token='0x833589fCD6eDb6E08f4c7C32D4f71b54bdA02913', amount=50_000_000)
+    with mock.patch('pretix_eth.rpc.get_web3', return_value=_make_fake_w3(head=101, **args)), \
+         mock.patch('pretix_eth.settlement.revalidate_quote_signer', return_value=(True, '')):
+        body = client.post('/plugin/wc/verify/', data=payload, content_type='application/json').json()
+        url = body['status_url']
+
+        # No free hold slot: the long poll answers at once, the stream sends the
+        # current state and closes.
+        locmem_cache.set(views_mod._STATUS_HOLDS_KEY.format(ip='127.0.0.1'), views_mod.WC_STATUS_HOLDS_PER_IP)
+        started = time.monotonic()
+        assert client.get(f"{url}&wait=5&since={body['version']}").json()['status'] == 'confirming'
+        stream = b''.join(client.get(url, HTTP_ACCEPT='text/event-stream').streaming_content).decode()
+        assert time.monotonic() - started < 1
+        assert stream.count('event: status') == 1
+
+        # A held request gives its slot back.
+        locmem_cache.set(views_mod._STATUS_HOLDS_KEY.format(ip='127.0.0.1'), 0)
+        client.get(f"{url}&wait=1&since={body['version']}")
+        assert locmem_cache.get(views_mod._STATUS_HOLDS_KEY.format(ip='127.0.0.1')) == 0
+
+        monkeypatch.setattr(views_mod, 'WC_BUYER_RATE_LIMIT_PER_MIN', 0)
+        assert client.get(url).status_code == 429
+
+
+@pytest.mark.django_db
+def test_verify_status_unknown_job(client):
+    resp = client.get('/plugin/wc/verify/status/', {'quote_id': 'q_nope', 'tx_hash': '0x' + 'c' * 64})
+    assert resp.status_code == 404
+    assert client.get('/plugin/wc/verify/status/').status_code == 400
+
+
+@pytest.mark.django_db
+def test_settlement_jobs_are_cleaned_up_a_day_after_their_last_write():
+    from datetime import timedelta
+    from django.utils import timezone
+    from pretix_eth import settlement
+    from pretix_eth.models import WCSettlementJob
+
+    for tx in ('0x' + 'a' * 64, '0x' + 'b' * 64):
+        job = settlement._new_state('q_test_12345', tx, 8453)
+        settlement._store(dict(job, state=settlement.SETTLED))
+    WCSettlementJob.objects.filter(tx_hash='0x' + 'a' * 64).update(
+        updated_at=timezone.now() - timedelta(seconds=settlement._STATE_TTL + 1),
+    )
+    assert settlement.cleanup_jobs() == 1
+    assert list(WCSettlementJob.objects.values_list('tx_hash', flat=True)) == ['0x' + 'b' * 64]
+
 from django.core.cache import cache as django_cache
 from django.test import override_settings
 
@@ -229,5 +490,6 @@ def test_verify_rate_limits_after_many_attempts(client, event_configured, quoted
     # Third attempt exceeds limit
     r3 = client.post('/plugin/wc/verify/', data=payload, content_type='application/json')
     assert r3.status_code == 429
+    assert 1 <= int(r3['Retry-After']) <= 120  # from the window's counters, not a fixed guess
 
     django_cache.clear()
@@ -0,0 +1,138 @@
+from decimal import Decimal
+
+import pytest
+from django.core.cache.backends.locmem import LocMemCache
+
+from pretix_eth import wcconfig
+from pretix_eth.chains import ALL_SYMBOLS, SUPPORTED_CHAINS
+from pretix_eth.payment import WalletConnectPayment
+
+
+@pytest.fixture
+def config_cache(monkeypatch):
+    cache = LocMemCache('test-wcconfig', {})
+    cache.clear()
+    monkeypatch.setattr(wcconfig, '_cache', lambda: cache)
+    return cache
+
+
+@pytest.fixture
+def builds(monkeypatch):
+    calls = []
+    real = wcconfig._build
+
+    def _counting(event):
+        calls.append(event.pk)
+        return real(event)
+
+    monkeypatch.setattr(wcconfig, '_build', _counting)
+    return calls
+
+
+@pytest.mark.django_db
+def test_snapshot_reflects_settings(event):
+    event.settings.set('payment_walletconnect_chain_137', False)
+    event.settings.set('payment_walletconnect_token_USDT0', False)
+    event.settings.set('payment_walletconnect_receive_address', '0x' + 'ab' * 20)
+    event.settings.set('payment_walletconnect_min_confirmations', 3)
+    event.settings.set('payment_walletconnect_x402_enabled', True)
+    event.settings.set('payment_walletconnect_crypto_discount_percent', '2.5')
+
+    config = wcconfig.get_wc_config(event)
+    assert config.enabled
+    assert config.chains == tuple(c for c in SUPPORTED_CHAINS if c != 137)
+    assert config.tokens == tuple(s for s in ALL_SYMBOLS if s != 'USDT0')
+    assert not config.chain_enabled(137) and config.chain_enabled(8453)
+    assert not config.token_enabled('USDT0') and config.token_enabled('USDC')
+    assert config.receive_address == '0x' + 'ab' * 20
+    assert config.min_confirmations == 3
+    # Unset values fall back to the settings-form defaults.
+    assert config.quote_ttl_seconds == 600
+    assert config.alchemy_api_key is None and config.zapper_api_key is None
+    assert config.x402_enabled and not config.fiat_purchase_enabled
+    assert config.crypto_discount_pct == Decimal('2.5') and config.payment_recipient is None
+    with pytest.raises(AttributeError):
+        config.min_confirmations = 0
+
+
+@pytest.mark.django_db
+def test_snapshot_is_built_once_and_shared_through_the_cache(event, config_cache, builds):
+    # Constructing the provider the first time writes pretix's fee default,
+    # which (correctly) invalidates a build in flight; get that out of the way.
+    WalletConnectPayment(event)
+    first = wcconfig.get_wc_config(event)
+    assert wcconfig.get_wc_config(event) is first
+    assert builds == [event.pk]
+
+    # Another process (no local copy) reuses the cached snapshot.
+    wcconfig.clear_local()
+    assert wcconfig.get_wc_config(event) == first
+    assert builds == [event.pk]
+
+
+@pytest.mark.django_db
+def test_local_copy_expires(event, config_cache, builds, monkeypatch):
+    monkeypatch.setattr(wcconfig, 'LOCAL_TTL', 0)
+    wcconfig.get_wc_config(event)
+    config_cache.clear()
+    wcconfig.get_wc_config(event)
+    assert builds == [event.pk, event.pk]
+
+
+@pytest.mark.django_db
+def test_settings_save_and_delete_invalidate(event, config_cache, builds):
+    assert wcconfig.get_wc_config(event).chain_enabled(8453)
+
+    event.settings.set('payment_walletconnect_chain_8453', False)
+    assert not wcconfig.get_wc_config(event).chain_enabled(8453)
+
+    event.settings.delete('payment_walletconnect_chain_8453')
+    assert wcconfig.get_wc_config(event).chain_enabled(8453)
+    assert len(builds) == 3
+
+    # Settings outside the provider's namespace leave the snapshot alone.
+    event.settings.set('payment_other_enabled', True)
+    wcconfig.get_wc_config(event)
+    assert len(builds) == 3
+
+
+@pytest.mark.django_db
+def test_build_racing_an_invalidation_is_not_served(event, config_cache, builds, monkeypatch):
+    real = wcconfig._build
+
+    def _racing(event):
+        config = real(event)
+        # A settings save commits after this build read the old values.
+        event.settings.set('payment_walletconnect_chain_8453', False)
+        return config
+
+    monkeypatch.setattr(wcconfig, '_build', _racing)
+    assert wcconfig.get_wc_config(event).chain_enabled(8453)
+    monkeypatch.setattr(wcconfig, '_build', real)
+
+    # The stale snapshot it stored belongs to the previous generation.
+    wcconfig.clear_local()
+    assert not wcconfig.get_wc_config(event).chain_enabled(8453)
+    wcconfig.clear_local()
+    assert not wcconfig.get_wc_config(event).chain_enabled(8453)
+
+
+@pytest.mark.django_db
+def test_organizer_setting_invalidates_its_events(event, config_cache):
+    assert wcconfig.get_wc_config(event).quote_ttl_seconds == 600
+    event.organizer.settings.set('payment_walletconnect_quote_ttl_seconds', 120)
+    assert wcconfig.get_wc_config(event).quote_ttl_seconds == 120
+
+
+@pytest.mark.django_db
+def test_cache_outage_falls_back_to_settings(event, monkeypatch):
+    class _Down:
+        def get(self, *a, **kw):
+            raise ConnectionError('cache down')
+
+        set = delete = get_many = get
+
+    monkeypatch.setattr(wcconfig, '_cache', lambda: _Down())
+    assert wcconfig.get_wc_config(event).enabled
+    event.settings.set('payment_walletconnect__enabled', False)
+    assert not wcconfig.get_wc_config(event).enabled
@@ -1,4 +1,6 @@
 from unittest import mock
+
+import pytest
 from pretix_eth.x402.balances import fetch_balances_for_wallet
 
 
@@ -7,7 +9,8 @@ def test_fetch_balances_uses_correct_rpc(monkeypatch):
         return f'https://fake-rpc-{chain_id}'
     monkeypatch.setattr('pretix_eth.x402.balances.get_rpc_url', fake_get_rpc)
 
-    # Mock Web3 client
+    # Mock Web3 client. A MagicMock aggregate3 result can't be decoded, so
+    # this also exercises the per-call fallback.
     fake_web3 = mock.MagicMock()
     fake_web3.eth.get_balance.return_value = 5 * 10**17  # 0.5 ETH
     fake_contract = mock.MagicMock()
@@ -24,6 +27,74 @@ def test_fetch_balances_uses_correct_rpc(monkeypatch):
     assert eth_entry['balance'] == str(5 * 10**17)
 
 
+def _uint(value):
+    return value.to_bytes(32, 'big')
+
+
+def _multicall_w3(results_by_call):
+    """Fake w3 whose Multicall3 `aggregate3` answers each call via
+    `results_by_call(target, calldata)`; records the batches it was sent."""
+    batches = []
+    w3 = mock.MagicMock()
+    w3.eth.get_balance.side_effect = AssertionError('per-call path used')
+
+    def contract(address, abi):
+        from pretix_eth.x402.abi import MULTICALL3_ADDRESS
+        assert address == MULTICALL3_ADDRESS
+        c = mock.MagicMock()
+
+        def aggregate3(calls):
+            batches.append(calls)
+            call = mock.MagicMock()
+            call.call.return_value = [results_by_call(t, data) for t, _, data in calls]
+            return call
+        c.functions.aggregate3.side_effect = aggregate3
+        return c
+    w3.eth.contract.side_effect = contract
+    return w3, batches
+
+
+def test_rpc_balances_one_multicall_per_chain(monkeypatch):
+    from pretix_eth.x402.abi import BALANCE_OF_SELECTOR, GET_ETH_BALANCE_SELECTOR
+    wallet = '0x' + 'ab' * 20
+    usdt0 = '0x01bFF41798a0BcF287b996046Ca68b395DbC1071'
+
+    def answer(target, data):
+        assert data[4:] == bytes(12) + bytes.fromhex('ab' * 20)
+        if data[:4] == GET_ETH_BALANCE_SELECTOR:
+            return (True, _uint(7 * 10**17))
+        assert data[:4] == BALANCE_OF_SELECTOR
+        if target == usdt0:
+            return (False, b'')  # one reverting token must not sink the batch
+        return (True, _uint(25 * 10**6))
+
+    w3, batches = _multicall_w3(answer)
+    monkeypatch.setattr('pretix_eth.x402.balances._get_w3', lambda cid, key: w3)
+
+    result = fetch_balances_for_wallet(wallet=wallet, chain_ids=[10, 8453], alchemy_key=None)
+    assert len(batches) == 2  # one round trip per chain
+    assert [len(b) for b in batches] == [3, 2]  # ETH + USDC + USDT0 on OP; ETH + USDC on Base
+    by_key = {(e['chain_id'], e['symbol']): e['balance'] for e in result}
+    assert by_key == {
+        (10, 'ETH'): str(7 * 10**17), (10, 'USDC'): str(25 * 10**6), (10, 'USDT0'): '0',
+        (8453, 'ETH'): str(7 * 10**17), (8453, 'USDC'): str(25 * 10**6),
+    }
+
+
+def test_rpc_balances_fall_back_to_per_call_when_aggregate_fails(monkeypatch):
+    w3 = mock.MagicMock()
+    w3.eth.get_balance.return_value = 3
+    multicall = mock.MagicMock()
+    multicall.functions.aggregate3.return_value.call.side_effect = ValueError('execution reverted')
+    token = mock.MagicMock()
+    token.functions.balanceOf.return_value.call.return_value = 4
+    w3.eth.contract.side_effect = lambda address, abi: multicall if any(f['name'] == 'aggregate3' for f in abi) else token
+    monkeypatch.setattr('pretix_eth.x402.balances._get_w3', lambda cid, key: w3)
+
+    result = fetch_balances_for_wallet(wallet='0x' + '1' * 40, chain_ids=[8453], alchemy_key=None)
+    assert [(e['symbol'], e['balance']) for e in result] == [('ETH', '3'), ('USDC', '4')]
+
+
 def test_fetch_balances_prefers_zapper_when_key_set(monkeypatch):
     """Zapper fast path is used when key is set; RPC is not called."""
     def boom(*args, **kwargs):
@@ -81,3 +152,246 @@ def test_fetch_balances_skips_zapper_when_no_key(monkeypatch):
         wallet='0x' + '1' * 40, chain_ids=[8453], alchemy_key=None,
     )
     assert result is rpc_result
+
+
+def test_rpc_chains_run_concurrently_and_late_chains_are_missing(monkeypatch):
+    import time
+    from pretix_eth.x402 import balances
+
+    delays = {1: 0.2, 10: 0.2, 8453: 0.2, 42161: 1.5}
+
+    def fake_chain(cid, checksum, key):
+        time.sleep(delays[cid])
+        if cid == 10:
+            raise ConnectionError('rpc down')
+        return [{'chain_id': cid, 'symbol': 'ETH', 'balance': '1', 'decimals': 18, 'token_address': None}]
+
+    monkeypatch.setattr(balances, '_chain_balances', fake_chain)
+    monkeypatch.setattr(balances, 'RPC_CHAIN_DEADLINE_SECONDS', 0.6)
+
+    t0 = time.monotonic()
+    result = balances._fetch_balances_via_rpc(wallet='0x' + '1' * 40, chain_ids=[1, 10, 8453, 42161], alchemy_key=None)
+    elapsed = time.monotonic() - t0
+    assert elapsed < 0.9  # ~slowest on-time chain or the deadline, not the sum
+
+    got = {(e['chain_id'], e['symbol']): e for e in result}
+    assert got[(1, 'ETH')]['balance'] == '1' and got[(8453, 'ETH')]['balance'] == '1'
+    # Errored (OP) and late (Arbitrum) chains: every token reported missing, never '0'.
+    for cid in (10, 42161):
+        chain = [e for e in result if e['chain_id'] == cid]
+        assert {e['symbol'] for e in chain} == {'ETH', 'USDC', 'USDT0'}
+        assert all(e['missing'] is True and e['balance'] is None for e in chain)
+
+
+class _DictCache:
+    def __init__(self):
+        self.store = {}
+
+    def get(self, k, default=None):
+        return self.store.get(k, default)
+
+    def set(self, k, v, timeout=None):
+        self.store[k] = v
+
+    def add(self, k, v, timeout=None):
+        return self.store.setdefault(k, v) is v
+
+    def incr(self, k, delta=1):
+        if k not in self.store:
+            raise ValueError(k)
+        self.store[k] += delta
+        return self.store[k]
+
+
+def _eth(cid, balance='1'):
+    return {'chain_id': cid, 'symbol': 'ETH', 'balance': balance, 'decimals': 18, 'token_address': None}
+
+
+def test_balance_cache_keyed_by_wallet_and_chain_set(monkeypatch):
+    from pretix_eth.x402 import balances
+    cache = _DictCache()
+    monkeypatch.setattr(balances, '_cache', lambda: cache)
+    calls = []
+
+    def fake_rpc(*, wallet, chain_ids, alchemy_key):
+        calls.append(tuple(chain_ids))
+        return [_eth(cid) for cid in chain_ids]
+    monkeypatch.setattr(balances, '_fetch_balances_via_rpc', fake_rpc)
+
+    wallet = '0x' + 'Ab' * 20
+    before = balances.get_balance_cache_stats()
+    first = fetch_balances_for_wallet(wallet=wallet, chain_ids=[8453, 10], alchemy_key=None)
+    # Same wallet (any casing), same chain set (any order) → cache hit.
+    assert fetch_balances_for_wallet(wallet=wallet.lower(), chain_ids=[10, 8453], alchemy_key=None) == first
+    fetch_balances_for_wallet(wallet=wallet, chain_ids=[8453], alchemy_key=None)
+    assert calls == [(8453, 10), (8453,)]
+    after = balances.get_balance_cache_stats()
+    assert after['hits'] - before['hits'] == 1 and after['misses'] - before['misses'] == 2
+
+    # Settlement invalidates every chain set for the wallet.
+    balances.invalidate_wallet_balances(wallet)
+    fetch_balances_for_wallet(wallet=wallet, chain_ids=[8453, 10], alchemy_key=None)
+    fetch_balances_for_wallet(wallet=wallet, chain_ids=[8453], alchemy_key=None)
+    assert len(calls) == 4
+
+
+def test_balance_cache_skips_results_with_missing_chains(monkeypatch):
+    from pretix_eth.x402 import balances
+    cache = _DictCache()
+    monkeypatch.setattr(balances, '_cache', lambda: cache)
+    missing = dict(_eth(10, None), missing=True)
+    monkeypatch.setattr(balances, '_fetch_balances_via_rpc', lambda **kw: [_eth(8453), missing])
+    fetch_balances_for_wallet(wallet='0x' + '1' * 40, chain_ids=[8453, 10], alchemy_key=None)
+    assert cache.store == {}
+
+
+def test_concurrent_misses_share_one_fetch(monkeypatch):
+    import threading
+    import time
+    from pretix_eth.x402 import balances
+    cache = _DictCache()
+    monkeypatch.setattr(balances, '_cache', lambda: cache)
+    calls = []
+
+    def slow_rpc(*, wallet, chain_ids, alchemy_key):
+        calls.append(1)
+        time.sleep(0.2)
+        return [_eth(8453)]
+    monkeypatch.setattr(balances, '_fetch_balances_via_rpc', slow_rpc)
+    # Every caller reads the cache before the first fetch has stored anything.
+    monkeypatch.setattr(cache, 'get', lambda k, default=None: default if k.startswith('pretix_eth_balances:') else cache.store.get(k))
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(
+            fetch_balances_for_wallet(wallet='0x' + '2' * 40, chain_ids=[8453], alchemy_key=None)))
+        for _ in range(8)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1
+    assert results == [[_eth(8453)]] * 8
+
+
+@pytest.mark.django_db
+def test_settlement_invalidates_payer_balances(monkeypatch, django_capture_on_commit_callbacks):
+    from pretix_eth.models import WCPaymentAttempt
+    from pretix_eth.x402 import balances
+    invalidated = []
+    monkeypatch.setattr(balances, 'invalidate_wallet_balances', invalidated.append)
+    with django_capture_on_commit_callbacks(execute=True):
+        WCPaymentAttempt.objects.create(
+            tx_hash='0x' + '5' * 64, quote_id='q', order_code='ABC12', payer='0x' + '3' * 40,
+            chain_id=8453, state='completed',
+        )
+    assert invalidated == ['0x' + '3' * 40]
+
+
+def test_slow_zapper_is_hedged_with_rpc(monkeypatch):
+    import time
+    from pretix_eth.x402 import balances
+    monkeypatch.setattr(balances, 'ZAPPER_HEDGE_DELAY_SECONDS', 0.1)
+    started = {}
+
+    def slow_zapper(**kw):
+        time.sleep(1.0)
+        return [_eth(8453, 'zapper')]
+
+    def rpc(**kw):
+        started['rpc'] = time.monotonic()
+        time.sleep(0.1)
+        return [_eth(8453, 'rpc')]
+
+    monkeypatch.setattr(balances, 'fetch_balances_via_zapper', slow_zapper)
+    monkeypatch.setattr(balances, '_fetch_balances_via_rpc', rpc)
+    t0 = time.monotonic()
+    result = balances._fetch_balances_uncached(
+        wallet='0x' + '1' * 40, chain_ids=[8453], alchemy_key=None, zapper_api_key='k',
+    )
+    elapsed = time.monotonic() - t0
+    assert result == [_eth(8453, 'rpc')]
+    assert 0.08 < started['rpc'] - t0 < 0.5  # RPC started after the hedge delay, not Zapper's timeout
+    assert elapsed < 0.6
+
+
+def test_hedged_rpc_with_missing_chains_waits_for_zapper(monkeypatch):
+    import time
+    from pretix_eth.x402 import balances
+    monkeypatch.setattr(balances, 'ZAPPER_HEDGE_DELAY_SECONDS', 0.05)
+
+    def slow_zapper(**kw):
+        time.sleep(0.3)
+        return [_eth(8453, 'zapper')]
+
+    monkeypatch.setattr(balances, 'fetch_balances_via_zapper', slow_zapper)
+    monkeypatch.setattr(balances, '_fetch_balances_via_rpc', lambda **kw: [dict(_eth(8453, None), missing=True)])
+    result = balances._fetch_balances_uncached(
+        wallet='0x' + '1' * 40, chain_ids=[8453], alchemy_key=None, zapper_api_key='k',
+    )
+    assert result == [_eth(8453, 'zapper')]
+
+    # Zapper failing too → the partial RPC answer is still better than nothing.
+    monkeypatch.setattr(balances, 'fetch_balances_via_zapper', lambda **kw: time.sleep(0.2))
+    result = balances._fetch_balances_uncached(
+        wallet='0x' + '1' * 40, chain_ids=[8453], alchemy_key=None, zapper_api_key='k',
+    )
+    assert result[0]['missing'] is True
+
+
+def test_iter_balances_yields_chains_as_they_resolve(monkeypatch):
+    import time
+    from pretix_eth.x402 import balances
+    cache = _DictCache()
+    monkeypatch.setattr(balances, '_cache', lambda: cache)
+    monkeypatch.setattr(balances, 'RPC_CHAIN_DEADLINE_SECONDS', 0.5)
+    delays = {1: 0.3, 8453: 0.02, 42161: 2.0}
+
+    def fake_chain(cid, checksum, key):
+        time.sleep(delays[cid])
+        return [_eth(cid)]
+    monkeypatch.setattr(balances, '_chain_balances', fake_chain)
+
+    t0 = time.monotonic()
+    stream = balances.iter_balances_for_wallet(wallet='0x' + '1' * 40, chain_ids=[1, 8453, 42161], alchemy_key=None)
+    first = next(stream)
+    assert first == [_eth(8453)] and time.monotonic() - t0 < 0.2  # fastest chain first, not after the slowest
+    rest = list(stream)
+    assert rest[0] == [_eth(1)]
+    assert [e['chain_id'] for e in rest[1]] == [42161] * 3 and all(e['missing'] for e in rest[1])
+    assert cache.store == {}  # incomplete → not cached
+
+    # Late chains are filled from a still-running Zapper call before being reported missing.
+    monkeypatch.setattr(balances, 'ZAPPER_HEDGE_DELAY_SECONDS', 0.01)
+
+    def slow_zapper(**kw):
+        time.sleep(0.7)
+        return [_eth(cid, 'zapper') for cid in kw['chain_ids']]
+    monkeypatch.setattr(balances, 'fetch_balances_via_zapper', slow_zapper)
+    batches = list(balances.iter_balances_for_wallet(
+        wallet='0x' + '1' * 40, chain_ids=[1, 8453, 42161], alchemy_key=None, zapper_api_key='k',
+    ))
+    assert batches == [[_eth(8453)], [_eth(1)], [_eth(42161, 'zapper')]]
+    # Complete now, so the next (buffered or streamed) call is a cache hit.
+    assert fetch_balances_for_wallet(wallet='0x' + '1' * 40, chain_ids=[42161, 8453, 1], alchemy_key=None) == \
+        [_eth(8453), _eth(1), _eth(42161, 'zapper')]
+
+
+def test_streamed_wallet_balances_ndjson(monkeypatch):
+    import json
+    from pretix_eth import views
+    from pretix_eth.x402 import balances
+
+    def fake_iter(**kw):
+        yield [_eth(8453)]
+        yield [dict(_eth(10, None), missing=True)]
+        raise RuntimeError('boom')
+    monkeypatch.setattr(balances, 'iter_balances_for_wallet', fake_iter)
+    lines = [json.loads(line) for line in views._stream_wallet_balances('0xW', [8453, 10], None, None)]
+    assert lines[0] == {'type': 'balances', 'balances': [_eth(8453)]}
+    assert lines[1]['balances'][0]['missing'] is True
+    assert lines[2] == {'type': 'done', 'wallet': '0xW', 'missingChains': [10], 'error': 'balance lookup failed'}
+
+    assert [json.loads(line) for line in views._stream_wallet_balances('0xW', [], None, None)] == \
+        [{'type': 'done', 'wallet': '0xW', 'missingChains': []}]
@@ -3,7 +3,7 @@ import pytest
 from decimal import Decimal
 from django.utils import timezone
 from django_scopes import scopes_disabled
-from pretix_eth.models import X402PendingOrder, X402CompletedOrder, X402VerifyAttempt
+from pretix_eth.models import X402PendingOrder, X402CompletedOrder
 
 
 @pytest.mark.django_db
@@ -65,11 +65,3 @@ def test_completed_order_refund_fields(event):
         )
         assert o.refund_status is None
         assert o.refund_meta == {}
-
-
-@pytest.mark.django_db
-def test_verify_attempt_create(event):
-    with scopes_disabled():
-        X402VerifyAttempt.objects.create(key='verify_ref:abc')
-        X402VerifyAttempt.objects.create(key='verify_ip:1.2.3.4')
-        assert X402VerifyAttempt.objects.count() == 2
@@ -121,6 +121,43 @@ def test_admin_orders_includes_legacy_wc_but_not_signed_message(
     assert body['stats']['completed'] == 1
 
 
+
+@pytest.mark.django_db
+def test_admin_orders_wc_unpaid_quotes_from_history_table(
+    api_client, event, get_order_and_payment, django_assert_max_num_queries,
+):
+    """Unpaid WC orders list every quote from `WCQuote`, newest first, without
+    parsing each payment's info blob."""
+    import time
+    from pretix_eth.models import WCQuote
+    now = int(time.time())
+    quote = {
+        'quote_id': 'q_old', 'chain_id': 8453, 'symbol': 'USDC', 'intended_payer': '0x' + '1' * 40,
+        'amount_raw': '100000000', 'order_total_usd': '100.00', 'created_at': now - 60, 'expires_at': now + 540,
+    }
+    order, payment = get_order_and_payment(payment_kwargs={'state': 'created'}, info_data={'quote_id': 'q_new'})
+    with scopes_disabled():
+        WCQuote.from_quote(payment, quote).save()
+        WCQuote.from_quote(payment, dict(quote, quote_id='q_new', symbol='ETH', created_at=now)).save()
+        WCQuote.from_quote(payment, dict(quote, quote_id='q_nopayer', intended_payer='')).save()
+        for i in range(3):
+            get_order_and_payment(payment_kwargs={'state': 'created'})
+
+    with django_assert_max_num_queries(12):
+        resp = api_client.get(
+            f'/plugin/admin/orders/?organizer={event.organizer.slug}&event={event.slug}',
+        )
+    assert resp.status_code == 200
+    unpaid = {r['orderCode']: r for r in resp.json()['wcUnpaid']}
+    assert len(unpaid) == 4
+    row = unpaid[order.code]
+    assert [q['quoteId'] for q in row['quotes']] == ['q_new', 'q_old']
+    assert row['quote']['symbol'] == 'ETH'
+    assert row['quotes'][1] == {
+        'quoteId': 'q_old', 'chainId': 8453, 'symbol': 'USDC', 'intendedPayer': '0x' + '1' * 40,
+        'amountRaw': '100000000', 'orderTotalUsd': '100.00', 'createdAt': now - 60, 'expiresAt': now + 540,
+    }
+
 @pytest.mark.django_db
 def test_admin_stats_counts(api_client, event):
     with scopes_disabled():
@@ -144,3 +181,43 @@ def test_admin_stats_counts(api_client, event):
     assert body['pending_count'] == 1
     assert body['completed_count'] == 1
     assert body['total_usd'] == '10.00'
+
+
+@pytest.mark.django_db
+def test_admin_pricing_returns_price_history(api_client, event, locmem_cache):
+    from pretix_eth import pricing
+    pricing._record_price('ETH', pricing.EthPriceResult(price=2000.0, source='coinbase+kraken'))
+
+    resp = api_client.get(
+        f'/plugin/admin/pricing/?organizer={event.organizer.slug}&event={event.slug}',
+    )
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body['success'] is True
+    eth = body['history']['ETH']
+    assert eth['cacheTtlSeconds'] == pricing.PRICE_CACHE_TTL_SECONDS
+    assert eth['samples'][-1]['price'] == 2000.0
+    assert eth['samples'][-1]['source'] == 'coinbase+kraken'
+    assert 'oracles' in body
+
+
+def test_admin_sanctions_returns_list_metrics(api_client, event):
+    resp = api_client.get(
+        f'/plugin/admin/sanctions/?organizer={event.organizer.slug}&event={event.slug}',
+    )
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body['success'] is True
+    assert set(body['lists']) == {'ofac', 'scam'}
+    assert {'servedVersion', 'addresses', 'fresh', 'refreshFailures'} <= set(body['lists']['ofac'])
+
+
+def test_admin_balances_returns_cache_stats(api_client, event):
+    resp = api_client.get(
+        f'/plugin/admin/balances/?organizer={event.organizer.slug}&event={event.slug}',
+    )
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body['success'] is True
+    assert {'hits', 'misses', 'coalesced', 'invalidations', 'hitRate'} <= set(body['cache'])
+    assert body['zapper']['state'] in ('closed', 'open', 'half-open')
@@ -99,3 +99,39 @@ def test_payment_options_rich_shape_with_signing_request(api_client, event, pend
     assert eth['sufficient'] is True
     assert eth['signingRequest']['method'] == 'eth_sendTransaction'
     assert 'priceUsd' in eth
+
+
+@pytest.mark.django_db
+def test_payment_options_unreadable_balance_is_unknown_not_zero(api_client, event, pending_order_for_options, monkeypatch):
+    event.settings.set('payment_walletconnect_payment_recipient', '0x' + '2' * 40)
+
+    def fake_fetch(*, wallet, chain_ids, alchemy_key, zapper_api_key=None):
+        return [
+            {'chain_id': 8453, 'symbol': 'USDC', 'balance': '0', 'decimals': 6, 'missing': True,
+             'token_address': '0x833589fCD6eDb6E08f4c7C32D4f71b54bdA02913'},
+        ]
+    monkeypatch.setattr('pretix_eth.views_x402.fetch_balances_for_wallet', fake_fetch)
+    from pretix_eth.pricing import EthPriceResult
+    async def fake_eth_price():
+        return EthPriceResult(price=2000.0, source='dual')
+    monkeypatch.setattr('pretix_eth.views_x402.fetch_eth_price_usd', fake_eth_price, raising=False)
+    for cid in (1, 10, 137, 42161):
+        event.settings.set(f'payment_walletconnect_chain_{cid}', False)
+    for sym in ('USDT0', 'ETH'):
+        event.settings.set(f'payment_walletconnect_token_{sym}', False)
+
+    resp = api_client.post(
+        '/plugin/x402/payment-options/',
+        data=json.dumps({
+            'organizer': event.organizer.slug, 'event': event.slug,
+            'paymentReference': 'x402_opts',
+            'walletAddress': '0x' + '1' * 40,
+        }),
+        content_type='application/json',
+    )
+    assert resp.status_code == 200, resp.content
+    usdc = next(o for o in resp.json()['options'] if o['symbol'] == 'USDC')
+    assert usdc['balanceMissing'] is True
+    assert usdc['balance'] is None and usdc['sufficient'] is None
+    # Still payable: the relayer checks the balance before submitting.
+    assert usdc['signingRequest']['method'] == 'eth_signTypedData_v4'
@@ -1,17 +1,24 @@
 """Unit tests for the Zapper GraphQL fast-path balance fetcher."""
-from unittest import mock
+import httpx
+import pytest
 
 from pretix_eth.x402 import zapper
 
 
-def _make_response(payload: dict):
-    """Build a fake context-manager response object the way urlopen returns one."""
-    resp = mock.MagicMock()
-    import json as _json
-    resp.read.return_value = _json.dumps(payload).encode('utf-8')
-    resp.__enter__.return_value = resp
-    resp.__exit__.return_value = False
-    return resp
+@pytest.fixture(autouse=True)
+def _fresh_breaker(monkeypatch):
+    monkeypatch.setattr(zapper, '_breaker', zapper._CircuitBreaker(threshold=3, cooldown=60))
+
+
+def _serve(monkeypatch, handler):
+    """Point the pooled client at an in-process handler(request) -> httpx.Response."""
+    client = httpx.Client(transport=httpx.MockTransport(handler), headers=zapper._HEADERS)
+    monkeypatch.setattr(zapper, '_client', lambda: client)
+    return client
+
+
+def _respond(payload: dict, status: int = 200):
+    return lambda request: httpx.Response(status, json=payload)
 
 
 def test_zapper_returns_none_without_api_key():
@@ -63,8 +70,7 @@ def test_zapper_parses_balances_per_chain(monkeypatch):
             },
         },
     }
-    monkeypatch.setattr(zapper.urlrequest, 'urlopen',
-                        lambda req, timeout=None: _make_response(payload))
+    _serve(monkeypatch, _respond(payload))
 
     result = zapper.fetch_balances_via_zapper(
         wallet='0x' + '1' * 40, chain_ids=[8453], api_key='fake',
@@ -81,8 +87,7 @@ def test_zapper_parses_balances_per_chain(monkeypatch):
 def test_zapper_backfills_zero_for_missing_chains(monkeypatch):
     """When Zapper returns no entry for a chain, we still emit a zero row."""
     payload = {'data': {'portfolio': {'tokenBalances': []}}}
-    monkeypatch.setattr(zapper.urlrequest, 'urlopen',
-                        lambda req, timeout=None: _make_response(payload))
+    _serve(monkeypatch, _respond(payload))
 
     result = zapper.fetch_balances_via_zapper(
         wallet='0x' + '1' * 40, chain_ids=[8453], api_key='fake',
@@ -97,8 +102,7 @@ def test_zapper_backfills_zero_for_missing_chains(monkeypatch):
 
 def test_zapper_returns_none_on_graphql_errors(monkeypatch):
     payload = {'errors': [{'message': 'schema mismatch'}]}
-    monkeypatch.setattr(zapper.urlrequest, 'urlopen',
-                        lambda req, timeout=None: _make_response(payload))
+    _serve(monkeypatch, _respond(payload))
 
     assert zapper.fetch_balances_via_zapper(
         wallet='0x' + '1' * 40, chain_ids=[8453], api_key='fake',
@@ -106,10 +110,7 @@ def test_zapper_returns_none_on_graphql_errors(monkeypatch):
 
 
 def test_zapper_returns_none_on_http_error(monkeypatch):
-    def boom(req, timeout=None):
-        from urllib.error import HTTPError
-        raise HTTPError(req.full_url, 400, 'Bad Request', {}, None)
-    monkeypatch.setattr(zapper.urlrequest, 'urlopen', boom)
+    _serve(monkeypatch, _respond({'errors': [{'message': 'bad'}]}, status=400))
 
     assert zapper.fetch_balances_via_zapper(
         wallet='0x' + '1' * 40, chain_ids=[8453], api_key='fake',
@@ -117,10 +118,83 @@ def test_zapper_returns_none_on_http_error(monkeypatch):
 
 
 def test_zapper_returns_none_on_timeout(monkeypatch):
-    def boom(req, timeout=None):
-        raise TimeoutError('slow')
-    monkeypatch.setattr(zapper.urlrequest, 'urlopen', boom)
+    def boom(request):
+        raise httpx.ReadTimeout('slow', request=request)
+    _serve(monkeypatch, boom)
 
     assert zapper.fetch_balances_via_zapper(
         wallet='0x' + '1' * 40, chain_ids=[8453], api_key='fake',
     ) is None
+
+
+def test_zapper_sends_api_key_over_pooled_client(monkeypatch):
+    seen = []
+
+    def handler(request):
+        seen.append(request)
+        return httpx.Response(200, json={'data': {'portfolio': {'tokenBalances': []}}})
+    _serve(monkeypatch, handler)
+
+    for _ in range(2):
+        assert zapper.fetch_balances_via_zapper(wallet='0x' + '1' * 40, chain_ids=[8453], api_key='k') is not None
+    assert [r.headers['x-zapper-api-key'] for r in seen] == ['k', 'k']
+    assert seen[0].headers['user-agent'].startswith('pretix-eth-plugin/')
+    assert zapper._client() is zapper._client()
+
+
+def test_zapper_missing_portfolio_is_a_schema_failure(monkeypatch):
+    # Must not be read as "empty wallet" (which would backfill zero balances).
+    _serve(monkeypatch, _respond({'data': {}}))
+    assert zapper.fetch_balances_via_zapper(wallet='0x' + '1' * 40, chain_ids=[8453], api_key='k') is None
+    assert zapper.get_zapper_health()['failureKinds'] == {'schema': 1}
+
+
+def test_zapper_circuit_opens_skips_and_probes(monkeypatch):
+    calls = []
+    healthy = {'ok': False}
+
+    def handler(request):
+        calls.append(1)
+        if healthy['ok']:
+            return httpx.Response(200, json={'data': {'portfolio': {'tokenBalances': []}}})
+        return httpx.Response(503, text='down')
+    _serve(monkeypatch, handler)
+    fetch = lambda: zapper.fetch_balances_via_zapper(wallet='0x' + '1' * 40, chain_ids=[8453], api_key='k')  # noqa: E731
+
+    for _ in range(3):
+        assert fetch() is None
+    assert zapper.get_zapper_health()['state'] == 'open'
+    # Open: straight to None without touching the network.
+    assert fetch() is None and len(calls) == 3
+    assert zapper.get_zapper_health()['skipped'] == 1
+
+    # Cooldown elapsed → one probe; a failing probe re-opens immediately.
+    zapper._breaker.opened_at -= 61
+    assert fetch() is None and len(calls) == 4
+    assert zapper.get_zapper_health()['state'] == 'open'
+
+    # A successful probe closes the circuit.
+    zapper._breaker.opened_at -= 61
+    healthy['ok'] = True
+    assert fetch() is not None
+    health = zapper.get_zapper_health()
+    assert health['state'] == 'closed' and health['consecutiveFailures'] == 0
+    assert health['failureKinds'] == {'http': 4} and health['opened'] == 2
+
+
+def test_unexpected_response_shape_reopens_a_half_open_breaker(monkeypatch):
+    _serve(monkeypatch, _respond({'data': ['not', 'a', 'dict']}))
+    fetch = lambda: zapper.fetch_balances_via_zapper(wallet='0x' + '1' * 40, chain_ids=[8453], api_key='k')  # noqa: E731
+
+    for _ in range(3):
+        assert fetch() is None
+    assert zapper.get_zapper_health()['state'] == 'open'
+
+    # The probe raises inside the parser; it must still count as a failure
+    # rather than leave the breaker half-open (and Zapper skipped) for good.
+    zapper._breaker.opened_at -= 61
+    assert fetch() is None
+    health = zapper.get_zapper_health()
+    assert health['state'] == 'open' and health['failureKinds'] == {'unexpected': 4}
+    zapper._breaker.opened_at -= 61
+    assert zapper._breaker.allow()